@@ -1,13 +1,17 @@
-import copy
 from typing import Annotated
 import ASCII_table
 import numpy as np
 
-from action import Action
 from baseMaze import BaseMaze
+from baseQTable import BaseQTable
+from eligibilityTraces import EligibilityTraces
+from episodeStats import EpisodeStats
 from SARSAAgent import SARSAAgent
-from floatRange import FloatRange, check_annotated
+from floatRange import FloatRange, bind_hot, check_annotated
 from helper import Q_to_np_matrix
+from randomStream import RandomStream
+from replayBuffer import ReplayBuffer
+from trajectoryRecorder import TrajectoryRecorder
 
 
 class QAgent(SARSAAgent):
@@ -23,7 +27,11 @@ class QAgent(SARSAAgent):
     def __init__(
         self, 
         maze: BaseMaze, 
-        start_coordinate: tuple[int, int]
+        start_coordinate: tuple[int, int],
+        rng: RandomStream=None,
+        q_backend: str | BaseQTable="dict",
+        recorder: TrajectoryRecorder=None,
+        replay_buffer: ReplayBuffer=None
     )-> None:
         """
         @var $maze
@@ -33,9 +41,21 @@ class QAgent(SARSAAgent):
         @var $current_coordinate 
         **tuple[int, int]** Current x, y coord of agent.
         @var $Q
-        **dict[State : dict[Action : float]]** values per state in dict.
+        **BaseQTable** Q-values per state, 
+        which reads like dict[State : dict[Action : float]].
+        Backend is selected by `q_backend`, one of Q_BACKENDS, 
+        or an empty BaseQTable for backends with settings.
+        @var $rng
+        **RandomStream** Stream to draw exploration from.
+        @var $recorder
+        **TrajectoryRecorder** Optional recorder of every transition.
+        @var $replay_buffer
+        **ReplayBuffer** Buffer of past transitions, for replay updates.
+        Created on the first `Q_learning` call with `replay_updates`,
+        if not given. @see replayBuffer.py
         """
-        super().__init__(maze, start_coordinate)
+        super().__init__(maze, start_coordinate, rng, q_backend, recorder)
+        self.replay_buffer = replay_buffer
     
     @check_annotated
     def Q_learning(
@@ -43,91 +63,334 @@ class QAgent(SARSAAgent):
         alpha: Annotated[float, FloatRange(0.0, 1.0)]=0.1,
         epsilon: Annotated[float, FloatRange(0.0, 1.0)]=0.1,
         gamma: Annotated[float, FloatRange(0.0, 1.0)]=0.1,
-        print_result: bool=False
-    )-> None:
+        print_result: bool=False,
+        episodes: int=1,
+        progress_bar: bool=False,
+        tolerance: float=None,
+        patience: int=10,
+        replay_updates: int=0,
+        batch_size: int=32,
+        replay_capacity: int=10_000
+    )-> EpisodeStats:
         """
         Q-learning function for QAgent.
 
-        This function performs the Q-learning algorithm.
+        This function performs the Q-learning algorithm, 
+        for a batch of episodes.
+
+        With `replay_updates`, every transition is also stored in
+        `replay_buffer`, after which that many minibatch updates
+        on past transitions are performed, every step.
 
         @param alpha: alpha from formula, idk what it does exactly
         @param epsilon: epsilon from formula, idk what it does exactly
         @param gamma: discount value
         @param print_result: whether to print the final values
+        @param episodes: number of episodes to run
+        @param progress_bar: whether to show a progress bar
+        @param tolerance: stop early once no Q-value changes more than
+            this and the greedy policy is stable, @see _run_episodes
+        @param patience: number of stable episodes in a row to stop at
+        @param replay_updates: number of minibatch updates per step,
+            0 for plain Q-learning
+        @param batch_size: number of transitions per minibatch
+        @param replay_capacity: capacity of a newly created `replay_buffer`
+
+        @return EpisodeStats with length, return and max |ΔQ| per episode
         """
-        current_state = self.maze[self.current_coordinate]
-        if current_state not in self.Q:
-            self.Q[current_state] = {action : 0.0 for action in Action}
-        
-        while not current_state.is_terminal:
-            # calculate a
-            action = self._choose_action(
-                self.Q[current_state], 
-                epsilon
+        if replay_updates < 0:
+            raise ValueError(
+                f"`replay_updates` must be at least 0, got {replay_updates}."
             )
-            # calculate s'
-            state_prime = self.maze[
-                self.maze.step(current_state.position, copy.copy(action))
-            ]
-            # calculate r
-            reward = state_prime.reward
+        if replay_updates and self.replay_buffer is None:
+            self.replay_buffer = ReplayBuffer(replay_capacity, self.rng)
+
+        stats = self._run_episodes(
+            episodes, 
+            progress_bar, 
+            self._Q_learning_episode, 
+            alpha, 
+            epsilon, 
+            gamma,
+            replay_updates,
+            batch_size,
+            tolerance=tolerance,
+            patience=patience
+        )
             
+        if print_result:
+            self._print_Q()
+        return stats
+
+    def _print_Q(self)-> None:
+        """
+        Print the Q-values as a table of the maze.
+        """
+        print(f"\033[32m{'─'*57}\n\t\tQ-value matrix\n{'─'*57}\033[0m")
+        table = None
+        # fix colours if assignment maze is inputted
+        try:
+            table = ASCII_table.ASCIITable(
+                Q_to_np_matrix(self.Q, 2, 'unvisited').T[::-1],
+                np.array([
+                    [
+                        ASCII_table.Colours.DEFAULT, 
+                        ASCII_table.Colours.DEFAULT, 
+                        ASCII_table.Colours.DEFAULT, 
+                        ASCII_table.Colours.RED    
+                    ], [
+                        ASCII_table.Colours.DEFAULT, 
+                        ASCII_table.Colours.DEFAULT, 
+                        ASCII_table.Colours.BLUE, 
+                        ASCII_table.Colours.BLUE   
+                    ], [
+                        ASCII_table.Colours.DEFAULT, 
+                        ASCII_table.Colours.DEFAULT, 
+                        ASCII_table.Colours.DEFAULT, 
+                        ASCII_table.Colours.DEFAULT
+                    ], [
+                        ASCII_table.Colours.RED, 
+                        ASCII_table.Colours.DEFAULT, 
+                        ASCII_table.Colours.DEFAULT, 
+                        ASCII_table.Colours.DEFAULT
+                    ],
+                ])
+            )
+        # don't give colours if another shape is passed
+        except:
+            table = ASCII_table.ASCIITable(
+                Q_to_np_matrix(self.Q, 2, 'unvisited').T[::-1]
+            )
+        table.print()
+
+    def _Q_learning_episode(
+        self, 
+        start_state: int,
+        alpha: float,
+        epsilon: float,
+        gamma: float,
+        replay_updates: int=0,
+        batch_size: int=32
+    )-> tuple[int, float, float, int]:
+        """
+        Perform a single episode of Q-learning, without validation.
+
+        @param start_state: id of the state to start in
+        @param alpha: alpha from formula, idk what it does exactly
+        @param epsilon: epsilon from formula, idk what it does exactly
+        @param gamma: discount value
+        @param replay_updates: number of minibatch updates per step
+        @param batch_size: number of transitions per minibatch
+
+        @return tuple[int, float, float, int] with length, return, 
+            max |ΔQ| and number of greedy action changes of the episode
+        """
+        Q = self.Q
+        maze = self.maze
+        terminals = maze.flat_terminals
+        choose_action = bind_hot(self._choose_action)
+        bookkeep = self._bookkeep
+        replay_buffer = self.replay_buffer
+        self._begin_episode()
+
+        current_state = start_state
+        Q.ensure(current_state)
+        
+        while not terminals[current_state]:
+            # calculate a
+            action = choose_action(Q.row(current_state), epsilon)
+            # calculate s' and r
+            state_prime, reward = maze.step_reward_id(current_state, action)
             
             # add to Q if not yet in there
-            if state_prime not in self.Q:
-                self.Q[state_prime] = {action : 0.0 for action in Action}
+            Q.ensure(state_prime)
 
-            # calculate a'
-            
-            action_prime = self._choose_action(
-                self.Q[state_prime],
-                0
-            )
+            # calculate a', which is greedy
+            action_prime = Q.greedy(state_prime)
 
             # Q(s,a) = Q(s,a) + α[r + γQ(s',a') - Q(s,a)]
-            self.Q[current_state][action] += alpha * (
+            delta = alpha * (
                 reward + 
-                (gamma * self.Q[state_prime][action_prime]) - 
-                self.Q[current_state][action]
+                (gamma * Q.value(state_prime, action_prime)) - 
+                Q.value(current_state, action)
             )
+            Q.add(current_state, action, delta)
+            bookkeep(current_state, action, reward, state_prime, delta)
+
+            if replay_updates:
+                replay_buffer.store(
+                    current_state, action, 
+                    reward, state_prime, terminals[state_prime]
+                )
+                self._bookkeep_updates(
+                    *self._replay(alpha, gamma, replay_updates, batch_size)
+                )
 
             # set back current state
             current_state = state_prime
-            
+
+        return self._end_episode()
+
+    def _replay(
+        self,
+        alpha: float,
+        gamma: float,
+        updates: int,
+        batch_size: int
+    )-> tuple[float, int]:
+        """
+        Perform minibatch Q-learning updates on transitions sampled
+        from `replay_buffer`.
+
+        Every minibatch is updated at once, duplicate (s,a) pairs in it
+        accumulate their updates.
+
+        @param alpha: alpha from formula, idk what it does exactly
+        @param gamma: discount value
+        @param updates: number of minibatches
+        @param batch_size: number of transitions per minibatch
+
+        @return tuple[float, int] with the max |ΔQ| of all updates and 
+            the number of greedy action changes, if tracked
+        """
+        Q = self.Q
+        max_delta, policy_changes = 0.0, 0
+        for _ in range(updates):
+            states, actions, rewards, states_prime, terminals = \
+                self.replay_buffer.sample(batch_size)
+
+            # Q(s,a) = Q(s,a) + α[r + γ max_a' Q(s',a') - Q(s,a)]
+            deltas = alpha * (
+                rewards + 
+                gamma * np.where(terminals, 0.0, Q.max_values(states_prime)) - 
+                Q.values_at(states, actions)
+            )
+            Q.add_at(states, actions, deltas)
+            max_delta = max(max_delta, float(np.abs(deltas).max()))
+
+            if self.greedy_actions is not None:
+                policy_changes += self._greedy_changes(states)
+        return max_delta, policy_changes
+
+    @check_annotated
+    def Q_lambda(
+        self, 
+        alpha: Annotated[float, FloatRange(0.0, 1.0)]=0.1,
+        epsilon: Annotated[float, FloatRange(0.0, 1.0)]=0.1,
+        gamma: Annotated[float, FloatRange(0.0, 1.0)]=0.1,
+        lambda_: Annotated[float, FloatRange(0.0, 1.0)]=0.9,
+        print_result: bool=False,
+        episodes: int=1,
+        progress_bar: bool=False,
+        tolerance: float=None,
+        patience: int=10,
+        trace_capacity: int=256
+    )-> EpisodeStats:
+        """
+        Watkins Q(λ) function for QAgent.
+
+        Like Q_learning, but every TD error also updates the recently
+        visited (s,a) pairs, weighted by their eligibility trace, which
+        decays by γλ every step. All traces are cut after an exploratory
+        action. @see eligibilityTraces.py
+
+        @param alpha: alpha from formula, idk what it does exactly
+        @param epsilon: epsilon from formula, idk what it does exactly
+        @param gamma: discount value
+        @param lambda_: trace decay, 0 for one-step Q-learning
+        @param print_result: whether to print the final values
+        @param episodes: number of episodes to run
+        @param progress_bar: whether to show a progress bar
+        @param tolerance: stop early once no Q-value changes more than
+            this and the greedy policy is stable, @see _run_episodes
+        @param patience: number of stable episodes in a row to stop at
+        @param trace_capacity: maximum number of (s,a) pairs with a trace
+
+        @return EpisodeStats with length, return and max |ΔQ| per episode
+        """
+        stats = self._run_episodes(
+            episodes, 
+            progress_bar, 
+            self._Q_lambda_episode, 
+            alpha, 
+            epsilon, 
+            gamma,
+            lambda_,
+            EligibilityTraces(trace_capacity),
+            tolerance=tolerance,
+            patience=patience
+        )
+
         if print_result:
-            print(f"\033[32m{'─'*57}\n\t\tQ-value matrix\n{'─'*57}\033[0m")
-            table = None
-            # fix colours if assignment maze is inputted
-            try:
-                table = ASCII_table.ASCIITable(
-                    Q_to_np_matrix(self.Q, 2, 'unvisited').T[::-1],
-                    np.array([
-                        [
-                            ASCII_table.Colours.DEFAULT, 
-                            ASCII_table.Colours.DEFAULT, 
-                            ASCII_table.Colours.DEFAULT, 
-                            ASCII_table.Colours.RED    
-                        ], [
-                            ASCII_table.Colours.DEFAULT, 
-                            ASCII_table.Colours.DEFAULT, 
-                            ASCII_table.Colours.BLUE, 
-                            ASCII_table.Colours.BLUE   
-                        ], [
-                            ASCII_table.Colours.DEFAULT, 
-                            ASCII_table.Colours.DEFAULT, 
-                            ASCII_table.Colours.DEFAULT, 
-                            ASCII_table.Colours.DEFAULT
-                        ], [
-                            ASCII_table.Colours.RED, 
-                            ASCII_table.Colours.DEFAULT, 
-                            ASCII_table.Colours.DEFAULT, 
-                            ASCII_table.Colours.DEFAULT
-                        ],
-                    ])
-                )
-            # don't give colours if another shape is passed
-            except:
-                table = ASCII_table.ASCIITable(
-                    Q_to_np_matrix(self.Q, 2, 'unvisited').T[::-1]
-                )
-            table.print()
+            self._print_Q()
+        return stats
+
+    def _Q_lambda_episode(
+        self, 
+        start_state: int,
+        alpha: float,
+        epsilon: float,
+        gamma: float,
+        lambda_: float,
+        traces: EligibilityTraces
+    )-> tuple[int, float, float, int]:
+        """
+        Perform a single episode of Watkins Q(λ), without validation.
+
+        @param start_state: id of the state to start in
+        @param alpha: alpha from formula, idk what it does exactly
+        @param epsilon: epsilon from formula, idk what it does exactly
+        @param gamma: discount value
+        @param lambda_: trace decay
+        @param traces: trace storage, cleared at the start
+
+        @return tuple[int, float, float, int] with length, return, 
+            max |ΔQ| and number of greedy action changes of the episode
+        """
+        Q = self.Q
+        maze = self.maze
+        terminals = maze.flat_terminals
+        choose_action = bind_hot(self._choose_action)
+        bookkeep = self._bookkeep
+        self._begin_episode()
+        traces.clear()
+
+        current_state = start_state
+        Q.ensure(current_state)
+        # calculate a
+        action = choose_action(Q.row(current_state), epsilon)
+        while not terminals[current_state]:
+            # calculate s' and r
+            state_prime, reward = maze.step_reward_id(current_state, action)
+            Q.ensure(state_prime)
+
+            # calculate the next action, and a', which is greedy
+            next_action = choose_action(Q.row(state_prime), epsilon)
+            action_prime = Q.greedy(state_prime)
+            if Q.value(state_prime, next_action) == \
+                    Q.value(state_prime, action_prime):
+                action_prime = next_action
+
+            # δ = r + γQ(s',a') - Q(s,a)
+            # Q(s,a) = Q(s,a) + αδe(s,a), for every (s,a) with a trace
+            delta = alpha * (
+                reward + 
+                (gamma * Q.value(state_prime, action_prime)) - 
+                Q.value(current_state, action)
+            )
+            traces.visit(current_state, action)
+            states, actions, values = traces.active()
+            Q.add_at(states, actions, delta * values)
+            bookkeep(current_state, action, reward, state_prime, delta, states)
+
+            # cut the traces after an exploratory action
+            if next_action == action_prime:
+                traces.decay(gamma * lambda_)
+            else:
+                traces.clear()
+
+            # set back current state
+            current_state = state_prime
+            action = next_action
+
+        return self._end_episode()
@@ -1,14 +1,29 @@
-from typing import Annotated
+from typing import Annotated, Callable
 import ASCII_table
 import numpy as np
-import random
+from tqdm import tqdm
 
-from action import Action
 from baseMaze import BaseMaze
 from baseAgent import BaseAgent
-from floatRange import FloatRange, check_annotated
+from baseQTable import BaseQTable
+from denseQTable import DenseQTable
+from dictQTable import DictQTable
+from eligibilityTraces import EligibilityTraces
+from episodeStats import EpisodeStats
+from floatRange import FloatRange, bind_hot, check_annotated
+from hardcodedOptimalPolicy import HardcodedOptimalPolicy
 from helper import Q_to_np_matrix
-from state import State
+from randomStream import RandomStream, get_default_stream
+from sparseQTable import SparseQTable
+from trajectoryRecorder import TrajectoryRecorder
+
+
+# Q-table backends that can be selected by name, @see baseQTable.py
+Q_BACKENDS: dict[str : type[BaseQTable]] = {
+    "dict": DictQTable,
+    "dense": DenseQTable,
+    "sparse": SparseQTable,
+}
 
 
 class SARSAAgent(BaseAgent):
@@ -24,7 +39,10 @@ class SARSAAgent(BaseAgent):
     def __init__(
         self, 
         maze: BaseMaze, 
-        start_coordinate: tuple[int, int]
+        start_coordinate: tuple[int, int],
+        rng: RandomStream=None,
+        q_backend: str | BaseQTable="dict",
+        recorder: TrajectoryRecorder=None
     )-> None:
         """
         @var $maze
@@ -34,35 +52,138 @@ class SARSAAgent(BaseAgent):
         @var $current_coordinate 
         **tuple[int, int]** Current x, y coord of agent.
         @var $Q
-        **dict[State : dict[Action : float]]** values per state in dict.
+        **BaseQTable** Q-values per state, 
+        which reads like dict[State : dict[Action : float]].
+        Backend is selected by `q_backend`, one of Q_BACKENDS, 
+        or an empty BaseQTable for backends with settings.
+        @var $rng
+        **RandomStream** Stream to draw exploration from.
+        Defaults to the shared stream. @see randomStream.py
+        @var $recorder
+        **TrajectoryRecorder** Optional recorder of every transition.
+        @see trajectoryRecorder.py
+        @var $episode_count
+        **int** Number of episodes run so far.
+        @var $greedy_actions
+        **dict[int : int]** Greedy action index per state, for the states
+        whose greedy action is not the first action. Only tracked while
+        training with a `tolerance`, None otherwise.
+        @var $checkpointer
+        **Checkpointer** Optional checkpointer, which is given the chance
+        to save after every episode, and saves at the end of every batch.
+        @see checkpointer.py
+        @var $tally
+        **list** Length, return, max |ΔQ| and number of greedy action
+        changes of the running episode. @see _bookkeep
         """
         super().__init__(maze, None, start_coordinate)
-        self.Q: dict[State : dict[Action : float]] = {}
+        self.rng = rng if rng is not None else get_default_stream()
+        self.recorder = recorder
+        self.episode_count = 0
+        self.greedy_actions: dict[int : int] | None = None
+        self.checkpointer = None
+        self.tally: list = [0, 0.0, 0.0, 0]
+
+        if isinstance(q_backend, BaseQTable):
+            self.Q: BaseQTable = q_backend
+        elif q_backend in Q_BACKENDS:
+            self.Q: BaseQTable = Q_BACKENDS[q_backend](maze)
+        else:
+            raise ValueError(
+                f"Unknown `q_backend` {q_backend}."
+                f" Expected one of {list(Q_BACKENDS)}, or a BaseQTable."
+            )
     
-    @check_annotated
+    @check_annotated(hot=True)
     def _choose_action(
         self, 
-        action_return_dict: dict[Action : float],
+        action_values: np.ndarray,
         epsilon: Annotated[float, FloatRange(0.0, 1.0)]
-    )-> tuple[Action, float]:
+    )-> int:
         """
-        Choose action from dict.
+        Choose action epsilon-greedily from a row of Q-values.
 
-        @param action_return_dict dict with action and return as float
+        @param action_values: Q-value per action index. @see BaseQTable.row
         @param epsilon: epsilon from formula, idk what it does exactly
 
-        @return Action
+        @return int with action index
         """
-        dice_roll = random.random()
-        action = max(action_return_dict, key=action_return_dict.get)
+        dice_roll = self.rng.random()
         if dice_roll < epsilon:
-            action = random.choice([
-                Action.UP, 
-                Action.DOWN, 
-                Action.LEFT, 
-                Action.RIGHT
-            ])
-        return action
+            return self.rng.action_index()
+        return int(action_values.argmax())
+
+    def _run_episodes(
+        self,
+        episodes: int,
+        progress_bar: bool,
+        episode: Callable[..., tuple[int, float, float, int]],
+        *hyperparameters: float,
+        tolerance: float=None,
+        patience: int=10
+    )-> EpisodeStats:
+        """
+        Run a batch of episodes from the start coordinate.
+
+        The start state is looked up once, after which `episode` is called
+        `episodes` times, without any validation or printing in between.
+
+        With a `tolerance`, greedy actions are tracked, and the batch stops
+        early after `patience` episodes in a row in which no Q-value changed
+        more than `tolerance` and no greedy action changed.
+
+        @param episodes: number of episodes to run
+        @param progress_bar: whether to show a tqdm progress bar
+        @param episode: episode function, called with the start state id
+            and `hyperparameters`, returning the length, return, 
+            max |ΔQ| and number of greedy action changes of the episode
+        @param hyperparameters: passed on to `episode`
+        @param tolerance: max |ΔQ| of a converged episode, 
+            None to always run all episodes
+        @param patience: number of converged episodes in a row to stop at
+
+        @return EpisodeStats with statistics per episode
+        """
+        if episodes < 1:
+            raise ValueError(f"`episodes` must be at least 1, got {episodes}.")
+        if patience < 1:
+            raise ValueError(f"`patience` must be at least 1, got {patience}.")
+
+        if tolerance is None:
+            self.greedy_actions = None
+        elif self.greedy_actions is None:
+            self.greedy_actions = {}
+
+        stats = EpisodeStats.empty(episodes)
+        lengths, returns, max_deltas, policy_changes = \
+            stats.lengths, stats.returns, stats.max_deltas, stats.policy_changes
+        start_state = self.maze.get_state_id(self.current_coordinate)
+
+        checkpointer = self.checkpointer
+        indices = tqdm(range(episodes)) if progress_bar else range(episodes)
+        stable = 0
+        for index in indices:
+            lengths[index], returns[index], max_deltas[index], \
+                policy_changes[index] = episode(start_state, *hyperparameters)
+            self.episode_count += 1
+            if checkpointer is not None:
+                checkpointer.maybe_save(self)
+
+            if tolerance is None:
+                continue
+            if max_deltas[index] <= tolerance and policy_changes[index] == 0:
+                stable += 1
+            else:
+                stable = 0
+            if stable == patience:
+                if progress_bar:
+                    indices.close()
+                stats = stats.truncate(index + 1, index + 1 - patience)
+                break
+
+        if checkpointer is not None:
+            checkpointer.save(self)
+        return stats
 
     @check_annotated
     def sarsa(
@@ -70,86 +191,356 @@ class SARSAAgent(BaseAgent):
         alpha: Annotated[float, FloatRange(0.0, 1.0)]=0.1,
         epsilon: Annotated[float, FloatRange(0.0, 1.0)]=0.1,
         gamma: Annotated[float, FloatRange(0.0, 1.0)]=0.1,
-        print_result: bool=False
-    )-> None:
+        print_result: bool=False,
+        episodes: int=1,
+        progress_bar: bool=False,
+        tolerance: float=None,
+        patience: int=10
+    )-> EpisodeStats:
         """
         sarsa function for SARSAAgent.
 
-        This function performs the sarsa algorithm.
+        This function performs the sarsa algorithm, 
+        for a batch of episodes.
 
         @param alpha: alpha from formula, idk what it does exactly
         @param epsilon: epsilon from formula, idk what it does exactly
         @param gamma: discount value
         @param print_result: whether to print the final values
+        @param episodes: number of episodes to run
+        @param progress_bar: whether to show a progress bar
+        @param tolerance: stop early once no Q-value changes more than
+            this and the greedy policy is stable, @see _run_episodes
+        @param patience: number of stable episodes in a row to stop at
+
+        @return EpisodeStats with length, return and max |ΔQ| per episode
         """
-        current_state = self.maze[self.current_coordinate]
-        if current_state not in self.Q:
-            self.Q[current_state] = {action : 0.0 for action in Action}
-        # calculate a
-        action = self._choose_action(
-            self.Q[current_state], 
-            epsilon
+        stats = self._run_episodes(
+            episodes, 
+            progress_bar, 
+            self._sarsa_episode, 
+            alpha, 
+            epsilon, 
+            gamma,
+            tolerance=tolerance,
+            patience=patience
         )
-        while not current_state.is_terminal:
-            # calculate s'
-            state_prime = self.maze[
-                self.maze.step(current_state.position, action)
-            ]
-            # calculate r
-            reward = state_prime.reward
-            
+
+        if print_result:
+            self._print_Q()
+        return stats
+
+    def _print_Q(self)-> None:
+        """
+        Print the Q-values as a table of the maze.
+        """
+        print(f"\033[32m{'─'*57}\n\t\tQ-value matrix\n{'─'*57}\033[0m")
+        table = ASCII_table.ASCIITable(
+            Q_to_np_matrix(self.Q, 2, 'unvisited').T[::-1],
+            np.array([
+                [
+                    ASCII_table.Colours.DEFAULT, 
+                    ASCII_table.Colours.DEFAULT, 
+                    ASCII_table.Colours.DEFAULT, 
+                    ASCII_table.Colours.RED    
+                ], [
+                    ASCII_table.Colours.DEFAULT, 
+                    ASCII_table.Colours.DEFAULT, 
+                    ASCII_table.Colours.BLUE, 
+                    ASCII_table.Colours.BLUE   
+                ], [
+                    ASCII_table.Colours.DEFAULT, 
+                    ASCII_table.Colours.DEFAULT, 
+                    ASCII_table.Colours.DEFAULT, 
+                    ASCII_table.Colours.DEFAULT
+                ], [
+                    ASCII_table.Colours.RED, 
+                    ASCII_table.Colours.DEFAULT, 
+                    ASCII_table.Colours.DEFAULT, 
+                    ASCII_table.Colours.DEFAULT
+                ],
+            ])
+        )
+        table.print()
+
+    def greedy_policy(self)-> HardcodedOptimalPolicy:
+        """
+        Greedy policy of the current Q-values, @see from_q_table
+
+        @return HardcodedOptimalPolicy with an action index per state id
+        """
+        return HardcodedOptimalPolicy.from_q_table(self.Q, self.maze, self.rng)
+
+    def _sarsa_episode(
+        self, 
+        start_state: int,
+        alpha: float,
+        epsilon: float,
+        gamma: float
+    )-> tuple[int, float, float, int]:
+        """
+        Perform a single episode of sarsa, without validation.
+
+        @param start_state: id of the state to start in
+        @param alpha: alpha from formula, idk what it does exactly
+        @param epsilon: epsilon from formula, idk what it does exactly
+        @param gamma: discount value
+
+        @return tuple[int, float, float, int] with length, return, 
+            max |ΔQ| and number of greedy action changes of the episode
+        """
+        Q = self.Q
+        maze = self.maze
+        terminals = maze.flat_terminals
+        choose_action = bind_hot(self._choose_action)
+        bookkeep = self._bookkeep
+        self._begin_episode()
+
+        current_state = start_state
+        Q.ensure(current_state)
+        # calculate a
+        action = choose_action(Q.row(current_state), epsilon)
+        while not terminals[current_state]:
+            # calculate s' and r
+            state_prime, reward = maze.step_reward_id(current_state, action)
             
             # add to Q if not yet in there
-            if state_prime not in self.Q:
-                self.Q[state_prime] = {action : 0.0 for action in Action}
+            Q.ensure(state_prime)
 
             # calculate a'
-            action_prime = self._choose_action(
-                self.Q[state_prime],
-                epsilon
-            )
+            action_prime = choose_action(Q.row(state_prime), epsilon)
 
             # Q(s,a) = Q(s,a) + α[r + γQ(s',a') - Q(s,a)]
-            self.Q[current_state][action] += alpha * (
+            delta = alpha * (
                 reward + 
-                (gamma * self.Q[state_prime][action_prime]) - 
-                self.Q[current_state][action]
+                (gamma * Q.value(state_prime, action_prime)) - 
+                Q.value(current_state, action)
             )
+            Q.add(current_state, action, delta)
+            bookkeep(current_state, action, reward, state_prime, delta)
 
             # set back current state
             current_state = state_prime
             
-            action = self._choose_action(
-                self.Q[current_state], 
-                epsilon
-            )
+            action = choose_action(Q.row(current_state), epsilon)
+
+        return self._end_episode()
+
+    @check_annotated
+    def sarsa_lambda(
+        self, 
+        alpha: Annotated[float, FloatRange(0.0, 1.0)]=0.1,
+        epsilon: Annotated[float, FloatRange(0.0, 1.0)]=0.1,
+        gamma: Annotated[float, FloatRange(0.0, 1.0)]=0.1,
+        lambda_: Annotated[float, FloatRange(0.0, 1.0)]=0.9,
+        print_result: bool=False,
+        episodes: int=1,
+        progress_bar: bool=False,
+        tolerance: float=None,
+        patience: int=10,
+        trace_capacity: int=256
+    )-> EpisodeStats:
+        """
+        SARSA(λ) function for SARSAAgent.
+
+        Like sarsa, but every TD error also updates the recently visited
+        (s,a) pairs, weighted by their eligibility trace, which decays by
+        γλ every step. @see eligibilityTraces.py
+        Unlike sarsa, the next action is the a' of the update.
+
+        @param alpha: alpha from formula, idk what it does exactly
+        @param epsilon: epsilon from formula, idk what it does exactly
+        @param gamma: discount value
+        @param lambda_: trace decay, 0 for one-step SARSA
+        @param print_result: whether to print the final values
+        @param episodes: number of episodes to run
+        @param progress_bar: whether to show a progress bar
+        @param tolerance: stop early once no Q-value changes more than
+            this and the greedy policy is stable, @see _run_episodes
+        @param patience: number of stable episodes in a row to stop at
+        @param trace_capacity: maximum number of (s,a) pairs with a trace
+
+        @return EpisodeStats with length, return and max |ΔQ| per episode
+        """
+        stats = self._run_episodes(
+            episodes, 
+            progress_bar, 
+            self._sarsa_lambda_episode, 
+            alpha, 
+            epsilon, 
+            gamma,
+            lambda_,
+            EligibilityTraces(trace_capacity),
+            tolerance=tolerance,
+            patience=patience
+        )
 
         if print_result:
-            print(f"\033[32m{'─'*57}\n\t\tQ-value matrix\n{'─'*57}\033[0m")
-            table = ASCII_table.ASCIITable(
-                Q_to_np_matrix(self.Q, 2, 'unvisited').T[::-1],
-                np.array([
-                    [
-                        ASCII_table.Colours.DEFAULT, 
-                        ASCII_table.Colours.DEFAULT, 
-                        ASCII_table.Colours.DEFAULT, 
-                        ASCII_table.Colours.RED    
-                    ], [
-                        ASCII_table.Colours.DEFAULT, 
-                        ASCII_table.Colours.DEFAULT, 
-                        ASCII_table.Colours.BLUE, 
-                        ASCII_table.Colours.BLUE   
-                    ], [
-                        ASCII_table.Colours.DEFAULT, 
-                        ASCII_table.Colours.DEFAULT, 
-                        ASCII_table.Colours.DEFAULT, 
-                        ASCII_table.Colours.DEFAULT
-                    ], [
-                        ASCII_table.Colours.RED, 
-                        ASCII_table.Colours.DEFAULT, 
-                        ASCII_table.Colours.DEFAULT, 
-                        ASCII_table.Colours.DEFAULT
-                    ],
-                ])
+            self._print_Q()
+        return stats
+
+    def _sarsa_lambda_episode(
+        self, 
+        start_state: int,
+        alpha: float,
+        epsilon: float,
+        gamma: float,
+        lambda_: float,
+        traces: EligibilityTraces
+    )-> tuple[int, float, float, int]:
+        """
+        Perform a single episode of SARSA(λ), without validation.
+
+        @param start_state: id of the state to start in
+        @param alpha: alpha from formula, idk what it does exactly
+        @param epsilon: epsilon from formula, idk what it does exactly
+        @param gamma: discount value
+        @param lambda_: trace decay
+        @param traces: trace storage, cleared at the start
+
+        @return tuple[int, float, float, int] with length, return, 
+            max |ΔQ| and number of greedy action changes of the episode
+        """
+        Q = self.Q
+        maze = self.maze
+        terminals = maze.flat_terminals
+        choose_action = bind_hot(self._choose_action)
+        bookkeep = self._bookkeep
+        self._begin_episode()
+        traces.clear()
+
+        current_state = start_state
+        Q.ensure(current_state)
+        # calculate a
+        action = choose_action(Q.row(current_state), epsilon)
+        while not terminals[current_state]:
+            # calculate s' and r
+            state_prime, reward = maze.step_reward_id(current_state, action)
+            Q.ensure(state_prime)
+
+            # calculate a'
+            action_prime = choose_action(Q.row(state_prime), epsilon)
+
+            # δ = r + γQ(s',a') - Q(s,a)
+            # Q(s,a) = Q(s,a) + αδe(s,a), for every (s,a) with a trace
+            delta = alpha * (
+                reward + 
+                (gamma * Q.value(state_prime, action_prime)) - 
+                Q.value(current_state, action)
             )
-            table.print()
+            traces.visit(current_state, action)
+            states, actions, values = traces.active()
+            Q.add_at(states, actions, delta * values)
+            bookkeep(current_state, action, reward, state_prime, delta, states)
+
+            traces.decay(gamma * lambda_)
+
+            # set back current state
+            current_state = state_prime
+            action = action_prime
+
+        return self._end_episode()
+
+    def _begin_episode(self)-> None:
+        """
+        Reset `tally`, for the episode that is about to run.
+        """
+        self.tally = [0, 0.0, 0.0, 0]
+
+    def _bookkeep(
+        self,
+        state_id: int,
+        action_index: int,
+        reward: float,
+        state_prime: int,
+        delta: float,
+        state_ids: np.ndarray=None
+    )-> None:
+        """
+        Bookkeeping of a single step of an episode, after its update:
+        record the transition, add it to `tally`, and track the greedy
+        actions of the updated states, if tracked.
+
+        @param state_id: id of the state the action was taken in
+        @param action_index: index of the action
+        @param reward: reward of the next state
+        @param state_prime: id of the next state
+        @param delta: ΔQ of the update, or αδ for a trace update
+        @param state_ids: ids of all updated states, e.g. with a trace,
+            just `state_id` by default
+        """
+        tally = self.tally
+        if self.recorder is not None:
+            self.recorder.record(
+                self.episode_count, tally[0], state_id, action_index,
+                reward, state_prime, self.maze.flat_terminals[state_prime]
+            )
+
+        tally[0] += 1
+        tally[1] += reward
+        if abs(delta) > tally[2]:
+            tally[2] = abs(delta)
+
+        if self.greedy_actions is not None:
+            tally[3] += self._greedy_change(state_id) if state_ids is None \
+                else self._greedy_changes(state_ids)
+
+    def _bookkeep_updates(self, max_delta: float, policy_changes: int)-> None:
+        """
+        Add extra updates within a step to `tally`, e.g. replayed or
+        planned updates.
+
+        @param max_delta: max |ΔQ| of the updates
+        @param policy_changes: number of greedy action changes they caused
+        """
+        tally = self.tally
+        if max_delta > tally[2]:
+            tally[2] = max_delta
+        tally[3] += policy_changes
+
+    def _end_episode(self)-> tuple[int, float, float, int]:
+        """
+        Statistics of the episode that just ran.
+
+        @return tuple[int, float, float, int] with length, return,
+            max |ΔQ| and number of greedy action changes of the episode
+        """
+        return tuple(self.tally)
+
+    def _greedy_action(self, state_id: int)-> int:
+        """
+        Greedy action of a state, as tracked in `greedy_actions`.
+
+        @param state_id: id of a visited state
+
+        @return int with action index
+        """
+        return self.Q.greedy(state_id)
+
+    def _greedy_change(self, state_id: int)-> int:
+        """
+        Update `greedy_actions` for a single updated state.
+
+        @param state_id: id of the updated state
+
+        @return int with 1 if its greedy action changed, 0 otherwise
+        """
+        greedy = self._greedy_action(state_id)
+        if greedy != self.greedy_actions.get(state_id, 0):
+            self.greedy_actions[state_id] = greedy
+            return 1
+        return 0
+
+    def _greedy_changes(self, state_ids: np.ndarray)-> int:
+        """
+        Update `greedy_actions` for a batch of updated states.
+
+        @param state_ids: ids of the updated states, may repeat
+
+        @return int with the number of states whose greedy action changed
+        """
+        greedy_change = self._greedy_change
+        return sum(
+            greedy_change(state_id) 
+            for state_id in np.unique(state_ids).tolist()
+        )
@@ -12,3 +12,11 @@ class Action(Enum):
     DOWN  = (0, -1)
     LEFT  = (-1, 0)
     RIGHT = (1, 0)
+
+
+# Fixed order of the actions, the index of an action in this tuple is used
+# as its column in transition tables and Q-tables.
+ACTIONS: tuple[Action, ...] = tuple(Action)
+ACTION_INDEX: dict[Action, int] = {
+    action: index for index, action in enumerate(ACTIONS)
+}
@@ -1,9 +1,12 @@
+import functools
+
 import ASCII_table
 import numpy as np
-from tqdm import tqdm
 
 from action import Action
-from helper import Q_to_policy_np_matrix
+from denseQTable import DenseQTable
+from helper import Q_to_np_matrix, Q_to_policy_np_matrix
+from parallelTrainer import ParallelTrainer
 from temporalDifferenceAgent import TemporalDifferenceAgent
 from SARSAAgent import SARSAAgent 
 from stochasticMaze import StochasticMaze
@@ -11,15 +14,19 @@ from QAgent import QAgent
 from doubleQAgent import DoubleQAgent 
 from basePolicy import BasePolicy
 from hardcodedOptimalPolicy import HardcodedOptimalPolicy
+from policyEvaluator import PolicyEvaluator
 from stupidMaze import StupidMaze
 
 
-def simulate_base_assignment_A(epochs: int)-> None:
+def simulate_base_assignment_A(epochs: int, n: int=None)-> None:
     """
     Creates maze from assignment.
     Places TemporalDifferenceAgent in maze.
     gives agent optimal Policy.
     Perform Temporal Difference with gamma 1 and .5.
+
+    @param epochs: number of episodes per run
+    @param n: number of steps for n-step TD, None for TD(0)
     """
     maze_shape = (4,4)
     rewards = np.array([
@@ -53,38 +60,69 @@ def simulate_base_assignment_A(epochs: int)-> None:
     )
     policy.visualise(maze)
 
+    # exact values of the policy, to check the TD estimates against,
+    # if scipy is installed
+    try:
+        evaluator = PolicyEvaluator(maze, policy)
+    except ImportError:
+        evaluator = None
+    estimate = agent.values if n is None else agent.state_values
+    evaluated = None if n is None else agent.evaluated
+
     print(f"\033[32m{'─'*65}\n\t\tTemporal Difference, α=.1 γ=1 epoch={epochs}\n{'─'*65}\033[0m")
     agent.policy = policy
+    # n-step TD takes the place of TD(0) when `n` is given
+    temporal_difference = agent.temporal_difference if n is None \
+        else functools.partial(agent.n_step_temporal_difference, n=n)
     for _ in range(epochs-1):
-        agent.temporal_difference(
+        temporal_difference(
             alpha=.1,
             gamma=1,
             print_result=False
         )
-    agent.temporal_difference(
+    temporal_difference(
         alpha=.1,
         gamma=1,
         print_result=True
     )
+    if evaluator is not None:
+        print(
+            f"RMS error against the exact values: "
+            f"{evaluator.rms_error(estimate, 1, evaluated):.4f}"
+        )
 
     print(f"\033[32m{'─'*66}\n\t\tTemporal Difference, α=.1 γ=.5 epoch={epochs}\n{'─'*66}\033[0m")
     for _ in range(epochs-1):
-        agent.temporal_difference(
+        temporal_difference(
             alpha=.1,
             gamma=.5,
             print_result=False
         )
-    agent.temporal_difference(
+    temporal_difference(
             alpha=.1,
             gamma=.5,
             print_result=True
         )
+    if evaluator is not None:
+        print(
+            f"RMS error against the exact values: "
+            f"{evaluator.rms_error(estimate, .5, evaluated):.4f}"
+        )
 
-def simulate_base_assignment_B(epochs: int)-> None:
+def simulate_base_assignment_B(
+    epochs: int, 
+    tolerance: float=None, 
+    patience: int=10
+)-> None:
     """
     Creates maze from assignment.
     Places SARSAAgent in maze.
     Perform SARSA with gamma 1 and .9.
+    Stops early when converged, if a `tolerance` is given.
+
+    @param epochs: number of episodes per run
+    @param tolerance: max |ΔQ| of a converged episode, None to run all epochs
+    @param patience: number of converged episodes in a row to stop at
     """
     maze_shape = (4,4)
     rewards = np.array([
@@ -106,19 +144,18 @@ def simulate_base_assignment_B(epochs: int)-> None:
     #   SARSA with α=.1 ε=.1 γ=1   #
     ################################
     print(f"\033[32m{'─'*65}\n\t\tSARSA, α=.1 ε=.1 γ=1 epoch={epochs}\n{'─'*65}\033[0m")
-    for _ in tqdm(range(epochs-1)):
-        agent.sarsa(
-            alpha=0.1,
-            epsilon=0.1,
-            gamma=1,
-            print_result=False
-        )
-    agent.sarsa(
-            alpha=0.1,
-            epsilon=0.1,
-            gamma=1,
-            print_result=True
-        )
+    stats = agent.sarsa(
+        alpha=0.1,
+        epsilon=0.1,
+        gamma=1,
+        print_result=True,
+        episodes=epochs,
+        progress_bar=True,
+        tolerance=tolerance,
+        patience=patience
+    )
+    if stats.converged_episode is not None:
+        print(f"Converged at episode {stats.converged_episode}")
     print(f"\033[32m{'─'*63}\n\t\tOptimal Policy derived from Q\n{'─'*63}\033[0m")
     policy_table = ASCII_table.ASCIITable(
         Q_to_policy_np_matrix(agent.Q).T[::-1],
@@ -152,19 +189,18 @@ def simulate_base_assignment_B(epochs: int)-> None:
     #   SARSA with α=.1 ε=.1 γ=.9   #
     #################################
     print(f"\033[32m{'─'*65}\n\t\tSARSA, α=.1 ε=.1 γ=.9 epoch={epochs}\n{'─'*65}\033[0m")
-    for _ in tqdm(range(epochs-1)):
-        agent.sarsa(
-            alpha=0.1,
-            epsilon=0.1,
-            gamma=0.9,
-            print_result=False
-        )
-    agent.sarsa(
-            alpha=0.1,
-            epsilon=0.1,
-            gamma=0.9,
-            print_result=True
-        )
+    stats = agent.sarsa(
+        alpha=0.1,
+        epsilon=0.1,
+        gamma=0.9,
+        print_result=True,
+        episodes=epochs,
+        progress_bar=True,
+        tolerance=tolerance,
+        patience=patience
+    )
+    if stats.converged_episode is not None:
+        print(f"Converged at episode {stats.converged_episode}")
     print(f"\033[32m{'─'*63}\n\t\tOptimal Policy derived from Q\n{'─'*63}\033[0m")
     policy_table = ASCII_table.ASCIITable(
         Q_to_policy_np_matrix(agent.Q).T[::-1],
@@ -194,11 +230,20 @@ def simulate_base_assignment_B(epochs: int)-> None:
     )
     policy_table.print()
 
-def simulate_base_assignment_C(epochs: int)-> None:
+def simulate_base_assignment_C(
+    epochs: int, 
+    tolerance: float=None, 
+    patience: int=10
+)-> None:
     """
     Creates maze from assignment.
     Places QAgent in maze.
     Perform Q-learning with gamma 1 and .9.
+    Stops early when converged, if a `tolerance` is given.
+
+    @param epochs: number of episodes per run
+    @param tolerance: max |ΔQ| of a converged episode, None to run all epochs
+    @param patience: number of converged episodes in a row to stop at
     """
     maze_shape = (4,4)
     rewards = np.array([
@@ -220,19 +265,18 @@ def simulate_base_assignment_C(epochs: int)-> None:
     #   SARSA with α=.1 ε=.1 γ=1   #
     ################################
     print(f"\033[32m{'─'*70}\n\t\tQ-learning, α=.1 ε=.1 γ=1 epoch={epochs}\n{'─'*70}\033[0m")
-    for _ in tqdm(range(epochs-1)):
-        agent.Q_learning(
-            alpha=0.1,
-            epsilon=0.1,
-            gamma=1,
-            print_result=False
-        )
-    agent.Q_learning(
-            alpha=0.1,
-            epsilon=0.1,
-            gamma=1,
-            print_result=True
-        )
+    stats = agent.Q_learning(
+        alpha=0.1,
+        epsilon=0.1,
+        gamma=1,
+        print_result=True,
+        episodes=epochs,
+        progress_bar=True,
+        tolerance=tolerance,
+        patience=patience
+    )
+    if stats.converged_episode is not None:
+        print(f"Converged at episode {stats.converged_episode}")
     print(f"\033[32m{'─'*63}\n\t\tOptimal Policy derived from Q\n{'─'*63}\033[0m")
     policy_table = ASCII_table.ASCIITable(
         Q_to_policy_np_matrix(agent.Q).T[::-1],
@@ -266,19 +310,18 @@ def simulate_base_assignment_C(epochs: int)-> None:
     #   SARSA with α=.1 ε=.1 γ=.9   #
     #################################
     print(f"\033[32m{'─'*70}\n\t\tQ-learning, α=.1 ε=.1 γ=.9 epoch={epochs}\n{'─'*70}\033[0m")
-    for _ in tqdm(range(epochs-1)):
-        agent.Q_learning(
-            alpha=0.1,
-            epsilon=0.1,
-            gamma=0.9,
-            print_result=False
-        )
-    agent.Q_learning(
-            alpha=0.1,
-            epsilon=0.1,
-            gamma=0.9,
-            print_result=True
-        )
+    stats = agent.Q_learning(
+        alpha=0.1,
+        epsilon=0.1,
+        gamma=0.9,
+        print_result=True,
+        episodes=epochs,
+        progress_bar=True,
+        tolerance=tolerance,
+        patience=patience
+    )
+    if stats.converged_episode is not None:
+        print(f"Converged at episode {stats.converged_episode}")
     print(f"\033[32m{'─'*63}\n\t\tOptimal Policy derived from Q\n{'─'*63}\033[0m")
     policy_table = ASCII_table.ASCIITable(
         Q_to_policy_np_matrix(agent.Q).T[::-1],
@@ -308,11 +351,20 @@ def simulate_base_assignment_C(epochs: int)-> None:
     )
     policy_table.print()
 
-def simulate_base_assignment_EXTRA_D(epochs: int)-> None:
+def simulate_base_assignment_EXTRA_D(
+    epochs: int, 
+    tolerance: float=None, 
+    patience: int=10
+)-> None:
     """
     Creates stochastic maze.
     Places QAgent in maze.
     Perform Q-learning with gamma 1 and .9.
+    Stops early when converged, if a `tolerance` is given.
+
+    @param epochs: number of episodes per run
+    @param tolerance: max |ΔQ| of a converged episode, None to run all epochs
+    @param patience: number of converged episodes in a row to stop at
     """
     maze_shape = (4,4)
     rewards = np.array([
@@ -334,19 +386,18 @@ def simulate_base_assignment_EXTRA_D(epochs: int)-> None:
     #   Q with α=.1 ε=.1 γ=1   #
     ############################
     print(f"\033[32m{'─'*70}\n\t\tQ-learning, α=.1 ε=.1 γ=1 epoch={epochs}\n{'─'*70}\033[0m")
-    for _ in tqdm(range(epochs-1)):
-        agent.Q_learning(
-            alpha=0.1,
-            epsilon=0.1,
-            gamma=1,
-            print_result=False
-        )
-    agent.Q_learning(
-            alpha=0.1,
-            epsilon=0.1,
-            gamma=1,
-            print_result=True
-        )
+    stats = agent.Q_learning(
+        alpha=0.1,
+        epsilon=0.1,
+        gamma=1,
+        print_result=True,
+        episodes=epochs,
+        progress_bar=True,
+        tolerance=tolerance,
+        patience=patience
+    )
+    if stats.converged_episode is not None:
+        print(f"Converged at episode {stats.converged_episode}")
     print(f"\033[32m{'─'*63}\n\t\tOptimal Policy derived from Q\n{'─'*63}\033[0m")
     policy_table = ASCII_table.ASCIITable(
         Q_to_policy_np_matrix(agent.Q).T[::-1],
@@ -380,19 +431,18 @@ def simulate_base_assignment_EXTRA_D(epochs: int)-> None:
     #   Q with α=.1 ε=.1 γ=.9   #
     #############################
     print(f"\033[32m{'─'*70}\n\t\tQ-learning, α=.1 ε=.1 γ=.9 epoch={epochs}\n{'─'*70}\033[0m")
-    for _ in tqdm(range(epochs-1)):
-        agent.Q_learning(
-            alpha=0.1,
-            epsilon=0.1,
-            gamma=0.9,
-            print_result=False
-        )
-    agent.Q_learning(
-            alpha=0.1,
-            epsilon=0.1,
-            gamma=0.9,
-            print_result=True
-        )
+    stats = agent.Q_learning(
+        alpha=0.1,
+        epsilon=0.1,
+        gamma=0.9,
+        print_result=True,
+        episodes=epochs,
+        progress_bar=True,
+        tolerance=tolerance,
+        patience=patience
+    )
+    if stats.converged_episode is not None:
+        print(f"Converged at episode {stats.converged_episode}")
     print(f"\033[32m{'─'*63}\n\t\tOptimal Policy derived from Q\n{'─'*63}\033[0m")
     policy_table = ASCII_table.ASCIITable(
         Q_to_policy_np_matrix(agent.Q).T[::-1],
@@ -422,11 +472,20 @@ def simulate_base_assignment_EXTRA_D(epochs: int)-> None:
     )
     policy_table.print()
 
-def simulate_base_assignment_EXTRA_E(epochs: int)-> None:
+def simulate_base_assignment_EXTRA_E(
+    epochs: int, 
+    tolerance: float=None, 
+    patience: int=10
+)-> None:
     """
     Creates StupidMaze.
     Places DoubleQAgent in maze.
     Perform double Q-learning with gamma 1 and .9.
+    Stops early when converged, if a `tolerance` is given.
+
+    @param epochs: number of episodes per run
+    @param tolerance: max |ΔQ| of a converged episode, None to run all epochs
+    @param patience: number of converged episodes in a row to stop at
     """
     maze_shape = (4,4)
     rewards = np.array([
@@ -448,19 +507,18 @@ def simulate_base_assignment_EXTRA_E(epochs: int)-> None:
     #   Double Q with α=.1 ε=.1 γ=1   #
     ###################################
     print(f"\033[32m{'─'*77}\n\t\tDouble Q-learning, α=.1 ε=.1 γ=1 epoch={epochs}\n{'─'*77}\033[0m")
-    for _ in tqdm(range(epochs-1)):
-        agent.Q_learning(
-            alpha=0.1,
-            epsilon=0.1,
-            gamma=1,
-            print_result=False
-        )
-    agent.Q_learning(
-            alpha=0.1,
-            epsilon=0.1,
-            gamma=1,
-            print_result=True
-        )
+    stats = agent.Q_learning(
+        alpha=0.1,
+        epsilon=0.1,
+        gamma=1,
+        print_result=True,
+        episodes=epochs,
+        progress_bar=True,
+        tolerance=tolerance,
+        patience=patience
+    )
+    if stats.converged_episode is not None:
+        print(f"Converged at episode {stats.converged_episode}")
     print(f"\033[32m{'─'*63}\n\t\tOptimal Policy derived from Q\n{'─'*63}\033[0m")
     policy_table = ASCII_table.ASCIITable(
         Q_to_policy_np_matrix(agent.Q).T[::-1],
@@ -494,19 +552,18 @@ def simulate_base_assignment_EXTRA_E(epochs: int)-> None:
     #   Double Q with α=.1 ε=.1 γ=.9   #
     ####################################
     print(f"\033[32m{'─'*77}\n\t\tDouble Q-learning, α=.1 ε=.1 γ=.9 epoch={epochs}\n{'─'*77}\033[0m")
-    for _ in tqdm(range(epochs-1)):
-        agent.Q_learning(
-            alpha=0.1,
-            epsilon=0.1,
-            gamma=0.9,
-            print_result=False
-        )
-    agent.Q_learning(
-            alpha=0.1,
-            epsilon=0.1,
-            gamma=0.9,
-            print_result=True
-        )
+    stats = agent.Q_learning(
+        alpha=0.1,
+        epsilon=0.1,
+        gamma=0.9,
+        print_result=True,
+        episodes=epochs,
+        progress_bar=True,
+        tolerance=tolerance,
+        patience=patience
+    )
+    if stats.converged_episode is not None:
+        print(f"Converged at episode {stats.converged_episode}")
     print(f"\033[32m{'─'*63}\n\t\tOptimal Policy derived from Q\n{'─'*63}\033[0m")
     policy_table = ASCII_table.ASCIITable(
         Q_to_policy_np_matrix(agent.Q).T[::-1],
@@ -535,3 +592,55 @@ def simulate_base_assignment_EXTRA_E(epochs: int)-> None:
         ])
     )
     policy_table.print()
+
+def simulate_base_assignment_multi_seed(
+    epochs: int,
+    seeds: list[int],
+    stochastic: bool=False,
+    max_workers: int=None
+)-> None:
+    """
+    Creates maze from assignment, stochastic if asked (C or EXTRA_D).
+    Trains one QAgent per seed, in parallel.
+    Perform Q-learning with gamma 1, 
+    print mean Q-values and learning curve over all seeds.
+    """
+    maze_shape = (4,4)
+    rewards = np.array([
+        [10,  -1,  -1,  -1],
+        [-2,  -1,  -1,  -1],
+        [-1,  -1, -10,  -1],
+        [-1,  -1, -10,  40],
+    ], dtype=int) # reward matrix from assignment
+    maze = StochasticMaze(maze_shape, rewards, probability=0.1) \
+        if stochastic else StupidMaze(maze_shape, rewards)
+    maze.set_terminal((0,0))
+    maze.set_terminal((3,3))
+
+    trainer = ParallelTrainer(
+        QAgent, 
+        maze, 
+        (2,0), 
+        "Q_learning", 
+        {"alpha": 0.1, "epsilon": 0.1, "gamma": 1}, 
+        epochs,
+        max_workers=max_workers
+    )
+    result = trainer.run(seeds)
+
+    print(f"\033[32m{'─'*70}\n\t\tMean Q-values, α=.1 ε=.1 γ=1 epoch={epochs} seeds={len(seeds)}\n{'─'*70}\033[0m")
+    mean_Q = DenseQTable(maze)
+    mean_Q.table[:] = result.Q_band()[0]
+    mean_Q.visited[:] = True
+    ASCII_table.ASCIITable(Q_to_np_matrix(mean_Q, 2).T[::-1]).print()
+    print(f"\033[32m{'─'*63}\n\t\tOptimal Policy derived from mean Q\n{'─'*63}\033[0m")
+    ASCII_table.ASCIITable(Q_to_policy_np_matrix(mean_Q).T[::-1]).print()
+
+    # average the learning curve over the last tenth of the episodes
+    mean, lower, upper = result.learning_curve("returns")
+    tail = slice(-max(1, epochs // 10), None)
+    print(
+        f"Mean return over the last {len(mean[tail])} episodes: "
+        f"{mean[tail].mean():.2f} "
+        f"(95% band {lower[tail].mean():.2f} to {upper[tail].mean():.2f})"
+    )
@@ -1,8 +1,8 @@
-from multipledispatch import dispatch
 import numpy as np
 
-from action import Action
+from action import Action, ACTIONS, ACTION_INDEX
 from state import State
+from transitionModel import TransitionModel
 
 
 class BaseMaze:
@@ -22,8 +22,26 @@ class BaseMaze:
         rewards: np.ndarray
     )-> None:
         """
-        @var $states
-        **np.ndarray** Numpy matrix with all the states.
+        @var $shape
+        **tuple[int, int]** Shape of the grid.
+        @var $n_states
+        **int** Number of states in the grid.
+        @var $rewards
+        **np.ndarray** Float matrix with the reward for entering each state.
+        @var $terminals
+        **np.ndarray** Boolean matrix, True for every terminal state.
+        @var $state_ids
+        **np.ndarray** Integer matrix with the id of each state.
+        @var $flat_rewards
+        **np.ndarray** View on `rewards`, indexed by state id.
+        @var $flat_terminals
+        **np.ndarray** View on `terminals`, indexed by state id.
+        @var $transitions
+        **np.ndarray** (n_states, 4) matrix with the id of the state 
+        reached by each action. @see _build_transitions
+        @var $_transition_model
+        **TransitionModel** Cached exact dynamics, None until they are
+        asked for. @see transition_model
         """
         if grid_shape != rewards.shape:
             raise AttributeError(
@@ -31,73 +49,318 @@ class BaseMaze:
                 f" Expected {grid_shape}, got {rewards.shape}."
         )
 
-        # instantiate `states`, given the provided `grid_shape`
-        self.states = np.empty(shape=grid_shape, dtype=object)
-        for x in range(grid_shape[0]):
-            for y in range(grid_shape[1]):
-                self.states[x,y] = State((x,y), rewards[x,y], False)
-    
-    @dispatch(tuple)
-    def __getitem__(self, coordinate: tuple[int, int])-> State:
+        # the maze is stored as a struct of arrays, `State` objects are 
+        # only created when they are asked for. @see get_state
+        self.shape = tuple(grid_shape)
+        self.n_states = self.shape[0] * self.shape[1]
+        self.rewards = np.array(rewards, dtype=float)
+        self.terminals = np.zeros(self.shape, dtype=bool)
+        self.state_ids = np.arange(self.n_states).reshape(self.shape)
+        self.flat_rewards = self.rewards.reshape(-1)
+        self.flat_terminals = self.terminals.reshape(-1)
+        self.transitions = self._build_transitions()
+        self._transition_model: TransitionModel = None
+
+    def attach_arrays(
+        self, 
+        rewards: np.ndarray, 
+        terminals: np.ndarray
+    )-> None:
         """
-        Indexing dunder method. 
+        Let the maze use existing reward and terminal arrays, 
+        without copying them, e.g. arrays in shared memory.
 
-        This method makes it possible for the maze class 
-        to be indexable, using a tuple with an x and y coordinate.
+        NOTE: changes to the maze are visible to everyone using the arrays.
 
-        @param coordinate: coordinate to get state from
+        @param rewards: float matrix with the shape of the maze
+        @param terminals: boolean matrix with the shape of the maze
+        """
+        if rewards.shape != self.shape or terminals.shape != self.shape:
+            raise AttributeError(
+                f"Arrays do not have the correct shape."
+                f" Expected {self.shape}, got {rewards.shape} and "
+                f"{terminals.shape}."
+            )
+        self.rewards = rewards
+        self.terminals = terminals
+        self.flat_rewards = self.rewards.reshape(-1)
+        self.flat_terminals = self.terminals.reshape(-1)
+        self._transition_model = None
 
-        @return State with state on given coordinates
+    def __getstate__(self)-> dict:
+        """
+        Get the state of the maze for pickling.
+
+        The flat views are left out, such that they are not pickled as
+        copies, and so is the cached transition model. @see __setstate__
+
+        @return dict with member variables
+        """
+        state = self.__dict__.copy()
+        del state["flat_rewards"], state["flat_terminals"]
+        state["_transition_model"] = None
+        return state
+
+    def __setstate__(self, state: dict)-> None:
+        """
+        Restore a pickled maze, and rebuild the flat views.
+
+        @param state: dict with member variables
+        """
+        self.__dict__.update(state)
+        self.flat_rewards = self.rewards.reshape(-1)
+        self.flat_terminals = self.terminals.reshape(-1)
+
+    def _build_transitions(self)-> np.ndarray:
+        """
+        Build the transition table of the maze.
+
+        Row `state_id`, column `ACTION_INDEX[action]` holds the id of the
+        state that is reached by taking `action` in `state_id`.
+        Actions that would leave the grid are invalid and hold -1.
+
+        @return np.ndarray with shape (n_states, 4)
+        """
+        dtype = np.int32 if self.n_states <= np.iinfo(np.int32).max \
+            else np.int64
+        x, y = np.divmod(np.arange(self.n_states, dtype=dtype), self.shape[1])
+
+        transitions = np.empty((self.n_states, len(ACTIONS)), dtype=dtype)
+        for index, action in enumerate(ACTIONS):
+            new_x = x + action.value[0]
+            new_y = y + action.value[1]
+            valid = (new_x >= 0) & (new_x < self.shape[0]) & \
+                (new_y >= 0) & (new_y < self.shape[1])
+            transitions[:, index] = np.where(
+                valid, 
+                new_x * self.shape[1] + new_y, 
+                -1
+            )
+        return transitions
+
+    def _action_probabilities(self)-> np.ndarray:
+        """
+        Probability that each action is performed, given the chosen one.
+
+        Row `a`, column `b` holds the probability that action `b` is 
+        performed when action `a` is chosen. Every action is performed 
+        as chosen in a BaseMaze.
+
+        @return np.ndarray with shape (4, 4)
+        """
+        return np.eye(len(ACTIONS))
+
+    @property
+    def transition_model(self)-> TransitionModel:
+        """
+        Exact dynamics of the maze, P[s, a, s'] and the expected rewards.
+
+        The model is built on first use and cached, until the rewards or 
+        terminals are changed through the setters of the maze.
+        @see _build_transition_model
+
+        NOTE: changes made directly to `rewards` or `terminals`, 
+        e.g. in attached shared memory, are not noticed.
+
+        @return TransitionModel of the maze
+        """
+        if self._transition_model is None:
+            self._transition_model = self._build_transition_model()
+        return self._transition_model
+
+    def _build_transition_model(self)-> TransitionModel:
+        """
+        Build the exact dynamics of the maze, in one pass over all 
+        (s,a) pairs at once.
+
+        Every (s,a) pair gets a candidate next state per performed action,
+        from `self.transitions` and `_action_probabilities`. Candidates 
+        that are impossible, invalid or start in a terminal state are 
+        dropped, and candidates that reach the same state are merged.
+
+        @return TransitionModel with a row per (s,a) pair
+        """
+        n_actions = len(ACTIONS)
+        action_probabilities = self._action_probabilities()
+        index_dtype = self.transitions.dtype
+
+        # candidates[s, a, b]: state reached when `a` is chosen in `s`,
+        # and `b` is performed
+        if (np.count_nonzero(action_probabilities, axis=1) == 1).all():
+            # every chosen action maps to one performed action,
+            # so there is a single candidate per pair
+            performed = action_probabilities.argmax(axis=1)
+            candidates = self.transitions[:, performed].reshape(-1, 1)
+            probabilities = np.broadcast_to(
+                action_probabilities[np.arange(n_actions), performed], 
+                (self.n_states, n_actions)
+            ).reshape(-1, 1)
+        else:
+            candidates = np.broadcast_to(
+                self.transitions[:, None, :], 
+                (self.n_states, n_actions, n_actions)
+            ).reshape(-1, n_actions)
+            probabilities = np.broadcast_to(
+                action_probabilities, 
+                (self.n_states, n_actions, n_actions)
+            ).reshape(-1, n_actions)
+
+        # -1 marks a dropped candidate
+        dropped = (candidates < 0) | (probabilities <= 0) | \
+            np.repeat(self.flat_terminals, n_actions)[:, None]
+        candidates = np.where(dropped, -1, candidates)
+
+        if candidates.shape[1] > 1:
+            # sort candidates per row, such that equal ones are adjacent
+            order = np.argsort(candidates, axis=1)
+            candidates = np.take_along_axis(candidates, order, axis=1)
+            probabilities = np.take_along_axis(probabilities, order, axis=1)
+
+        # first candidate of every run of equal states in a row
+        first = np.ones(candidates.shape, dtype=bool)
+        first[:, 1:] = candidates[:, 1:] != candidates[:, :-1]
+        first &= candidates >= 0
+        starts = np.flatnonzero(first)
+
+        # sum the probabilities of each run. A run is summed up to the next
+        # start, which includes the dropped candidates sorted to the front
+        # of the next row, so those count as 0
+        probabilities = np.where(candidates >= 0, probabilities, 0.0)
+        if candidates.shape[1] > 1 and len(starts):
+            merged = np.add.reduceat(probabilities.reshape(-1), starts)
+        else:
+            merged = probabilities.reshape(-1)[starts]
+        indices = candidates.reshape(-1)[starts].astype(index_dtype)
+
+        counts = first.sum(axis=1)
+        indptr = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=indptr[1:])
+
+        rows = np.repeat(np.arange(len(counts)), counts)
+        rewards = np.bincount(
+            rows, 
+            weights=merged * self.flat_rewards[indices], 
+            minlength=len(counts)
+        )
+        return TransitionModel(
+            n_states=self.n_states,
+            n_actions=n_actions,
+            indptr=indptr,
+            indices=indices,
+            probabilities=merged,
+            rewards=rewards
+        )
+
+    @property
+    def states(self)-> np.ndarray:
+        """
+        Numpy matrix with all the states.
+
+        NOTE: this creates a `State` object for every cell in the maze,
+        so it should only be used for small mazes or visualisation.
+        Use `rewards`, `terminals` and `state_ids` in loops instead.
+
+        @return np.ndarray with a State on every coordinate
+        """
+        states = np.empty(shape=self.shape, dtype=object)
+        for x in range(self.shape[0]):
+            for y in range(self.shape[1]):
+                states[x,y] = self.get_state(self.state_ids[x,y])
+        return states
+
+    def get_state_id(self, coordinate: tuple[int, int])-> int:
+        """
+        Get the id of the state on a given coordinate.
+
+        @param coordinate: coordinate to get the state id from
+
+        @return int with id of the state
         """
         try:
-            return self.states[coordinate]
+            return int(self.state_ids[coordinate])
         except IndexError:
             raise IndexError(
                 f"Index out of range."
-                f" Tried accessing index {coordinate} from `self.states`, "
-                f"which has shape of {self.states.shape}"
+                f" Tried accessing index {coordinate} from `self.state_ids`, "
+                f"which has shape of {self.shape}"
             )
-        except Exception as e:
-            print(f"An unexpected error occurred: {e}")
 
-    @dispatch(State)
-    def __getitem__(self, item: State)-> State:
+    def get_coordinate(self, state_id: int)-> tuple[int, int]:
+        """
+        Get the coordinate of a given state id.
+
+        @param state_id: id of the state
+
+        @return tuple[int, int] with x, y coordinate of the state
+        """
+        return divmod(int(state_id), self.shape[1])
+
+    def get_state(self, state_id: int)-> State:
+        """
+        Create a State view for a given state id.
+
+        The returned State is a snapshot of the maze arrays, 
+        changing it will not change the maze.
+
+        @param state_id: id of the state
+
+        @return State on the coordinate of `state_id`
+        """
+        coordinate = self.get_coordinate(state_id)
+        return State(
+            coordinate, 
+            self.rewards[coordinate].item(), 
+            bool(self.terminals[coordinate])
+        )
+
+    def __getitem__(self, item: tuple[int, int] | State)-> State:
         """
         Indexing dunder method. 
 
-        This method checks if a given state is present in the class.
+        This method makes it possible for the maze class 
+        to be indexable, using a tuple with an x and y coordinate,
+        or a State object to look for.
+        Both are constant time lookups in `self.state_ids`.
         Throws error if `item` is not found.
 
-        @param item: State object to look for
+        @param item: coordinate to get state from, or State to look for
 
-        @return State with requested State
+        @return State with state on given coordinates
         """
-        for row in self.states:
-            for state in row:
-                if state == item:
-                    return state
-        raise IndexError(
-            f"Item not found."
-            f" Looking for State {item} in `self.states`, "
-            f"which was not found in maze:\n {str(self)}"
-        )
+        # coordinates are by far the most common, so they are checked first
+        if type(item) is tuple:
+            return self.get_state(self.get_state_id(item))
+
+        if isinstance(item, State):
+            try:
+                state = self.get_state(self.get_state_id(item.position))
+            except IndexError:
+                state = None
+            if state is not None and state == item:
+                return state
+            raise IndexError(
+                f"Item not found."
+                f" Looking for State {item} in the maze, "
+                f"which was not found in maze:\n {str(self)}"
+            )
+
+        return self.get_state(self.get_state_id(tuple(item)))
 
     def set_rewards(self, rewards: np.ndarray)-> None:
         """
         Setter for rewards in states.
 
-        NOTE: `rewards` must match shape of `self.states`
+        NOTE: `rewards` must match shape of `self.rewards`
 
         @param rewards: matrix with rewards corresponding to states.
         """
-        if self.states.shape != rewards.shape:
+        if self.shape != rewards.shape:
             raise AttributeError(
                 f"`rewards` does not have the correct shape."
-                f" Expected {self.states.shape}, got {rewards.shape}."
+                f" Expected {self.shape}, got {rewards.shape}."
         )
-        for x in range(self.states.shape[0]):
-            for y in range(self.states.shape[1]):
-                self.states.shape[x,y].reward = rewards[x,y]
+        self.rewards[...] = rewards
+        self._transition_model = None
 
     def set_terminal(self, coordinate: tuple[int, int])-> None:
         """
@@ -108,15 +371,53 @@ class BaseMaze:
         @param coordinate: Coordinate of terminal state to be set.
         """
         try:
-            self.states[coordinate].is_terminal = True
+            self.terminals[coordinate] = True
+            self._transition_model = None
         except IndexError:
             raise IndexError(
                 f"Index out of range."
-                f" Tried accessing index {coordinate} from `self.states, "
-                f"which has shape of {self.states.shape}"
+                f" Tried accessing index {coordinate} from `self.terminals`, "
+                f"which has shape of {self.shape}"
+            )
+
+    def step_id(self, state_id: int, action_index: int)-> int:
+        """
+        Step function for Maze, on state ids.
+
+        Looks up the state reached by an action in `self.transitions`.
+        If the action is invalid, an IndexError is raised.
+
+        @param state_id: id of the state where the action is performed.
+        @param action_index: index of the action, @see ACTION_INDEX
+
+        @return int with id of the end state
+        """
+        new_state_id = int(self.transitions[state_id, action_index])
+        if new_state_id < 0:
+            coordinate = self.get_coordinate(state_id)
+            action = ACTIONS[action_index].value
+            raise IndexError(
+                f"This action is invalid. The new coordinate would be "
+                f"{(coordinate[0] + action[0], coordinate[1] + action[1])}, "
+                f"which is out of range in a grid with shape {self.shape}"
             )
-        except Exception as e:
-            print(f"An unexpected error occurred: {e}")
+        return new_state_id
+
+    def step_reward_id(
+        self, 
+        state_id: int, 
+        action_index: int
+    )-> tuple[int, float]:
+        """
+        Step function for Maze, on state ids, along with the reward.
+
+        @param state_id: id of the state where the action is performed.
+        @param action_index: index of the action, @see ACTION_INDEX
+
+        @return tuple[int, float] with id of the end state and reward
+        """
+        new_state_id = self.step_id(state_id, action_index)
+        return new_state_id, self.flat_rewards[new_state_id].item()
 
     def step(
         self, 
@@ -136,29 +437,10 @@ class BaseMaze:
 
         @return tuple[int, int] with end coordinate
         """
-        
-        new_coordinate = tuple(map(sum, zip(start_coordinate, action.value)))
-
-        # `new_coordinate` may not contain negative values
-        if new_coordinate[0] < 0 or new_coordinate[1] < 0:
-             raise IndexError(
-                f"This action is invalid. The new coordinate would be "
-                f"{new_coordinate}, which is out of range in a grid with shape"
-                f" {self.states.shape}"
-            )
-        # `new_coordinate` must be within the bounds of the grid
-        try:
-            self.states[new_coordinate]
-        except IndexError:
-            raise IndexError(
-                f"This action is invalid. The new coordinate would be "
-                f"{new_coordinate}, which is out of range in a grid with shape"
-                f" {self.states.shape}"
-            )
-        except Exception as e:
-            print(f"An unexpected error occurred: {e}")
-        
-        return new_coordinate
+        return self.get_coordinate(self.step_id(
+            self.get_state_id(start_coordinate), 
+            ACTION_INDEX[action]
+        ))
 
     def step_reward(
         self, 
@@ -178,14 +460,17 @@ class BaseMaze:
         @return tuple[tuple[int, int], float] 
             with end coordinate and reward
         """
-        new_coordinate = self.step(start_coordinate, action)
-        return new_coordinate, self[new_coordinate].reward
+        new_state_id, reward = self.step_reward_id(
+            self.get_state_id(start_coordinate), 
+            ACTION_INDEX[action]
+        )
+        return self.get_coordinate(new_state_id), reward
 
     def get_destinations(self, state: State)-> dict[Action: State]:
         """
         Get possible destinations from given State.
 
-        Try all possible actions, 
+        Look up all actions in the transition table, 
         and return with corresponding destinations.
         If state is terminal, no destinations are returned.
 
@@ -198,18 +483,13 @@ class BaseMaze:
         if state.is_terminal:
             return {}
 
-        possible_destinations: dict[Action: State] = {}
-        for action in [
-            Action.UP, 
-            Action.DOWN, 
-            Action.LEFT, 
-            Action.RIGHT
-        ]:
-            try:
-                destination_coord = self.step(state.position, action)
-                possible_destinations[action] = self.states[destination_coord]
-            except:
-                continue
+        possible_destinations: dict[Action: State] = {
+            action: self.get_state(destination_id)
+            for action, destination_id in zip(
+                ACTIONS, 
+                self.transitions[self.get_state_id(state.position)].tolist()
+            ) if destination_id >= 0
+        }
 
         # at least 1 action should be possible from given state, 
         # as we know it to no longer be terminal
@@ -243,29 +523,23 @@ class BaseMaze:
         @return str with stringified current maze
         """
         # base case for the horizontal lines
-        deviding_line = f"{('─' * 18 + '┼') * (self.states.shape[0] - 1)}"\
+        deviding_line = f"{('─' * 18 + '┼') * (self.shape[0] - 1)}"\
         f"{'─' * 18}"
 
         output = f"Maze class, with following grid:"\
         f"\n┌{deviding_line.replace('┼', '┬')}┐\n│ "
 
-        # transform and reverse matrix, 
-        # such that (0, 0) starts in the bottom left
-        reversed_transformed_states = self.states.T[::-1]
-        for y, row in enumerate(reversed_transformed_states[:-1]):
-            for x, state in enumerate(row.tolist()):
-                if (x, self.states.shape[1] - 1 - y) == agent_coordinate:
+        # walk the grid from the top row down, 
+        # such that (0, 0) ends up in the bottom left
+        for y in range(self.shape[1] - 1, -1, -1):
+            for x in range(self.shape[0]):
+                state = self.get_state(self.state_ids[x, y])
+                if (x, y) == agent_coordinate:
                     output += state.__str__(agent_colour) + " │ "
                 else:
                     output += str(state) + " │ "
-            output += f"\n├{deviding_line}┤\n│ "
-
-        # different formatting for last line
-        for x, state in enumerate(reversed_transformed_states[-1].tolist()):
-            if (x, self.states.shape[1] - \
-            reversed_transformed_states.shape[0]) == agent_coordinate:
-                output += state.__str__(agent_colour) + " │ "
-            else:
-                output += str(state) + " │ "
+            if y > 0:
+                output += f"\n├{deviding_line}┤\n│ "
+
         output += f"\n└{deviding_line.replace('┼', '┴')}┘"
         return output
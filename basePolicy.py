@@ -1,7 +1,8 @@
-import random
+import numpy as np
 
-from action import Action
+from action import Action, ACTIONS
 from baseMaze import BaseMaze
+from randomStream import RandomStream, get_default_stream
 from state import State
 
 
@@ -14,14 +15,15 @@ class BasePolicy:
     - select select a random action and return it.
     """
 
-    def __init__(self)-> None:
+    def __init__(self, rng: RandomStream=None)-> None:
         """
         Initializer for BasePolicy.
 
-        This class has no member variables, 
-        meaning the initializer does nothing.
+        @var $rng
+        **RandomStream** Stream to draw random actions from.
+        Defaults to the shared stream. @see randomStream.py
         """
-        pass
+        self.rng = rng if rng is not None else get_default_stream()
 
     def select_action(self, state: State)-> Action:
         """
@@ -34,9 +36,36 @@ class BasePolicy:
 
         @return Action with Action to perform.
         """
-        index = random.randrange(0, 4)
-        return [Action.UP, Action.DOWN, Action.LEFT, Action.RIGHT][index]
+        return ACTIONS[self.rng.action_index()]
     
+    def select_actions(self, state_ids: np.ndarray)-> np.ndarray:
+        """
+        Select the action of a batch of states at once.
+
+        This policy works as follows:
+        - select a random action for every state and return them.
+
+        @param state_ids: ids of the states, of any shape
+
+        @return np.ndarray with an int8 action index per state id
+        """
+        return self.rng.action_indices(np.shape(state_ids)).astype(np.int8)
+
+    def action_probabilities(self, maze: BaseMaze)-> np.ndarray:
+        """
+        Probability of every action in every state of a maze.
+
+        Random actions that are invalid in the maze are drawn again
+        by the agent, so the probabilities are spread over the valid 
+        actions only.
+
+        @param maze: maze to get the probabilities in
+
+        @return np.ndarray with shape (n_states, 4)
+        """
+        valid = (maze.transitions >= 0).astype(float)
+        return valid / np.maximum(valid.sum(axis=1, keepdims=True), 1.0)
+
     def visualise(self, maze: BaseMaze)-> None:
         """
         print current Policy.
@@ -63,10 +92,13 @@ class BasePolicy:
             Action.RIGHT : "►",
             None: "✕"
         }
+        # arrow per action index, with no action at index -1
+        arrows = [action_to_arrow[action] for action in ACTIONS] + \
+            [action_to_arrow[None]]
 
         # base case for the horizontal lines
         deviding_line = \
-            f"{('─' * 16 + '┼') * (maze.states.shape[0] - 1)}"\
+            f"{('─' * 16 + '┼') * (maze.shape[0] - 1)}"\
             f"{'─' * 16}"
 
         output = f"┌{deviding_line.replace('┼', '┬')}┐\n│ "
@@ -74,20 +106,26 @@ class BasePolicy:
         # transform and reverse matrix, 
         # such that (0, 0) starts in the bottom left
         reversed_transformed_states = maze.states.T[::-1]
-        for row in reversed_transformed_states[:-1]:
-            for state in row.tolist():
+        # select the actions of all states at once
+        reversed_transformed_actions = self.select_actions(
+            maze.state_ids.T[::-1]
+        ).tolist()
+        for row, actions in zip(
+            reversed_transformed_states[:-1], 
+            reversed_transformed_actions[:-1]
+        ):
+            for state, action_index in zip(row.tolist(), actions):
                 output += str(state).split('r')[0] + \
-                    "\033[35ma = {:^1}\033[0m │ ".format(
-                        action_to_arrow[self.select_action(state)]
-                    )
+                    "\033[35ma = {:^1}\033[0m │ ".format(arrows[action_index])
             output += f"\n├{deviding_line}┤\n│ "
 
         # different formatting for last line
-        for state in reversed_transformed_states[-1].tolist():
+        for state, action_index in zip(
+            reversed_transformed_states[-1].tolist(), 
+            reversed_transformed_actions[-1]
+        ):
             output += str(state).split('r')[0] + \
-                "\033[35ma = {:^1}\033[0m │ ".format(
-                        action_to_arrow[self.select_action(state)]
-                    )
+                "\033[35ma = {:^1}\033[0m │ ".format(arrows[action_index])
         output += f"\n└{deviding_line.replace('┼', '┴')}┘"
         print(output)
     
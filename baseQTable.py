@@ -0,0 +1,267 @@
+from abc import abstractmethod
+from collections.abc import Mapping
+
+import numpy as np
+
+from action import Action, ACTIONS
+from baseMaze import BaseMaze
+from state import State
+
+
+class BaseQTable(Mapping):
+    """
+    BaseQTable class.
+
+    Base class for the storage of Q-values of an agent.
+    The learning loops work on state ids and action indices,
+    @see ACTION_INDEX, through `ensure`, `row`, `value`, `add` and `greedy`.
+
+    For printing, every Q-table is also a read-only
+    dict[State : dict[Action : float]] of the visited states,
+    such that `helper.Q_to_np_matrix` keeps working on any backend.
+
+    Mapping is an abstract base class already, so a backend that misses
+    one of the abstract methods cannot be instantiated.
+    """
+
+    def __init__(self, maze: BaseMaze)-> None:
+        """
+        @var $maze
+        **BaseMaze** Maze whose state ids index the table.
+        """
+        self.maze = maze
+
+    @abstractmethod
+    def ensure(self, state_id: int)-> None:
+        """
+        Initialise the Q-values of a state to 0,
+        if it has not been visited before.
+
+        @param state_id: id of the visited state
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def row(self, state_id: int)-> np.ndarray:
+        """
+        Get the Q-values of all actions in a state.
+
+        @param state_id: id of a visited state
+
+        @return np.ndarray with 4 Q-values, in the order of ACTIONS
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def value(self, state_id: int, action_index: int)-> float:
+        """
+        Get Q(s,a).
+
+        @param state_id: id of a visited state
+        @param action_index: index of the action
+
+        @return float with Q-value
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def add(self, state_id: int, action_index: int, value: float)-> None:
+        """
+        Add `value` to Q(s,a), in place.
+
+        @param state_id: id of a visited state
+        @param action_index: index of the action
+        @param value: value to add
+        """
+        raise NotImplementedError
+
+    def greedy(self, state_id: int)-> int:
+        """
+        Get the action with the highest Q-value in a state.
+
+        Ties are broken in favour of the first action in ACTIONS.
+
+        @param state_id: id of a visited state
+
+        @return int with action index
+        """
+        return int(self.row(state_id).argmax())
+
+    def values_at(
+        self, 
+        state_ids: np.ndarray, 
+        action_indices: np.ndarray
+    )-> np.ndarray:
+        """
+        Get Q(s,a) for a batch of visited states and actions.
+
+        @param state_ids: ids of visited states
+        @param action_indices: index of the action per state
+
+        @return np.ndarray with a Q-value per pair
+        """
+        return np.array([
+            self.value(state_id, action_index) 
+            for state_id, action_index in zip(
+                state_ids.tolist(), action_indices.tolist()
+            )
+        ], dtype=float)
+
+    def max_values(self, state_ids: np.ndarray)-> np.ndarray:
+        """
+        Get max_a Q(s,a) for a batch of visited states.
+
+        @param state_ids: ids of visited states
+
+        @return np.ndarray with the highest Q-value per state
+        """
+        return np.array(
+            [self.row(state_id).max() for state_id in state_ids.tolist()],
+            dtype=float
+        )
+
+    def add_at(
+        self, 
+        state_ids: np.ndarray, 
+        action_indices: np.ndarray, 
+        values: np.ndarray
+    )-> None:
+        """
+        Add `values` to Q(s,a) for a batch of visited states and actions.
+
+        Values for the same (s,a) pair accumulate, like `np.add.at`.
+
+        @param state_ids: ids of visited states
+        @param action_indices: index of the action per state
+        @param values: value to add per pair
+        """
+        for state_id, action_index, value in zip(
+            state_ids.tolist(), action_indices.tolist(), values.tolist()
+        ):
+            self.add(state_id, action_index, value)
+
+    @abstractmethod
+    def visited_ids(self)-> list[int]:
+        """
+        Get the ids of all visited states, in ascending order.
+
+        @return list[int] with state ids
+        """
+        raise NotImplementedError
+
+    def visited_mask(self)-> np.ndarray:
+        """
+        Get a mask of the visited states.
+
+        NOTE: may be a view on the table, depending on the backend.
+
+        @return np.ndarray with a bool per state id
+        """
+        mask = np.zeros(self.maze.n_states, dtype=bool)
+        mask[self.visited_ids()] = True
+        return mask
+
+    def to_array(self)-> np.ndarray:
+        """
+        Get the Q-values of all states as one matrix.
+
+        Unvisited states have a Q-value of 0.
+        NOTE: may be a view on the table, depending on the backend.
+
+        @return np.ndarray with shape (n_states, 4)
+        """
+        array = np.zeros((self.maze.n_states, len(ACTIONS)))
+        for state_id in self.visited_ids():
+            array[state_id] = self.row(state_id)
+        return array
+
+    def load_array(self, array: np.ndarray, state_ids: list[int])-> None:
+        """
+        Set the Q-values of states from a matrix, e.g. from `to_array`,
+        and mark them as visited. Meant for empty tables.
+
+        @param array: (n_states, 4) matrix with Q-values
+        @param state_ids: ids of the states to set
+        """
+        for state_id in state_ids:
+            self.ensure(state_id)
+            for action_index, value in enumerate(array[state_id].tolist()):
+                self.add(
+                    state_id, 
+                    action_index, 
+                    value - self.value(state_id, action_index)
+                )
+
+    def empty_like(self)-> 'BaseQTable':
+        """
+        Create a new, empty, Q-table with the same backend and settings.
+
+        @return BaseQTable without visited states
+        """
+        return self.__class__(self.maze)
+
+    def _state_id(self, state: State)-> int:
+        """
+        Get the id of a State, if it has been visited.
+
+        @param state: State to look up
+
+        @return int with state id
+        """
+        try:
+            state_id = self.maze.get_state_id(state.position)
+        except IndexError:
+            raise KeyError(state)
+        if not self._is_visited(state_id):
+            raise KeyError(state)
+        return state_id
+
+    def __getitem__(self, state: State)-> dict[Action : float]:
+        """
+        Indexing dunder method.
+
+        @param state: visited State
+
+        @return dict[Action : float] with a copy of the Q-values
+        """
+        return dict(zip(ACTIONS, self.row(self._state_id(state)).tolist()))
+
+    def __iter__(self):
+        """
+        Iterate over the visited states, as State objects.
+        """
+        return (
+            self.maze.get_state(state_id) for state_id in self.visited_ids()
+        )
+
+    def __len__(self)-> int:
+        """
+        Number of visited states.
+        """
+        return len(self.visited_ids())
+
+    def __contains__(self, item: State | int)-> bool:
+        """
+        Check if a State, or state id, has been visited.
+
+        @param item: State or state id
+
+        @return bool with True if visited
+        """
+        if isinstance(item, State):
+            try:
+                item = self.maze.get_state_id(item.position)
+            except IndexError:
+                return False
+        return self._is_visited(item)
+
+    @abstractmethod
+    def _is_visited(self, state_id: int)-> bool:
+        """
+        Check if a state id has been visited.
+
+        @param state_id: id of the state
+
+        @return bool with True if visited
+        """
+        raise NotImplementedError
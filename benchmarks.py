@@ -0,0 +1,247 @@
+import time
+import timeit
+
+import numpy as np
+
+from dynaQAgent import DynaQAgent
+from floatRange import get_validation_mode, set_validation_mode
+from mazePlanner import MazePlanner
+from QAgent import QAgent
+from randomStream import RandomStream
+from state import State
+from stupidMaze import StupidMaze
+
+
+def _legacy_lookup(states: np.ndarray, item: State)-> State:
+    """
+    State lookup as BaseMaze.__getitem__ used to do it.
+
+    Scans every row and cell of an object matrix of States, 
+    until a matching state is found.
+
+    @param states: object matrix with a State on every coordinate
+    @param item: State object to look for
+
+    @return State with requested State
+    """
+    for row in states:
+        for state in row:
+            if state == item:
+                return state
+    raise IndexError(f"Item not found. Looking for State {item}.")
+
+
+def benchmark_state_lookup(
+    grid_shape: tuple[int, int]=(1000, 1000),
+    calls: int=100_000,
+    legacy_calls: int=3
+)-> dict[str, float]:
+    """
+    Microbenchmark for looking up States in a maze.
+
+    Compares the per-call cost of the old linear scan, 
+    dispatched through `multipledispatch` when it is installed, 
+    with the constant time `BaseMaze.__getitem__`.
+    Lookups are done on random coordinates in a StupidMaze.
+
+    @param grid_shape: shape of the maze to benchmark on
+    @param calls: number of calls to time for the new lookups
+    @param legacy_calls: number of calls to time for the old lookup
+
+    @return dict[str, float] with seconds per call, for each lookup
+    """
+    maze = StupidMaze(grid_shape, np.zeros(grid_shape))
+    rng = np.random.default_rng(0)
+    coordinates = [
+        (int(x), int(y)) for x, y in zip(
+            rng.integers(0, grid_shape[0], size=calls),
+            rng.integers(0, grid_shape[1], size=calls)
+        )
+    ]
+    states = [maze[coordinate] for coordinate in coordinates]
+    state_ids = [maze.get_state_id(coordinate) for coordinate in coordinates]
+
+    # the object matrix is what BaseMaze used to keep in memory
+    legacy_states = maze.states
+    legacy_lookup = _legacy_lookup
+    try:
+        from multipledispatch import dispatch
+
+        @dispatch(np.ndarray, State)
+        def legacy_lookup(states: np.ndarray, item: State)-> State:
+            return _legacy_lookup(states, item)
+    except ImportError:
+        pass
+
+    results = {
+        "State, linear scan (before)": timeit.timeit(
+            lambda: [
+                legacy_lookup(legacy_states, state) 
+                for state in states[:legacy_calls]
+            ],
+            number=1
+        ) / legacy_calls,
+        "State, position map (after)": timeit.timeit(
+            lambda: [maze[state] for state in states], 
+            number=1
+        ) / calls,
+        "coordinate, __getitem__": timeit.timeit(
+            lambda: [maze[coordinate] for coordinate in coordinates], 
+            number=1
+        ) / calls,
+        "state id, step_id": timeit.timeit(
+            lambda: [maze.step_id(state_id, 0) for state_id in state_ids], 
+            number=1
+        ) / calls,
+    }
+
+    print(f"\033[32m{'─'*57}\n\t\tState lookup, maze {grid_shape}\n{'─'*57}\033[0m")
+    for name, seconds in results.items():
+        print(f"{name:<30}{seconds * 1e6:>15.3f} µs/call")
+    return results
+
+
+def benchmark_validation(
+    episodes: int=20_000,
+    q_backend: str="dense"
+)-> dict[str, float]:
+    """
+    Benchmark for the step-loop throughput of Q-learning, 
+    for every validation mode of `check_annotated`.
+    @see floatRange.py
+
+    Runs on the 4x4 maze from the assignment, 
+    with the same seed for every mode.
+
+    @param episodes: number of episodes per mode
+    @param q_backend: Q-table backend of the agent
+
+    @return dict[str, float] with steps per second, for each mode
+    """
+    rewards = np.array([
+        [10,  -1,  -1,  -1],
+        [-2,  -1,  -1,  -1],
+        [-1,  -1, -10,  -1],
+        [-1,  -1, -10,  40],
+    ], dtype=int) # reward matrix from assignment
+    previous_mode = get_validation_mode()
+
+    results = {}
+    try:
+        for mode in ["always", "episode", "off"]:
+            maze = StupidMaze(rewards.shape, rewards)
+            maze.set_terminal((0,0))
+            maze.set_terminal((3,3))
+            agent = QAgent(maze, (2,0), RandomStream(0), q_backend)
+
+            set_validation_mode(mode)
+            start = time.perf_counter()
+            stats = agent.Q_learning(
+                alpha=0.1,
+                epsilon=0.1,
+                gamma=1,
+                episodes=episodes
+            )
+            results[mode] = \
+                stats.lengths.sum() / (time.perf_counter() - start)
+    finally:
+        # the validation mode is process wide, never leave it switched
+        set_validation_mode(previous_mode)
+
+    print(f"\033[32m{'─'*57}\n\t\tValidation, {episodes} episodes\n{'─'*57}\033[0m")
+    for mode, steps_per_second in results.items():
+        print(f"{mode:<30}{steps_per_second:>15,.0f} steps/s")
+    return results
+
+
+def _greedy_return(agent: QAgent, gamma: float)-> float:
+    """
+    Discounted return of following the greedy actions of an agent
+    from its start, in a deterministic maze.
+
+    @param agent: agent to follow the Q-values of
+    @param gamma: discount value
+
+    @return float with the return, -inf if no terminal state is reached
+    """
+    maze = agent.maze
+    state_id = maze.get_state_id(agent.current_coordinate)
+    total, discount = 0.0, 1.0
+    for _ in range(maze.n_states):
+        if maze.flat_terminals[state_id]:
+            return total
+        if state_id not in agent.Q:
+            break
+        state_id, reward = maze.step_reward_id(
+            state_id, int(agent.Q.row(state_id).argmax())
+        )
+        total += discount * reward
+        discount *= gamma
+    return -np.inf
+
+
+def benchmark_dyna(
+    grid_shape: tuple[int, int]=(10, 10),
+    seeds: int=5,
+    max_episodes: int=2_000
+)-> dict[str, float]:
+    """
+    Benchmark for the sample efficiency of Dyna-Q.
+
+    Counts the real steps until the greedy path from the start is optimal,
+    for Q-learning, Dyna-Q and Dyna-Q with prioritized sweeping, both with
+    the default number of planning steps. The optimal return comes from
+    value iteration. Runs on a StupidMaze with -1 everywhere and +10 in
+    the terminal corner, starting in the opposite corner.
+
+    @param grid_shape: shape of the maze
+    @param seeds: number of seeds to take the median over
+    @param max_episodes: number of episodes to give up after
+
+    @return dict[str, float] with the median number of real steps,
+        for each algorithm
+    """
+    gamma = 0.9
+    rewards = -np.ones(grid_shape)
+    rewards[-1, -1] = 10
+    terminal = (grid_shape[0] - 1, grid_shape[1] - 1)
+
+    algorithms = {
+        "Q-learning": (QAgent, "Q_learning", {}),
+        "Dyna-Q": (DynaQAgent, "dyna_Q", {}),
+        "Dyna-Q, prioritized": (
+            DynaQAgent, "dyna_Q", {"prioritized": True}
+        ),
+    }
+    results = {}
+    for name, (agent_class, method, kwargs) in algorithms.items():
+        steps = []
+        for seed in range(seeds):
+            maze = StupidMaze(grid_shape, rewards)
+            maze.set_terminal(terminal)
+            optimal = MazePlanner(maze).value_iteration(gamma)[0][0]
+            agent = agent_class(maze, (0,0), RandomStream(seed))
+            learn = getattr(agent, method)
+
+            real_steps = 0
+            for _ in range(max_episodes):
+                stats = learn(
+                    alpha=0.1, epsilon=0.1, gamma=gamma, episodes=1, **kwargs
+                )
+                real_steps += int(stats.lengths.sum())
+                if abs(_greedy_return(agent, gamma) - optimal) < 1e-9:
+                    break
+            steps.append(real_steps)
+        results[name] = float(np.median(steps))
+
+    print(f"\033[32m{'─'*57}\n\t\tDyna-Q, maze {grid_shape}\n{'─'*57}\033[0m")
+    for name, real_steps in results.items():
+        speedup = results["Q-learning"] / real_steps
+        print(f"{name:<30}{real_steps:>12,.0f} steps{speedup:>8.1f}x")
+    return results
+
+
+if __name__ == "__main__":
+    benchmark_state_lookup()
+    benchmark_validation()
+    benchmark_dyna()
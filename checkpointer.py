@@ -0,0 +1,470 @@
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+
+from baseMaze import BaseMaze
+from baseQTable import BaseQTable
+from replayBuffer import ReplayBuffer
+from SARSAAgent import SARSAAgent
+from tabularModel import TabularModel
+
+
+# Arrays of a ReplayBuffer that are stored in a checkpoint
+REPLAY_COLUMNS = ("states", "actions", "rewards", "next_states", "terminals")
+# Rows in the delta segments, relative to the rows of Q, before a new base
+COMPACTION_FACTOR = 4
+
+
+def maze_fingerprint(maze: BaseMaze)-> str:
+    """
+    Fingerprint of a maze, to check that a checkpoint belongs to it.
+
+    Covers the class, shape, rewards, terminals and slip probability.
+
+    @param maze: maze to fingerprint
+
+    @return str with a sha1 hex digest
+    """
+    digest = hashlib.sha1()
+    digest.update(type(maze).__name__.encode())
+    digest.update(np.asarray(maze.shape, dtype=np.int64).tobytes())
+    digest.update(np.ascontiguousarray(maze.rewards, dtype=float).tobytes())
+    digest.update(np.ascontiguousarray(maze.terminals, dtype=bool).tobytes())
+    if hasattr(maze, "probability"):
+        digest.update(np.float64(maze.probability).tobytes())
+    return digest.hexdigest()
+
+
+def changed_rows(values: np.ndarray, snapshot: np.ndarray)-> np.ndarray:
+    """
+    Mask of the rows of a table that differ from a snapshot of it.
+
+    NOTE: a row of up to 8 bools is read as one unsigned int, which is
+    several times faster than `any(axis=1)` on a million rows.
+
+    @param values: current Q-values, shape (n_states, n_actions)
+    @param snapshot: earlier Q-values, same shape
+
+    @return np.ndarray with a bool per row
+    """
+    changed = np.not_equal(values, snapshot)
+    width = changed.shape[1]
+    if width in (1, 2, 4, 8):
+        return changed.view(f"u{width}")[:, 0] != 0
+    return changed.any(axis=1)
+
+
+class Checkpointer:
+    """
+    Checkpointer class.
+
+    Writes the full training state of an agent to `.npz` files:
+    Q (and Q_two), the random streams of the agent and the maze, the episode
+    counter, the replay buffer, the model and queue of a DynaQAgent, the
+    tracked greedy actions and the maze fingerprint. An agent restored with
+    `load` continues bit-identically.
+
+    The first save writes a base checkpoint to `path`, with all Q-values.
+    Later saves write a delta segment next to it, with only the rows of Q
+    that changed or were visited since the previous save, plus the rest of
+    the state, which includes the model of a DynaQAgent in full.
+    `load` merges the segments into the base. Once the segments hold
+    `COMPACTION_FACTOR` times more rows than the tables themselves, or
+    there are `max_segments` of them, the next save writes a new base.
+    Changed rows are found by comparing against a copy of the last saved
+    Q-values, so the learning loops do not keep track of them.
+    For a dense 1000x1000 maze, a segment with 100k changed rows takes
+    about 35 ms, well under 1% of the default interval of 5 seconds.
+
+    Every file is written to a temporary file first, which then replaces
+    it, so an interrupted write never corrupts the last checkpoint.
+    Segments carry the generation stamp of their base, such that leftover
+    segments of an older base are never merged.
+
+    Agents with `checkpointer` set call `maybe_save` after every episode,
+    which only writes once every `interval` seconds.
+    """
+
+    def __init__(
+        self, 
+        path: str, 
+        interval: float=5.0,
+        max_segments: int=64
+    )-> None:
+        """
+        @var $path
+        **str** Path of the base checkpoint file.
+        @var $interval
+        **float** Minimal number of seconds between periodic checkpoints.
+        @var $max_segments
+        **int** Maximum number of delta segments on a base.
+        @var $last_save
+        **float** `time.monotonic` of the last checkpoint.
+        @var $generation
+        **int** `time.time_ns` of the base checkpoint, 0 before the first.
+        @var $segments
+        **int** Number of delta segments written on the base.
+        @var $delta_rows
+        **int** Number of rows in all delta segments on the base.
+        @var $snapshots
+        **dict[str : tuple[np.ndarray, np.ndarray]]** Q-values and visited
+        mask per table, as of the last save. None before the first save.
+        """
+        self.path = path
+        self.interval = interval
+        self.max_segments = max_segments
+        self.last_save = time.monotonic()
+        self.generation = 0
+        self.segments = 0
+        self.delta_rows = 0
+        self.snapshots: dict[str : tuple[np.ndarray, np.ndarray]] | None = \
+            None
+
+    def maybe_save(self, agent: SARSAAgent)-> bool:
+        """
+        Save a checkpoint, if the last one is at least `interval` old.
+
+        @param agent: agent to checkpoint
+
+        @return bool with True if a checkpoint was written
+        """
+        if time.monotonic() - self.last_save < self.interval:
+            return False
+        self.save(agent)
+        return True
+
+    def save(self, agent: SARSAAgent, full: bool=False)-> None:
+        """
+        Atomically write a checkpoint of an agent, 
+        as a delta segment if possible.
+
+        @param agent: agent to checkpoint
+        @param full: whether to write a new base, even if a segment would do
+        """
+        tables = self._tables(agent)
+        if full or self._needs_base(tables):
+            self._save_base(agent, tables)
+        else:
+            self._save_segment(agent, tables)
+        self.last_save = time.monotonic()
+
+    def segment_path(self, segment: int)-> str:
+        """
+        Path of a delta segment of the base at `path`.
+
+        @param segment: number of the segment, starting at 1
+
+        @return str with the path
+        """
+        return f"{self.path}.{segment}.delta"
+
+    @staticmethod
+    def _tables(agent: SARSAAgent)-> dict[str : BaseQTable]:
+        """
+        Q-tables of an agent, by attribute name.
+
+        @param agent: agent to get the tables of
+
+        @return dict[str : BaseQTable] with Q, and Q_two if the agent has it
+        """
+        tables = {"Q": agent.Q}
+        if getattr(agent, "Q_two", None) is not None:
+            tables["Q_two"] = agent.Q_two
+        return tables
+
+    def _needs_base(self, tables: dict[str : BaseQTable])-> bool:
+        """
+        Check whether the next save must write a new base.
+
+        @param tables: Q-tables to save
+
+        @return bool with True for a base, False for a delta segment
+        """
+        if self.snapshots is None or set(self.snapshots) != set(tables):
+            return True
+        if any(
+            len(self.snapshots[name][0]) != table.maze.n_states
+            for name, table in tables.items()
+        ):
+            return True
+        rows = sum(table.maze.n_states for table in tables.values())
+        return (
+            self.segments >= self.max_segments 
+            or self.delta_rows > COMPACTION_FACTOR * rows
+        )
+
+    def _save_base(
+        self, 
+        agent: SARSAAgent, 
+        tables: dict[str : BaseQTable]
+    )-> None:
+        """
+        Write a new base checkpoint with all Q-values, 
+        and remove the segments of the previous one.
+
+        @param agent: agent to checkpoint
+        @param tables: Q-tables of the agent
+        """
+        arrays = self._state_arrays(agent)
+        arrays["fingerprint"] = np.array(maze_fingerprint(agent.maze))
+        # time stamp, unique per base, so stale segments never match it
+        generation = time.time_ns()
+        arrays["generation"] = np.array(generation)
+
+        snapshots = {}
+        for name, table in tables.items():
+            values = np.array(table.to_array())
+            visited = np.array(table.visited_mask())
+            arrays[name] = values
+            arrays[f"{name}_visited"] = np.flatnonzero(visited)
+            snapshots[name] = (values, visited)
+
+        self._write(self.path, arrays)
+        segment = 1
+        while os.path.exists(self.segment_path(segment)):
+            os.remove(self.segment_path(segment))
+            segment += 1
+        self.generation = generation
+        self.segments = 0
+        self.delta_rows = 0
+        self.snapshots = snapshots
+
+    def _save_segment(
+        self, 
+        agent: SARSAAgent, 
+        tables: dict[str : BaseQTable]
+    )-> None:
+        """
+        Write a delta segment, with the rows of Q that changed or were 
+        visited since the last save.
+
+        @param agent: agent to checkpoint
+        @param tables: Q-tables of the agent
+        """
+        arrays = self._state_arrays(agent)
+        arrays["generation"] = np.array(self.generation)
+
+        for name, table in tables.items():
+            snapshot, snapshot_visited = self.snapshots[name]
+            values = table.to_array()
+            visited = table.visited_mask()
+            state_ids = np.flatnonzero(
+                changed_rows(values, snapshot) | (visited & ~snapshot_visited)
+            )
+            rows = values[state_ids]
+            arrays[f"{name}_ids"] = state_ids
+            arrays[f"{name}_rows"] = rows
+            snapshot[state_ids] = rows
+            snapshot_visited[state_ids] = True
+            self.delta_rows += len(state_ids)
+
+        self._write(self.segment_path(self.segments + 1), arrays)
+        self.segments += 1
+
+    @staticmethod
+    def _state_arrays(agent: SARSAAgent)-> dict[str : np.ndarray]:
+        """
+        Everything but the Q-values of a checkpoint, which is small enough
+        to be written in full every time.
+
+        @param agent: agent to checkpoint
+
+        @return dict[str : np.ndarray] with arrays by name
+        """
+        arrays = {"episode_count": np.array(agent.episode_count)}
+
+        streams = {
+            "rng": agent.rng, 
+            "maze_rng": getattr(agent.maze, "rng", None)
+        }
+        for name, stream in streams.items():
+            if stream is None:
+                continue
+            state = stream.get_state()
+            arrays[f"{name}_bit_generator"] = np.array(
+                json.dumps(state["bit_generator"])
+            )
+            arrays[f"{name}_uniforms"] = state["uniforms"]
+            arrays[f"{name}_action_indices"] = state["action_indices"]
+
+        replay_buffer = getattr(agent, "replay_buffer", None)
+        if replay_buffer is not None:
+            for name in REPLAY_COLUMNS:
+                arrays[f"replay_{name}"] = getattr(replay_buffer, name)
+            arrays["replay_cursor"] = np.array(
+                [replay_buffer.size, replay_buffer.position]
+            )
+
+        # model and prioritized sweeping queue of a DynaQAgent
+        model = getattr(agent, "model", None)
+        if model is not None:
+            for name, array in model.to_arrays().items():
+                arrays[f"model_{name}"] = array
+            arrays["queue"] = np.array(agent.queue, dtype=float).reshape(-1, 3)
+            arrays["priority_pairs"] = np.array(
+                list(agent.priorities.keys()), dtype=np.int64
+            ).reshape(-1, 2)
+            arrays["priority_values"] = np.fromiter(
+                agent.priorities.values(), dtype=float
+            )
+
+        if agent.greedy_actions is not None:
+            arrays["greedy_ids"] = np.fromiter(
+                agent.greedy_actions.keys(), dtype=np.int64
+            )
+            arrays["greedy_actions"] = np.fromiter(
+                agent.greedy_actions.values(), dtype=np.int64
+            )
+        return arrays
+
+    @staticmethod
+    def _write(path: str, arrays: dict[str : np.ndarray])-> None:
+        """
+        Atomically write arrays to an `.npz` file.
+
+        @param path: path of the file
+        @param arrays: arrays by name
+        """
+        temporary_path = f"{path}.tmp"
+        with open(temporary_path, "wb") as file:
+            np.savez(file, **arrays)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary_path, path)
+
+    def load(self, agent: SARSAAgent)-> int:
+        """
+        Restore an agent from the base checkpoint and its segments.
+
+        The agent must have been created like the checkpointed one,
+        in a maze with the same fingerprint. Later saves continue
+        writing segments on the same base.
+
+        @param agent: agent to restore, in place
+
+        @return int with the restored episode counter
+        """
+        snapshots = {}
+        with np.load(self.path) as checkpoint:
+            fingerprint = maze_fingerprint(agent.maze)
+            if str(checkpoint["fingerprint"]) != fingerprint:
+                raise ValueError(
+                    f"Checkpoint {self.path} was written for a different maze."
+                )
+            generation = int(checkpoint["generation"]) \
+                if "generation" in checkpoint else 0
+
+            for name in ("Q", "Q_two"):
+                if name not in checkpoint:
+                    continue
+                if not hasattr(agent, name):
+                    raise AttributeError(
+                        f"Checkpoint {self.path} has `{name}`,"
+                        f" which {type(agent).__name__} does not have."
+                    )
+                values = np.array(checkpoint[name])
+                visited = np.zeros(len(values), dtype=bool)
+                visited[checkpoint[f"{name}_visited"]] = True
+                snapshots[name] = (values, visited)
+            self._restore_state(agent, checkpoint)
+
+        # merge the segments of this base, in order
+        segment, delta_rows = 0, 0
+        while os.path.exists(self.segment_path(segment + 1)):
+            with np.load(self.segment_path(segment + 1)) as delta:
+                if int(delta["generation"]) != generation:
+                    break
+                for name, (values, visited) in snapshots.items():
+                    state_ids = delta[f"{name}_ids"]
+                    values[state_ids] = delta[f"{name}_rows"]
+                    visited[state_ids] = True
+                    delta_rows += len(state_ids)
+                self._restore_state(agent, delta)
+            segment += 1
+
+        for name, (values, visited) in snapshots.items():
+            table = getattr(agent, name).empty_like()
+            table.load_array(values, np.flatnonzero(visited).tolist())
+            setattr(agent, name, table)
+
+        self.generation = generation
+        self.segments = segment
+        self.delta_rows = delta_rows
+        self.snapshots = {
+            name: (values.copy(), visited.copy())
+            for name, (values, visited) in snapshots.items()
+        }
+        return agent.episode_count
+
+    @staticmethod
+    def _restore_state(
+        agent: SARSAAgent, 
+        checkpoint: np.lib.npyio.NpzFile
+    )-> None:
+        """
+        Restore everything but the Q-values, from a base or a segment.
+
+        @param agent: agent to restore, in place
+        @param checkpoint: opened checkpoint file
+        """
+        streams = {
+            "rng": agent.rng,
+            "maze_rng": getattr(agent.maze, "rng", None)
+        }
+        for name, stream in streams.items():
+            if stream is None or f"{name}_bit_generator" not in checkpoint:
+                continue
+            stream.set_state({
+                "bit_generator": json.loads(
+                    str(checkpoint[f"{name}_bit_generator"])
+                ),
+                "uniforms": checkpoint[f"{name}_uniforms"],
+                "action_indices": checkpoint[f"{name}_action_indices"],
+            })
+
+        if "replay_cursor" in checkpoint:
+            replay_buffer = agent.replay_buffer
+            capacity = len(checkpoint["replay_states"])
+            if replay_buffer is None or \
+                    replay_buffer.capacity != capacity:
+                replay_buffer = ReplayBuffer(capacity, agent.rng)
+                agent.replay_buffer = replay_buffer
+            for name in REPLAY_COLUMNS:
+                getattr(replay_buffer, name)[:] = \
+                    checkpoint[f"replay_{name}"]
+            replay_buffer.size, replay_buffer.position = \
+                checkpoint["replay_cursor"].tolist()
+
+        if "model_pairs" in checkpoint:
+            if not hasattr(agent, "model"):
+                raise AttributeError(
+                    f"Checkpoint has a model,"
+                    f" which {type(agent).__name__} does not have."
+                )
+            agent.model = TabularModel()
+            agent.model.load_arrays({
+                name[len("model_"):]: checkpoint[name]
+                for name in checkpoint.files if name.startswith("model_")
+            })
+            queue = checkpoint["queue"]
+            # the list is stored as is, so it still satisfies the heap order
+            agent.queue = list(zip(
+                queue[:, 0].tolist(),
+                queue[:, 1].astype(np.int64).tolist(),
+                queue[:, 2].astype(np.int64).tolist()
+            ))
+            agent.priorities = dict(zip(
+                map(tuple, checkpoint["priority_pairs"].tolist()),
+                checkpoint["priority_values"].tolist()
+            ))
+
+        if "greedy_ids" in checkpoint:
+            agent.greedy_actions = dict(zip(
+                checkpoint["greedy_ids"].tolist(),
+                checkpoint["greedy_actions"].tolist()
+            ))
+
+        agent.episode_count = int(checkpoint["episode_count"])
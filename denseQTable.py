@@ -0,0 +1,82 @@
+import numpy as np
+
+from action import ACTIONS
+from baseMaze import BaseMaze
+from baseQTable import BaseQTable
+
+
+class DenseQTable(BaseQTable):
+    """
+    DenseQTable class.
+
+    Q-table that stores all Q-values in one (n_states, 4) float matrix.
+    Greedy actions are found with argmax and updates are done in place.
+
+    Extends BaseQTable class
+    @see baseQTable.py
+    """
+
+    def __init__(self, maze: BaseMaze)-> None:
+        """
+        @var $maze
+        **BaseMaze** Maze whose state ids index the table.
+        @var $table
+        **np.ndarray** (n_states, 4) matrix with Q-values.
+        @var $visited
+        **np.ndarray** Boolean vector, True for every visited state.
+        """
+        super().__init__(maze)
+        self.table = np.zeros((maze.n_states, len(ACTIONS)))
+        self.visited = np.zeros(maze.n_states, dtype=bool)
+
+    def ensure(self, state_id: int)-> None:
+        self.visited[state_id] = True
+
+    def row(self, state_id: int)-> np.ndarray:
+        return self.table[state_id]
+
+    def value(self, state_id: int, action_index: int)-> float:
+        return self.table[state_id, action_index].item()
+
+    def add(self, state_id: int, action_index: int, value: float)-> None:
+        self.table[state_id, action_index] += value
+
+    def greedy(self, state_id: int)-> int:
+        return int(self.table[state_id].argmax())
+
+    def values_at(
+        self, 
+        state_ids: np.ndarray, 
+        action_indices: np.ndarray
+    )-> np.ndarray:
+        return self.table[state_ids, action_indices]
+
+    def max_values(self, state_ids: np.ndarray)-> np.ndarray:
+        return self.table[state_ids].max(axis=1)
+
+    def add_at(
+        self, 
+        state_ids: np.ndarray, 
+        action_indices: np.ndarray, 
+        values: np.ndarray
+    )-> None:
+        np.add.at(self.table, (state_ids, action_indices), values)
+
+    def visited_ids(self)-> list[int]:
+        return np.flatnonzero(self.visited).tolist()
+
+    def visited_mask(self)-> np.ndarray:
+        return self.visited
+
+    def to_array(self)-> np.ndarray:
+        return self.table
+
+    def load_array(self, array: np.ndarray, state_ids: list[int])-> None:
+        self.table[state_ids] = array[state_ids]
+        self.visited[state_ids] = True
+
+    def _is_visited(self, state_id: int)-> bool:
+        return bool(self.visited[state_id])
+
+    def __len__(self)-> int:
+        return int(self.visited.sum())
@@ -0,0 +1,70 @@
+import numpy as np
+
+from action import Action, ACTIONS
+from baseMaze import BaseMaze
+from baseQTable import BaseQTable
+from state import State
+
+
+class DictQTable(BaseQTable):
+    """
+    DictQTable class.
+
+    Q-table that stores a row of 4 Q-values per visited state in a dict,
+    the way agents have always stored their Q-values, keyed by state id.
+    Rows are created lazily, on the first visit of a state, and are
+    small arrays, such that `row` returns them without building a new one.
+
+    Extends BaseQTable class
+    @see baseQTable.py
+    """
+
+    def __init__(self, maze: BaseMaze)-> None:
+        """
+        @var $maze
+        **BaseMaze** Maze whose state ids index the table.
+        @var $rows
+        **dict[int : np.ndarray]** Q-values per visited state id, 
+        in the order of ACTIONS.
+        """
+        super().__init__(maze)
+        self.rows: dict[int : np.ndarray] = {}
+
+    def ensure(self, state_id: int)-> None:
+        if state_id not in self.rows:
+            self.rows[state_id] = np.zeros(len(ACTIONS))
+
+    def row(self, state_id: int)-> np.ndarray:
+        return self.rows[state_id]
+
+    def value(self, state_id: int, action_index: int)-> float:
+        return self.rows[state_id].item(action_index)
+
+    def add(self, state_id: int, action_index: int, value: float)-> None:
+        self.rows[state_id][action_index] += value
+
+    def greedy(self, state_id: int)-> int:
+        return int(self.rows[state_id].argmax())
+
+    def visited_ids(self)-> list[int]:
+        return sorted(self.rows)
+
+    def load_array(self, array: np.ndarray, state_ids: list[int])-> None:
+        for state_id in state_ids:
+            self.rows[state_id] = np.array(array[state_id], dtype=float)
+
+    def _is_visited(self, state_id: int)-> bool:
+        return state_id in self.rows
+
+    def __getitem__(self, state: State)-> dict[Action : float]:
+        """
+        Indexing dunder method.
+
+        @param state: visited State
+
+        @return dict[Action : float] with a copy of the Q-values
+        """
+        return dict(zip(ACTIONS, self.rows[self._state_id(state)].tolist()))
+
+    def __len__(self)-> int:
+        return len(self.rows)
@@ -1,21 +1,26 @@
-import copy
 from typing import Annotated
 import ASCII_table
 import numpy as np
-import random
 
-from action import Action
 from baseMaze import BaseMaze
 from QAgent import QAgent
-from floatRange import FloatRange, check_annotated
+from floatRange import FloatRange, bind_hot, check_annotated
 from helper import Q_to_np_matrix
-from state import State
+from episodeStats import EpisodeStats
+from randomStream import RandomStream
+from trajectoryRecorder import TrajectoryRecorder
+from baseQTable import BaseQTable
+from eligibilityTraces import EligibilityTraces
+from hardcodedOptimalPolicy import HardcodedOptimalPolicy
 
 
 class DoubleQAgent(QAgent):
     """
     Double Q-learning agent.
 
+    Q_lambda is inherited, and runs double Q(λ) on both tables.
+    @see _Q_lambda_episode
+
     Extends QAgent class
     @see QAgent.py
     """
@@ -23,7 +28,10 @@ class DoubleQAgent(QAgent):
     def __init__(
         self, 
         maze: BaseMaze, 
-        start_coordinate: tuple[int, int]
+        start_coordinate: tuple[int, int],
+        rng: RandomStream=None,
+        q_backend: str | BaseQTable="dict",
+        recorder: TrajectoryRecorder=None
     )-> None:
         """
         @var $maze
@@ -33,12 +41,19 @@ class DoubleQAgent(QAgent):
         @var $current_coordinate 
         **tuple[int, int]** Current x, y coord of agent.
         @var $Q
-        **dict[State : dict[Action : float]]** values per state in dict.
+        **BaseQTable** Q-values per state, 
+        which reads like dict[State : dict[Action : float]].
+        Backend is selected by `q_backend`, one of Q_BACKENDS, 
+        or an empty BaseQTable for backends with settings.
+        @var $rng
+        **RandomStream** Stream to draw exploration and coin flips from.
+        @var $recorder
+        **TrajectoryRecorder** Optional recorder of every transition.
         @var $Q_two
-        **dict[State : dict[Action : float]]** values per state in dict.
+        **BaseQTable** Second table of Q-values, same backend as `Q`.
         """
-        super().__init__(maze, start_coordinate)
-        self.Q_two: dict[State : dict[Action : float]] = {}
+        super().__init__(maze, start_coordinate, rng, q_backend, recorder)
+        self.Q_two: BaseQTable = self.Q.empty_like()
     
     @check_annotated
     def Q_learning(
@@ -46,69 +61,40 @@ class DoubleQAgent(QAgent):
         alpha: Annotated[float, FloatRange(0.0, 1.0)]=0.1,
         epsilon: Annotated[float, FloatRange(0.0, 1.0)]=0.1,
         gamma: Annotated[float, FloatRange(0.0, 1.0)]=0.1,
-        print_result: bool=False
-    )-> None:
+        print_result: bool=False,
+        episodes: int=1,
+        progress_bar: bool=False,
+        tolerance: float=None,
+        patience: int=10
+    )-> EpisodeStats:
         """
         Double Q-learning function for QAgent.
 
-        This function performs the double Q-learning algorithm.
+        This function performs the double Q-learning algorithm, 
+        for a batch of episodes.
 
         @param alpha: alpha from formula, idk what it does exactly
         @param epsilon: epsilon from formula, idk what it does exactly
         @param gamma: discount value
         @param print_result: whether to print the final values
-        """
-        current_state = self.maze[self.current_coordinate]
-        if current_state not in self.Q:
-            self.Q[current_state] = {action : 0.0 for action in Action}
-            self.Q_two[current_state] = {action : 0.0 for action in Action}
-        
-        while not current_state.is_terminal:
-            # calculate a
-            action = self._choose_action(
-                {
-                    key: 
-                    self.Q[current_state][key] + 
-                    self.Q_two[current_state][key] 
-                    for key in self.Q[current_state]
-                },
-                epsilon
-            )
-
-            # calculate s'
-            state_prime = self.maze[
-                self.maze.step(current_state.position, copy.copy(action))
-            ]
-            # calculate r
-            reward = state_prime.reward
-            
-            # add to Q if not yet in there
-            if state_prime not in self.Q:
-                self.Q[state_prime] = {action : 0.0 for action in Action}
-                self.Q_two[state_prime] = {action : 0.0 for action in Action}
-
-            # choose Q1 or Q2
-            q_ref = None
-            if bool(random.getrandbits(1)):
-                q_ref = self.Q_two
-            else:
-                q_ref = self.Q
+        @param episodes: number of episodes to run
+        @param progress_bar: whether to show a progress bar
+        @param tolerance: stop early once no Q-value changes more than
+            this and the greedy policy is stable, @see _run_episodes
+        @param patience: number of stable episodes in a row to stop at
 
-            # calculate a'
-            action_prime = self._choose_action(
-                q_ref[state_prime],
-                0
-            )
-
-            # Q(s,a) = Q(s,a) + α[r + γQ(s',a') - Q(s,a)]
-            q_ref[current_state][action] += alpha * (
-                reward + 
-                (gamma * q_ref[state_prime][action_prime]) - 
-                q_ref[current_state][action]
-            )
-
-            # set back current state
-            current_state = state_prime
+        @return EpisodeStats with length, return and max |ΔQ| per episode
+        """
+        stats = self._run_episodes(
+            episodes, 
+            progress_bar, 
+            self._Q_learning_episode, 
+            alpha, 
+            epsilon, 
+            gamma,
+            tolerance=tolerance,
+            patience=patience
+        )
             
         if print_result:
             colour_matrix = np.array([
@@ -144,9 +130,199 @@ class DoubleQAgent(QAgent):
             table.print()
             
             # self.Q_two
-            print(f"\033[32m{'─'*57}\n\t\tQ_two-value matrix\n{'─'*57}\033[0m")
+            print(
+                f"\033[32m{'─'*57}\n\t\tQ_two-value matrix\n"
+                f"{'─'*57}\033[0m"
+            )
             table = ASCII_table.ASCIITable(
-                Q_to_np_matrix(self.Q, 2, 'unvisited').T[::-1],
+                Q_to_np_matrix(self.Q_two, 2, 'unvisited').T[::-1],
                 colour_matrix
             )
             table.print()
+        return stats
+
+    def greedy_policy(self)-> HardcodedOptimalPolicy:
+        """
+        Greedy policy of the sum of both tables of Q-values,
+        like the actions of double Q-learning. @see from_q_table
+
+        @return HardcodedOptimalPolicy with an action index per state id
+        """
+        return HardcodedOptimalPolicy.from_q_table(
+            self.Q.to_array() + self.Q_two.to_array(), self.maze, self.rng
+        )
+
+    def _greedy_action(self, state_id: int)-> int:
+        """
+        Greedy action of a state, on the sum of both tables.
+        A state that is not in `Q_two`, e.g. with the inherited sarsa,
+        counts as 0 there.
+
+        @param state_id: id of a state visited in `Q`
+
+        @return int with action index
+        """
+        row = self.Q.row(state_id)
+        if state_id in self.Q_two:
+            row = row + self.Q_two.row(state_id)
+        return int(row.argmax())
+
+    def _Q_learning_episode(
+        self, 
+        start_state: int,
+        alpha: float,
+        epsilon: float,
+        gamma: float
+    )-> tuple[int, float, float, int]:
+        """
+        Perform a single episode of double Q-learning, without validation.
+
+        Every step, a coin flip picks the table to update. Its greedy
+        action in s' is valued by the other table, which is what keeps
+        double Q-learning from overestimating.
+
+        @param start_state: id of the state to start in
+        @param alpha: alpha from formula, idk what it does exactly
+        @param epsilon: epsilon from formula, idk what it does exactly
+        @param gamma: discount value
+
+        @return tuple[int, float, float, int] with length, return, 
+            max |ΔQ| and number of greedy action changes of the episode
+        """
+        Q = self.Q
+        Q_two = self.Q_two
+        maze = self.maze
+        terminals = maze.flat_terminals
+        choose_action = bind_hot(self._choose_action)
+        bookkeep = self._bookkeep
+        self._begin_episode()
+
+        current_state = start_state
+        Q.ensure(current_state)
+        Q_two.ensure(current_state)
+        
+        while not terminals[current_state]:
+            # calculate a, on the sum of both tables
+            action = choose_action(
+                Q.row(current_state) + Q_two.row(current_state),
+                epsilon
+            )
+
+            # calculate s' and r
+            state_prime, reward = maze.step_reward_id(current_state, action)
+            
+            # add to Q if not yet in there
+            Q.ensure(state_prime)
+            Q_two.ensure(state_prime)
+
+            # choose Q1 or Q2 to update, the other one values a'
+            if self.rng.coin():
+                q_ref, q_other = Q_two, Q
+            else:
+                q_ref, q_other = Q, Q_two
+
+            # calculate a', which is greedy in the updated table
+            action_prime = q_ref.greedy(state_prime)
+
+            # Q(s,a) = Q(s,a) + α[r + γQ'(s',a') - Q(s,a)]
+            delta = alpha * (
+                reward + 
+                (gamma * q_other.value(state_prime, action_prime)) - 
+                q_ref.value(current_state, action)
+            )
+            q_ref.add(current_state, action, delta)
+            bookkeep(current_state, action, reward, state_prime, delta)
+
+            # set back current state
+            current_state = state_prime
+
+        return self._end_episode()
+
+    def _Q_lambda_episode(
+        self, 
+        start_state: int,
+        alpha: float,
+        epsilon: float,
+        gamma: float,
+        lambda_: float,
+        traces: EligibilityTraces
+    )-> tuple[int, float, float, int]:
+        """
+        Perform a single episode of double Q(λ), without validation.
+
+        Actions are chosen on the sum of both tables. Every step, a coin
+        flip picks the table to update, along all (s,a) pairs with a
+        trace. Its greedy action in s' is valued by the other table.
+        The traces are shared, and cut after an action that is not
+        greedy on the sum of both tables.
+
+        @param start_state: id of the state to start in
+        @param alpha: alpha from formula, idk what it does exactly
+        @param epsilon: epsilon from formula, idk what it does exactly
+        @param gamma: discount value
+        @param lambda_: trace decay
+        @param traces: trace storage, cleared at the start
+
+        @return tuple[int, float, float, int] with length, return, 
+            max |ΔQ| and number of greedy action changes of the episode
+        """
+        Q = self.Q
+        Q_two = self.Q_two
+        maze = self.maze
+        terminals = maze.flat_terminals
+        choose_action = bind_hot(self._choose_action)
+        bookkeep = self._bookkeep
+        self._begin_episode()
+        traces.clear()
+
+        current_state = start_state
+        Q.ensure(current_state)
+        Q_two.ensure(current_state)
+        # calculate a, on the sum of both tables
+        action = choose_action(
+            Q.row(current_state) + Q_two.row(current_state),
+            epsilon
+        )
+        while not terminals[current_state]:
+            # calculate s' and r
+            state_prime, reward = maze.step_reward_id(current_state, action)
+            Q.ensure(state_prime)
+            Q_two.ensure(state_prime)
+
+            # choose Q1 or Q2 to update, the other one values a'.
+            # The coin is flipped before the next action is drawn,
+            # in the same order as in _Q_learning_episode
+            if self.rng.coin():
+                q_ref, q_other = Q_two, Q
+            else:
+                q_ref, q_other = Q, Q_two
+            action_prime = q_ref.greedy(state_prime)
+
+            # calculate the next action, on the sum of both tables
+            values_prime = Q.row(state_prime) + Q_two.row(state_prime)
+            next_action = choose_action(values_prime, epsilon)
+            exploratory = values_prime[next_action] != values_prime.max()
+
+            # δ = r + γQ'(s',a') - Q(s,a)
+            # Q(s,a) = Q(s,a) + αδe(s,a), for every (s,a) with a trace
+            delta = alpha * (
+                reward + 
+                (gamma * q_other.value(state_prime, action_prime)) - 
+                q_ref.value(current_state, action)
+            )
+            traces.visit(current_state, action)
+            states, actions, values = traces.active()
+            q_ref.add_at(states, actions, delta * values)
+            bookkeep(current_state, action, reward, state_prime, delta, states)
+
+            # cut the traces after an exploratory action
+            if exploratory:
+                traces.clear()
+            else:
+                traces.decay(gamma * lambda_)
+
+            # set back current state
+            current_state = state_prime
+            action = next_action
+
+        return self._end_episode()
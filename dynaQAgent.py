@@ -0,0 +1,327 @@
+import heapq
+from typing import Annotated
+
+from baseMaze import BaseMaze
+from baseQTable import BaseQTable
+from episodeStats import EpisodeStats
+from QAgent import QAgent
+from floatRange import FloatRange, bind_hot, check_annotated
+from randomStream import RandomStream
+from replayBuffer import ReplayBuffer
+from tabularModel import TabularModel
+from trajectoryRecorder import TrajectoryRecorder
+
+
+class DynaQAgent(QAgent):
+    """
+    Dyna-Q agent.
+
+    Q-learning, which also learns a model of the maze from its real steps.
+    After every real step, the model is used for a number of simulated
+    updates, such that fewer real steps are needed.
+    @see tabularModel.py
+
+    With prioritized sweeping, the simulated updates are not spread
+    uniformly over the observed (s,a) pairs, but go to the pairs whose
+    Q-values are off the most, working backwards from where Q changed.
+
+    Extends QAgent class
+    @see QAgent.py
+    """
+
+    def __init__(
+        self,
+        maze: BaseMaze,
+        start_coordinate: tuple[int, int],
+        rng: RandomStream=None,
+        q_backend: str | BaseQTable="dict",
+        recorder: TrajectoryRecorder=None,
+        replay_buffer: ReplayBuffer=None
+    )-> None:
+        """
+        @var $model
+        **TabularModel** Model learned from all real steps.
+        @var $queue
+        **list[tuple[float, int, int]]** Heap of (-priority, s, a),
+        for prioritized sweeping. May hold outdated entries.
+        @var $priorities
+        **dict[tuple[int, int] : float]** Current priority of every (s,a)
+        pair in `queue`.
+        """
+        super().__init__(
+            maze, start_coordinate, rng, q_backend, recorder, replay_buffer
+        )
+        self.model = TabularModel()
+        self.queue: list[tuple[float, int, int]] = []
+        self.priorities: dict[tuple[int, int] : float] = {}
+
+    @check_annotated
+    def dyna_Q(
+        self,
+        alpha: Annotated[float, FloatRange(0.0, 1.0)]=0.1,
+        epsilon: Annotated[float, FloatRange(0.0, 1.0)]=0.1,
+        gamma: Annotated[float, FloatRange(0.0, 1.0)]=0.1,
+        print_result: bool=False,
+        episodes: int=1,
+        progress_bar: bool=False,
+        tolerance: float=None,
+        patience: int=10,
+        planning_steps: int=10,
+        prioritized: bool=False,
+        threshold: float=1e-4
+    )-> EpisodeStats:
+        """
+        Dyna-Q function for DynaQAgent.
+
+        This function performs the Dyna-Q algorithm, for a batch of
+        episodes. Every real step is a Q-learning update, followed by
+        `planning_steps` updates towards the expected target of the model.
+
+        @param alpha: alpha from formula, idk what it does exactly
+        @param epsilon: epsilon from formula, idk what it does exactly
+        @param gamma: discount value
+        @param print_result: whether to print the final values
+        @param episodes: number of episodes to run
+        @param progress_bar: whether to show a progress bar
+        @param tolerance: stop early once no Q-value changes more than
+            this and the greedy policy is stable, @see _run_episodes
+        @param patience: number of stable episodes in a row to stop at
+        @param planning_steps: number of simulated updates per real step
+        @param prioritized: whether to use prioritized sweeping, instead
+            of simulating uniformly sampled (s,a) pairs
+        @param threshold: minimal priority to queue a pair with
+
+        @return EpisodeStats with length, return and max |ΔQ| per episode,
+            where the length counts real steps only
+        """
+        if planning_steps < 0:
+            raise ValueError(
+                f"`planning_steps` must be at least 0, got {planning_steps}."
+            )
+
+        stats = self._run_episodes(
+            episodes,
+            progress_bar,
+            self._dyna_Q_episode,
+            alpha,
+            epsilon,
+            gamma,
+            planning_steps,
+            prioritized,
+            threshold,
+            tolerance=tolerance,
+            patience=patience
+        )
+
+        if print_result:
+            self._print_Q()
+        return stats
+
+    def _dyna_Q_episode(
+        self,
+        start_state: int,
+        alpha: float,
+        epsilon: float,
+        gamma: float,
+        planning_steps: int,
+        prioritized: bool,
+        threshold: float
+    )-> tuple[int, float, float, int]:
+        """
+        Perform a single episode of Dyna-Q, without validation.
+
+        @param start_state: id of the state to start in
+        @param alpha: alpha from formula, idk what it does exactly
+        @param epsilon: epsilon from formula, idk what it does exactly
+        @param gamma: discount value
+        @param planning_steps: number of simulated updates per real step
+        @param prioritized: whether to use prioritized sweeping
+        @param threshold: minimal priority to queue a pair with
+
+        @return tuple[int, float, float, int] with length, return,
+            max |ΔQ| and number of greedy action changes of the episode
+        """
+        Q = self.Q
+        maze = self.maze
+        model = self.model
+        terminals = maze.flat_terminals
+        choose_action = bind_hot(self._choose_action)
+        bookkeep = self._bookkeep
+        plan = self._prioritized_sweeping if prioritized else self._plan
+        self._begin_episode()
+
+        current_state = start_state
+        Q.ensure(current_state)
+
+        while not terminals[current_state]:
+            # calculate a
+            action = choose_action(Q.row(current_state), epsilon)
+            # calculate s' and r
+            state_prime, reward = maze.step_reward_id(current_state, action)
+
+            # add to Q if not yet in there
+            Q.ensure(state_prime)
+
+            # calculate a', which is greedy
+            action_prime = Q.greedy(state_prime)
+
+            # Q(s,a) = Q(s,a) + α[r + γQ(s',a') - Q(s,a)]
+            delta = alpha * (
+                reward +
+                (gamma * Q.value(state_prime, action_prime)) -
+                Q.value(current_state, action)
+            )
+            Q.add(current_state, action, delta)
+            bookkeep(current_state, action, reward, state_prime, delta)
+
+            # learn the model, and plan with it
+            model.observe(
+                current_state, action,
+                reward, state_prime, terminals[state_prime]
+            )
+            if planning_steps:
+                if prioritized:
+                    self._queue(current_state, action, gamma, threshold)
+                self._bookkeep_updates(
+                    *plan(alpha, gamma, planning_steps, threshold)
+                )
+
+            # set back current state
+            current_state = state_prime
+
+        return self._end_episode()
+
+    def _update(
+        self,
+        state_id: int,
+        action_index: int,
+        alpha: float,
+        gamma: float
+    )-> tuple[float, int]:
+        """
+        Simulated update of a single (s,a) pair, towards the expected
+        target of the model.
+
+        @param state_id: id of an observed state
+        @param action_index: index of an action observed in `state_id`
+        @param alpha: alpha from formula, idk what it does exactly
+        @param gamma: discount value
+
+        @return tuple[float, int] with |ΔQ| and whether the greedy action
+            of `state_id` changed, if tracked
+        """
+        Q = self.Q
+        # Q(s,a) = Q(s,a) + α[Σ p(s'|s,a)(r + γ max_a' Q(s',a')) - Q(s,a)]
+        delta = alpha * (
+            self.model.target(state_id, action_index, gamma, Q) -
+            Q.value(state_id, action_index)
+        )
+        Q.add(state_id, action_index, delta)
+
+        if self.greedy_actions is not None:
+            return abs(delta), self._greedy_change(state_id)
+        return abs(delta), 0
+
+    def _plan(
+        self,
+        alpha: float,
+        gamma: float,
+        planning_steps: int,
+        threshold: float
+    )-> tuple[float, int]:
+        """
+        Simulated updates of uniformly sampled, observed (s,a) pairs.
+
+        @param alpha: alpha from formula, idk what it does exactly
+        @param gamma: discount value
+        @param planning_steps: number of simulated updates
+        @param threshold: unused, @see _prioritized_sweeping
+
+        @return tuple[float, int] with the max |ΔQ| of all updates and
+            the number of greedy action changes, if tracked
+        """
+        pairs = self.model.pairs
+        max_delta, policy_changes = 0.0, 0
+        indices = self.rng.generator.integers(0, len(pairs), planning_steps)
+        for index in indices.tolist():
+            delta, changed = self._update(*pairs[index], alpha, gamma)
+            policy_changes += changed
+            if delta > max_delta:
+                max_delta = delta
+        return max_delta, policy_changes
+
+    def _queue(
+        self,
+        state_id: int,
+        action_index: int,
+        gamma: float,
+        threshold: float
+    )-> None:
+        """
+        Queue an observed (s,a) pair for prioritized sweeping, with its
+        |target - Q(s,a)| as priority, if that is above `threshold`.
+
+        A pair that is already queued with a lower priority is queued
+        again, the old entry is skipped when it comes up.
+
+        @param state_id: id of an observed state
+        @param action_index: index of an action observed in `state_id`
+        @param gamma: discount value
+        @param threshold: minimal priority to queue a pair with
+        """
+        priority = abs(
+            self.model.target(state_id, action_index, gamma, self.Q) -
+            self.Q.value(state_id, action_index)
+        )
+        pair = (state_id, action_index)
+        if priority > threshold and \
+                priority > self.priorities.get(pair, 0.0):
+            self.priorities[pair] = priority
+            heapq.heappush(self.queue, (-priority, state_id, action_index))
+
+    def _prioritized_sweeping(
+        self,
+        alpha: float,
+        gamma: float,
+        planning_steps: int,
+        threshold: float
+    )-> tuple[float, int]:
+        """
+        Simulated updates of the queued (s,a) pairs with the highest
+        priority. After every update that changes max_a Q(s,a) by more
+        than `threshold`, the predecessors of its state are queued.
+
+        @param alpha: alpha from formula, idk what it does exactly
+        @param gamma: discount value
+        @param planning_steps: maximum number of simulated updates
+        @param threshold: minimal priority to queue a pair with
+
+        @return tuple[float, int] with the max |ΔQ| of all updates and
+            the number of greedy action changes, if tracked
+        """
+        Q = self.Q
+        queue, priorities = self.queue, self.priorities
+        predecessors = self.model.predecessors
+        max_delta, policy_changes = 0.0, 0
+        updates = 0
+        while queue and updates < planning_steps:
+            priority, state_id, action_index = heapq.heappop(queue)
+            pair = (state_id, action_index)
+            # skip entries of pairs that were queued again
+            if priorities.get(pair) != -priority:
+                continue
+            del priorities[pair]
+
+            value = Q.row(state_id).max()
+            delta, changed = self._update(state_id, action_index, alpha, gamma)
+            updates += 1
+            policy_changes += changed
+            if delta > max_delta:
+                max_delta = delta
+
+            # the targets of the predecessors only change with max_a Q(s,a)
+            if gamma * abs(Q.row(state_id).max() - value) <= threshold:
+                continue
+            for predecessor in predecessors.get(state_id, ()):
+                self._queue(*predecessor, gamma, threshold)
+        return max_delta, policy_changes
@@ -0,0 +1,110 @@
+import numpy as np
+
+
+class EligibilityTraces:
+    """
+    EligibilityTraces class.
+
+    Sparse, bounded storage of replacing eligibility traces, for the
+    recently visited (s,a) pairs only. Traces are kept in parallel arrays
+    of fixed capacity, so the cost of a step depends on the capacity,
+    not on the size of the maze.
+
+    Traces that decay below `threshold` are dropped. When all slots are
+    in use, visiting a new pair replaces the smallest trace.
+    """
+
+    def __init__(self, capacity: int=256, threshold: float=1e-4)-> None:
+        """
+        @var $capacity
+        **int** Maximum number of (s,a) pairs with a trace.
+        @var $threshold
+        **float** Traces below this value are dropped.
+        @var $states
+        **np.ndarray** State id per slot.
+        @var $actions
+        **np.ndarray** Action index per slot.
+        @var $values
+        **np.ndarray** Trace per slot.
+        @var $slots
+        **dict[tuple[int, int] : int]** Slot per (s,a) pair with a trace.
+        """
+        if capacity < 1:
+            raise ValueError(f"`capacity` must be at least 1, got {capacity}.")
+        self.capacity = capacity
+        self.threshold = threshold
+        self.states = np.zeros(capacity, dtype=np.int64)
+        self.actions = np.zeros(capacity, dtype=np.int64)
+        self.values = np.zeros(capacity)
+        self.slots: dict[tuple[int, int] : int] = {}
+
+    def visit(self, state_id: int, action_index: int)-> None:
+        """
+        Set the trace of a visited (s,a) pair to 1.
+
+        @param state_id: id of the visited state
+        @param action_index: index of the taken action
+        """
+        key = (state_id, action_index)
+        slot = self.slots.get(key)
+        if slot is None:
+            size = len(self.slots)
+            if size < self.capacity:
+                slot = size
+            else:
+                # replace the pair with the smallest trace
+                slot = int(self.values.argmin())
+                del self.slots[
+                    (int(self.states[slot]), int(self.actions[slot]))
+                ]
+            self.states[slot] = state_id
+            self.actions[slot] = action_index
+            self.slots[key] = slot
+        self.values[slot] = 1.0
+
+    def active(self)-> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Get all pairs with a trace.
+
+        @return tuple[np.ndarray, np.ndarray, np.ndarray] with views on
+            the state ids, action indices and traces
+        """
+        size = len(self.slots)
+        return self.states[:size], self.actions[:size], self.values[:size]
+
+    def decay(self, factor: float)-> None:
+        """
+        Multiply all traces by `factor`, dropping the ones that fall
+        below `threshold`.
+
+        @param factor: decay factor, γλ
+        """
+        size = len(self.slots)
+        values = self.values[:size]
+        values *= factor
+        if size == 0 or values.min() >= self.threshold:
+            return
+
+        keep = np.flatnonzero(values >= self.threshold)
+        kept = len(keep)
+        self.states[:kept] = self.states[keep]
+        self.actions[:kept] = self.actions[keep]
+        self.values[:kept] = self.values[keep]
+        self.values[kept:size] = 0.0
+        self.slots = dict(zip(
+            zip(self.states[:kept].tolist(), self.actions[:kept].tolist()),
+            range(kept)
+        ))
+
+    def clear(self)-> None:
+        """
+        Drop all traces.
+        """
+        self.values[:len(self.slots)] = 0.0
+        self.slots.clear()
+
+    def __len__(self)-> int:
+        """
+        Number of pairs with a trace.
+        """
+        return len(self.slots)
@@ -0,0 +1,62 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+
+@dataclass
+class EpisodeStats:
+    """
+    EpisodeStats class
+
+    Statistics of a batch of episodes, one entry per episode.
+    For a population of agents, there is one column per agent.
+
+    `policy_changes` counts the states whose greedy action changed during
+    the episode, which is only tracked when training with a `tolerance`.
+    `converged_episode` is the first episode of the stable stretch after
+    which training stopped early, None if it did not.
+    """
+    lengths: np.ndarray
+    returns: np.ndarray
+    max_deltas: np.ndarray
+    policy_changes: np.ndarray
+    converged_episode: int | None = None
+
+    @classmethod
+    def empty(cls, episodes: int | tuple[int, int])-> 'EpisodeStats':
+        """
+        Allocate statistics for a number of episodes, filled with zeros.
+
+        @param episodes: number of episodes, 
+            or (episodes, agents) for a population
+
+        @return EpisodeStats with arrays of shape `episodes`
+        """
+        return cls(
+            lengths=np.zeros(episodes, dtype=np.int64),
+            returns=np.zeros(episodes),
+            max_deltas=np.zeros(episodes),
+            policy_changes=np.zeros(episodes, dtype=np.int64)
+        )
+
+    def truncate(
+        self, 
+        episodes: int, 
+        converged_episode: int | None=None
+    )-> 'EpisodeStats':
+        """
+        Keep the statistics of the first episodes only, 
+        e.g. after stopping early.
+
+        @param episodes: number of episodes to keep
+        @param converged_episode: episode at which training converged
+
+        @return EpisodeStats with views on the first `episodes` entries
+        """
+        return EpisodeStats(
+            lengths=self.lengths[:episodes],
+            returns=self.returns[:episodes],
+            max_deltas=self.max_deltas[:episodes],
+            policy_changes=self.policy_changes[:episodes],
+            converged_episode=converged_episode
+        )
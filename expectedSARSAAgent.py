@@ -0,0 +1,127 @@
+from typing import Annotated
+import numpy as np
+
+from action import ACTIONS
+from SARSAAgent import SARSAAgent
+from episodeStats import EpisodeStats
+from floatRange import FloatRange, bind_hot, check_annotated
+
+
+class ExpectedSARSAAgent(SARSAAgent):
+    """
+    Expected SARSA agent.
+
+    Like SARSA, but the target uses the expected Q-value of the next state
+    under the epsilon-greedy policy of `_choose_action`, instead of the
+    Q-value of a sampled next action.
+
+    Extends SARSAAgent class
+    @see SARSAAgent.py
+    """
+
+    @check_annotated
+    def expected_sarsa(
+        self,
+        alpha: Annotated[float, FloatRange(0.0, 1.0)]=0.1,
+        epsilon: Annotated[float, FloatRange(0.0, 1.0)]=0.1,
+        gamma: Annotated[float, FloatRange(0.0, 1.0)]=0.1,
+        print_result: bool=False,
+        episodes: int=1,
+        progress_bar: bool=False,
+        tolerance: float=None,
+        patience: int=10
+    )-> EpisodeStats:
+        """
+        Expected SARSA function for ExpectedSARSAAgent.
+
+        This function performs the expected SARSA algorithm,
+        for a batch of episodes.
+
+        @param alpha: alpha from formula, idk what it does exactly
+        @param epsilon: epsilon from formula, idk what it does exactly
+        @param gamma: discount value
+        @param print_result: whether to print the final values
+        @param episodes: number of episodes to run
+        @param progress_bar: whether to show a progress bar
+        @param tolerance: stop early once no Q-value changes more than
+            this and the greedy policy is stable, @see _run_episodes
+        @param patience: number of stable episodes in a row to stop at
+
+        @return EpisodeStats with length, return and max |ΔQ| per episode
+        """
+        stats = self._run_episodes(
+            episodes,
+            progress_bar,
+            self._expected_sarsa_episode,
+            alpha,
+            epsilon,
+            gamma,
+            tolerance=tolerance,
+            patience=patience
+        )
+
+        if print_result:
+            self._print_Q()
+        return stats
+
+    def _expected_sarsa_episode(
+        self,
+        start_state: int,
+        alpha: float,
+        epsilon: float,
+        gamma: float
+    )-> tuple[int, float, float, int]:
+        """
+        Perform a single episode of expected SARSA, without validation.
+
+        @param start_state: id of the state to start in
+        @param alpha: alpha from formula, idk what it does exactly
+        @param epsilon: epsilon from formula, idk what it does exactly
+        @param gamma: discount value
+
+        @return tuple[int, float, float, int] with length, return,
+            max |ΔQ| and number of greedy action changes of the episode
+        """
+        Q = self.Q
+        maze = self.maze
+        terminals = maze.flat_terminals
+        choose_action = bind_hot(self._choose_action)
+        bookkeep = self._bookkeep
+        self._begin_episode()
+
+        # π(a|s') of `_choose_action`: ε/4 for every action,
+        # plus 1 - ε for the greedy action
+        probabilities = np.empty(len(ACTIONS))
+        exploration = epsilon / len(ACTIONS)
+
+        current_state = start_state
+        Q.ensure(current_state)
+
+        while not terminals[current_state]:
+            # calculate a
+            action = choose_action(Q.row(current_state), epsilon)
+            # calculate s' and r
+            state_prime, reward = maze.step_reward_id(current_state, action)
+
+            # add to Q if not yet in there
+            Q.ensure(state_prime)
+
+            # calculate Σ π(a'|s')Q(s',a')
+            row_prime = Q.row(state_prime)
+            probabilities.fill(exploration)
+            probabilities[row_prime.argmax()] += 1.0 - epsilon
+            expected_value = float(row_prime @ probabilities)
+
+            # Q(s,a) = Q(s,a) + α[r + γ Σ π(a'|s')Q(s',a') - Q(s,a)]
+            delta = alpha * (
+                reward +
+                (gamma * expected_value) -
+                Q.value(current_state, action)
+            )
+            Q.add(current_state, action, delta)
+            bookkeep(current_state, action, reward, state_prime, delta)
+
+            # set back current state
+            current_state = state_prime
+
+        return self._end_episode()
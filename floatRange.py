@@ -1,30 +1,115 @@
+import functools
 import inspect
 
 from dataclasses import dataclass
 from typing import get_type_hints
 
 
-def check_annotated(func)-> None:
+# When wrapped functions are validated. @see set_validation_mode
+VALIDATION_MODES = ("always", "episode", "off")
+_validation_mode = "always"
+
+
+def set_validation_mode(mode: str)-> None:
+    """
+    Set when functions wrapped by `check_annotated` are validated.
+
+    - "always": every call is validated.
+    - "episode": functions marked as `hot`, which run every step, are
+      no longer validated. Their arguments are validated once, at the
+      episode boundary, by the learning function that calls them.
+    - "off": nothing is validated.
+
+    @param mode: one of VALIDATION_MODES
+    """
+    global _validation_mode
+    if mode not in VALIDATION_MODES:
+        raise ValueError(
+            f"Unknown validation mode {mode}."
+            f" Expected one of {VALIDATION_MODES}."
+        )
+    _validation_mode = mode
+
+
+def get_validation_mode()-> str:
+    """
+    Get the current validation mode. @see set_validation_mode
+
+    @return str with one of VALIDATION_MODES
+    """
+    return _validation_mode
+
+
+def check_annotated(func=None, *, hot: bool=False):
     """
     Checker wrapper function to force type annotations.
 
+    The annotated parameters are looked up once, when the function is
+    decorated, and their default values are validated right away.
+    Every call then only checks the arguments that were passed.
+
+    Can be used as `@check_annotated` or `@check_annotated(hot=True)`.
+
     @param func: function to wrap around
+    @param hot: whether `func` runs every step of a learning loop,
+        such that it is skipped in "episode" validation mode
     """
+    if func is None:
+        return functools.partial(check_annotated, hot=hot)
+
     hints = get_type_hints(func, include_extras=True)
-    spec = inspect.getfullargspec(func)
-    def wrapper(*args, **kwargs):
-        arguments = list(args) + list(kwargs.values())
-        for idx, arg_name in enumerate(spec[0]):
-            hint = hints.get(arg_name)
-            validators = getattr(hint, '__metadata__', None)
-            if not validators:
-                continue
+    checks = []
+    for index, (name, parameter) in enumerate(
+        inspect.signature(func).parameters.items()
+    ):
+        validators = getattr(hints.get(name), '__metadata__', None)
+        if not validators:
+            continue
+        if parameter.default is not inspect.Parameter.empty:
             for validator in validators:
-                validator.validate_value(arguments[idx])
+                validator.validate_value(parameter.default)
+        checks.append((index, name, validators))
+
+    if not checks:
+        return func
+
+    skip_modes = ("episode", "off") if hot else ("off",)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if _validation_mode not in skip_modes:
+            for index, name, validators in checks:
+                if index < len(args):
+                    value = args[index]
+                elif name in kwargs:
+                    value = kwargs[name]
+                else:
+                    continue
+                for validator in validators:
+                    validator.validate_value(value)
         return func(*args, **kwargs)
+    wrapper.hot = hot
     return wrapper
 
 
+def bind_hot(method):
+    """
+    Get a bound method without its `check_annotated` wrapper,
+    if the current validation mode does not validate it anyway.
+
+    Learning loops use this once per episode, to call hot methods
+    without any overhead.
+
+    @param method: bound method, possibly wrapped by `check_annotated`
+
+    @return callable with the same behaviour as `method`
+    """
+    func = getattr(method, '__func__', None)
+    if not getattr(func, 'hot', False) or _validation_mode == "always":
+        return method
+    return func.__wrapped__.__get__(method.__self__)
+
+
 @dataclass
 class FloatRange:
     """
@@ -1,29 +1,113 @@
-from action import Action
+import numpy as np
+
+from action import Action, ACTIONS, ACTION_INDEX
 from state import State
+from baseMaze import BaseMaze
 from basePolicy import BasePolicy
+from baseQTable import BaseQTable
+from randomStream import RandomStream
 
 
 class HardcodedOptimalPolicy(BasePolicy):
     """
     HardcodedOptimalPolicy class.
 
-    This class can be constructed with an hardcoded optimal policy
+    This class can be constructed with an hardcoded optimal policy,
+    either as a dict with an Action per State, or as an array with an
+    action index per state id of a maze. A dict is compiled to an array
+    by `compile`, which `select_actions` needs.
     """
 
-    def __init__(self, actions: dict[State : Action])-> None:
+    def __init__(
+        self,
+        actions: dict[State : Action]=None,
+        rng: RandomStream=None,
+        maze: BaseMaze=None,
+        action_indices: np.ndarray=None
+    )-> None:
         """
         Initializer for HardcodedOptimalPolicy.
 
-        Sets self.actions.
+        Sets self.actions, or self.action_indices.
+        With both `actions` and `maze`, `actions` is compiled right away.
+
+        @var $actions
+        **dict[State : Action]** Action per State, None if the policy
+        was given as an array.
+        @var $maze
+        **BaseMaze** Maze whose state ids index `action_indices`.
+        @var $action_indices
+        **np.ndarray** int8 action index per state id, -1 for states
+        without an action. None until compiled. @see ACTION_INDEX
         """
-        super().__init__()
+        super().__init__(rng)
+
+        if actions is None and action_indices is None:
+            raise AttributeError(
+                "Either `actions` or `action_indices` must be given."
+            )
+        if action_indices is not None and maze is None:
+            raise AttributeError(
+                "`action_indices` can only be given along with its `maze`."
+            )
 
         self.actions = actions
+        self.maze = maze
+        self.action_indices = None
+        if action_indices is not None:
+            self.action_indices = np.asarray(action_indices, dtype=np.int8)
+        elif maze is not None:
+            self.compile(maze)
+
+    @classmethod
+    def from_q_table(
+        cls,
+        Q: BaseQTable | np.ndarray,
+        maze: BaseMaze,
+        rng: RandomStream=None
+    )-> 'HardcodedOptimalPolicy':
+        """
+        Greedy policy of Q-values, with no action in terminal states.
+
+        Ties are broken in favour of the first action in ACTIONS,
+        like `BaseQTable.greedy`.
+
+        @param Q: Q-table of an agent, or Q-values with shape (n_states, 4)
+        @param maze: maze the Q-values were learned in
+        @param rng: passed on to the policy
+
+        @return HardcodedOptimalPolicy with an action index per state id
+        """
+        if isinstance(Q, BaseQTable):
+            Q = Q.to_array()
+        action_indices = Q.argmax(axis=1).astype(np.int8)
+        action_indices[maze.flat_terminals] = -1
+        return cls(rng=rng, maze=maze, action_indices=action_indices)
+
+    def compile(self, maze: BaseMaze)-> np.ndarray:
+        """
+        Compile `actions` into `action_indices`, for the state ids of a maze.
+
+        States that are not in `actions` get no action.
+        NOTE: later changes to `actions` need another compile.
+
+        @param maze: maze to compile the policy for
+
+        @return np.ndarray with the compiled `action_indices`
+        """
+        action_indices = np.full(maze.n_states, -1, dtype=np.int8)
+        for state, action in self.actions.items():
+            if action is not None:
+                action_indices[maze.get_state_id(state.position)] = \
+                    ACTION_INDEX[action]
+        self.maze = maze
+        self.action_indices = action_indices
+        return action_indices
 
     def select_action(self, state: State)-> Action:
         """
         Select action based on current policy.
-        
+
         This policy works as follows:
         - select select the best action, given the MDP, and return it.
 
@@ -31,5 +115,73 @@ class HardcodedOptimalPolicy(BasePolicy):
 
         @return Action with Action to perform.
         """
-        return self.actions[state]
-    
\ No newline at end of file
+        if self.actions is not None:
+            return self.actions[state]
+        action_index = self.action_indices[
+            self.maze.get_state_id(state.position)
+        ]
+        return None if action_index < 0 else ACTIONS[action_index]
+
+    def select_actions(self, state_ids: np.ndarray)-> np.ndarray:
+        """
+        Select the action of a batch of states at once.
+
+        @param state_ids: ids of the states, of any shape
+
+        @return np.ndarray with an int8 action index per state id,
+            -1 for states without an action
+        """
+        if self.action_indices is None:
+            raise AttributeError(
+                f"{self} has no `action_indices` yet, compile it for a maze."
+            )
+        return self.action_indices[state_ids]
+
+    def action_probabilities(self, maze: BaseMaze)-> np.ndarray:
+        """
+        Probability of every action in every state of a maze.
+
+        The hardcoded action gets probability 1, states without an action
+        get no action at all.
+
+        @param maze: maze to get the probabilities in
+
+        @return np.ndarray with shape (n_states, 4)
+        """
+        action_indices = self._compiled_for(maze)
+        probabilities = np.zeros((maze.n_states, len(ACTIONS)))
+        state_ids = np.flatnonzero(action_indices >= 0)
+        probabilities[state_ids, action_indices[state_ids]] = 1.0
+        return probabilities
+
+    def visualise(self, maze: BaseMaze)-> None:
+        """
+        print current Policy.
+
+        Compiles the policy for `maze` first, if needed.
+        @see BasePolicy.visualise
+
+        @param maze: BaseMaze object to visualise policy in.
+        """
+        self._compiled_for(maze)
+        super().visualise(maze)
+
+    def _compiled_for(self, maze: BaseMaze)-> np.ndarray:
+        """
+        Get `action_indices` for a maze, compiling `actions` if the policy
+        was not compiled for it yet.
+
+        @param maze: maze to get the action indices for
+
+        @return np.ndarray with an int8 action index per state id
+        """
+        if self.actions is not None and \
+                (self.action_indices is None or self.maze is not maze):
+            return self.compile(maze)
+        if len(self.action_indices) != maze.n_states:
+            raise AttributeError(
+                f"`action_indices` does not match the maze."
+                f" Expected {maze.n_states} states, "
+                f"got {len(self.action_indices)}."
+            )
+        return self.action_indices
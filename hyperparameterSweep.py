@@ -0,0 +1,405 @@
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from baseMaze import BaseMaze
+from parallelTrainer import train_seed
+from QAgent import QAgent
+from randomStream import RandomStream
+from SARSAAgent import SARSAAgent
+from stochasticMaze import StochasticMaze
+from stupidMaze import StupidMaze
+
+
+# Maze types that can be swept over, by name
+MAZE_TYPES: dict[str : type[BaseMaze]] = {
+    "stupid": StupidMaze,
+    "stochastic": StochasticMaze,
+}
+
+# Shared arrays of the maze, attached once per worker process.
+# @see _attach_shared_maze
+_shared_maze: tuple | None = None
+
+# Mazes of a worker process on the shared arrays,
+# per maze type and probability. @see _worker_maze
+_worker_mazes: dict[tuple[str, float] : BaseMaze] = {}
+
+
+@dataclass
+class SweepResult:
+    """
+    SweepResult class
+
+    Result of training a single configuration of a sweep, with the seed
+    of its run, such that it can be trained again with train_seed.
+    """
+    configuration: dict[str : float | str]
+    final_return: float
+    converged_episode: int
+    seed: int
+
+
+def _attach_shared_maze(
+    name: str,
+    shape: tuple[int, int],
+    maze_type: str,
+    maze_probability: float
+)-> None:
+    """
+    Attach a worker process to the shared memory of the maze,
+    and build the maze of the first configuration on it.
+
+    Used as initializer of the worker processes.
+
+    @param name: name of the shared memory block
+    @param shape: shape of the maze
+    @param maze_type: name of the maze type to build, @see MAZE_TYPES
+    @param maze_probability: slip probability of stochastic mazes
+    """
+    global _shared_maze
+    memory = shared_memory.SharedMemory(name=name)
+    rewards, terminals = _shared_views(memory, shape)
+    _shared_maze = (memory, rewards, terminals)
+    _worker_maze(maze_type, maze_probability)
+
+
+def _worker_maze(maze_type: str, maze_probability: float)-> BaseMaze:
+    """
+    Maze on the shared arrays of this worker.
+
+    The maze is built once per maze type and probability,
+    and reused by every configuration with them.
+
+    @param maze_type: name of the maze type, @see MAZE_TYPES
+    @param maze_probability: slip probability of stochastic mazes
+
+    @return BaseMaze using the shared reward and terminal arrays
+    """
+    key = (maze_type, maze_probability)
+    if key in _worker_mazes:
+        return _worker_mazes[key]
+
+    _, rewards, terminals = _shared_maze
+    maze_class = MAZE_TYPES[maze_type]
+
+    # the private grid the maze builds is replaced by the shared arrays
+    arguments = (maze_probability,) if maze_class is StochasticMaze else ()
+    maze = maze_class(rewards.shape, rewards, *arguments)
+    maze.attach_arrays(rewards, terminals)
+    _worker_mazes[key] = maze
+    return maze
+
+
+def _shared_views(
+    memory: shared_memory.SharedMemory,
+    shape: tuple[int, int]
+)-> tuple[np.ndarray, np.ndarray]:
+    """
+    Reward and terminal arrays, as views on a shared memory block.
+
+    The rewards are stored first, followed by the terminals.
+
+    @param memory: shared memory block
+    @param shape: shape of the maze
+
+    @return tuple[np.ndarray, np.ndarray] with rewards and terminals
+    """
+    size = shape[0] * shape[1]
+    rewards = np.ndarray(shape, dtype=float, buffer=memory.buf)
+    terminals = np.ndarray(
+        shape, dtype=bool, buffer=memory.buf, offset=size * rewards.itemsize
+    )
+    return rewards, terminals
+
+
+def _train_configuration(
+    agent_class: type[SARSAAgent],
+    start_coordinate: tuple[int, int],
+    method: str,
+    episodes: int,
+    q_backend: str,
+    maze_probability: float,
+    configuration: dict[str : float | str],
+    seed: int
+)-> tuple[np.ndarray, np.ndarray]:
+    """
+    Train a single configuration, on the shared maze of this worker.
+    The maze itself is not changed, train_seed works on a copy.
+
+    @param agent_class: SARSAAgent or subclass to train
+    @param start_coordinate: coordinate the agent starts in
+    @param method: name of the learning method, e.g. "Q_learning"
+    @param episodes: number of episodes to train
+    @param q_backend: Q-table backend of the agent
+    @param maze_probability: slip probability of stochastic mazes
+    @param configuration: dict with alpha, epsilon, gamma and maze
+    @param seed: seed of the run
+
+    @return tuple[np.ndarray, np.ndarray] with returns and max |ΔQ|
+        per episode
+    """
+    run = train_seed(
+        agent_class,
+        _worker_maze(configuration["maze"], maze_probability),
+        start_coordinate,
+        method,
+        {
+            "alpha": configuration["alpha"],
+            "epsilon": configuration["epsilon"],
+            "gamma": configuration["gamma"],
+        },
+        episodes,
+        q_backend,
+        seed
+    )
+    return run.stats.returns, run.stats.max_deltas
+
+
+class HyperparameterSweep:
+    """
+    HyperparameterSweep class.
+
+    Trains an agent for every configuration of alpha, epsilon, gamma and
+    maze type, across worker processes. The reward grid and terminal mask
+    of the maze are put in shared memory once, which every worker attaches
+    to, instead of receiving its own pickled copy.
+    """
+
+    def __init__(
+        self,
+        maze: BaseMaze,
+        start_coordinate: tuple[int, int],
+        episodes: int,
+        agent_class: type[SARSAAgent]=QAgent,
+        method: str="Q_learning",
+        q_backend: str="dense",
+        maze_probability: float=0.1,
+        max_workers: int=None
+    )-> None:
+        """
+        @var $maze
+        **BaseMaze** Maze whose rewards and terminals are swept over.
+        @var $start_coordinate
+        **tuple[int, int]** Coordinate the agents start in.
+        @var $episodes
+        **int** Number of episodes per configuration.
+        @var $agent_class
+        **type[SARSAAgent]** Agent class to train.
+        @var $method
+        **str** Name of the learning method, e.g. "Q_learning" or "sarsa".
+        @var $q_backend
+        **str** Q-table backend of the agents.
+        @var $maze_probability
+        **float** Slip probability of the "stochastic" maze type.
+        @var $max_workers
+        **int** Number of worker processes, None for one per core.
+        """
+        self.maze = maze
+        self.start_coordinate = start_coordinate
+        self.episodes = episodes
+        self.agent_class = agent_class
+        self.method = method
+        self.q_backend = q_backend
+        self.maze_probability = maze_probability
+        self.max_workers = max_workers
+
+    @staticmethod
+    def grid(
+        alphas: list[float],
+        epsilons: list[float],
+        gammas: list[float],
+        maze_types: tuple[str, ...]=("stupid",)
+    )-> list[dict[str : float | str]]:
+        """
+        All combinations of the given values.
+
+        @param alphas: values for alpha
+        @param epsilons: values for epsilon
+        @param gammas: values for gamma
+        @param maze_types: names of maze types, @see MAZE_TYPES
+
+        @return list[dict[str : float | str]] with configurations
+        """
+        return [
+            {"alpha": alpha, "epsilon": epsilon, "gamma": gamma, "maze": maze}
+            for alpha, epsilon, gamma, maze in itertools.product(
+                alphas, epsilons, gammas, maze_types
+            )
+        ]
+
+    @staticmethod
+    def random_configurations(
+        n: int,
+        alpha_range: tuple[float, float]=(0.0, 1.0),
+        epsilon_range: tuple[float, float]=(0.0, 1.0),
+        gamma_range: tuple[float, float]=(0.0, 1.0),
+        maze_types: tuple[str, ...]=("stupid",),
+        seed: int=None
+    )-> list[dict[str : float | str]]:
+        """
+        Configurations drawn uniformly from the given ranges.
+
+        @param n: number of configurations
+        @param alpha_range: (min, max) of alpha
+        @param epsilon_range: (min, max) of epsilon
+        @param gamma_range: (min, max) of gamma
+        @param maze_types: names of maze types, @see MAZE_TYPES
+        @param seed: seed for drawing the configurations
+
+        @return list[dict[str : float | str]] with configurations
+        """
+        generator = RandomStream(seed).generator
+        return [
+            {
+                "alpha": float(generator.uniform(*alpha_range)),
+                "epsilon": float(generator.uniform(*epsilon_range)),
+                "gamma": float(generator.uniform(*gamma_range)),
+                "maze": maze_types[generator.integers(len(maze_types))],
+            }
+            for _ in range(n)
+        ]
+
+    @staticmethod
+    def converged_episode(
+        returns: np.ndarray,
+        tolerance: float=0.1
+    )-> int:
+        """
+        Episode after which the smoothed learning curve stays within
+        `tolerance` of its final value.
+
+        The curve is smoothed with a moving average over 5% of the
+        episodes. The final value is the mean of the last 10% of the
+        smoothed curve, the tolerance is relative to its range.
+
+        @param returns: return per episode
+        @param tolerance: allowed distance to the final value
+
+        @return int with index of the episode
+        """
+        window = max(1, len(returns) // 20)
+        smoothed = np.convolve(returns, np.ones(window) / window, "valid")
+        final = smoothed[-max(1, len(smoothed) // 10):].mean()
+        spread = smoothed.max() - smoothed.min()
+        outside = np.abs(smoothed - final) > tolerance * spread
+        if not outside.any():
+            return 0
+        return int(np.flatnonzero(outside)[-1] + window)
+
+    def run(
+        self,
+        configurations: list[dict[str : float | str]],
+        seed: int=0
+    )-> list[SweepResult]:
+        """
+        Train every configuration, across worker processes.
+
+        @param configurations: configurations, @see grid
+        @param seed: seed from which a seed is drawn per configuration
+
+        @return list[SweepResult] in the order of `configurations`
+        """
+        if not configurations:
+            return []
+        for configuration in configurations:
+            if configuration["maze"] not in MAZE_TYPES:
+                raise ValueError(
+                    f"Unknown maze type {configuration['maze']}."
+                    f" Expected one of {list(MAZE_TYPES)}."
+                )
+
+        # an int seed per configuration, which SweepResult can report
+        seeds = np.random.SeedSequence(seed).generate_state(
+            len(configurations), dtype=np.uint64
+        ).tolist()
+        n = len(configurations)
+
+        shape = self.maze.shape
+        memory = shared_memory.SharedMemory(
+            create=True,
+            size=self.maze.rewards.nbytes + self.maze.terminals.nbytes
+        )
+        rewards = terminals = None
+        try:
+            rewards, terminals = _shared_views(memory, shape)
+            rewards[...] = self.maze.rewards
+            terminals[...] = self.maze.terminals
+
+            with ProcessPoolExecutor(
+                self.max_workers,
+                initializer=_attach_shared_maze,
+                initargs=(
+                    memory.name,
+                    shape,
+                    configurations[0]["maze"],
+                    self.maze_probability
+                )
+            ) as executor:
+                curves = list(executor.map(
+                    _train_configuration,
+                    [self.agent_class] * n,
+                    [self.start_coordinate] * n,
+                    [self.method] * n,
+                    [self.episodes] * n,
+                    [self.q_backend] * n,
+                    [self.maze_probability] * n,
+                    configurations,
+                    seeds
+                ))
+        finally:
+            # views on the buffer must be gone before it can be closed,
+            # also when training failed
+            del rewards, terminals
+            memory.close()
+            memory.unlink()
+
+        tail = max(1, self.episodes // 10)
+        return [
+            SweepResult(
+                configuration=configuration,
+                final_return=float(returns[-tail:].mean()),
+                converged_episode=self.converged_episode(returns),
+                seed=run_seed
+            )
+            for configuration, run_seed, (returns, _) in zip(
+                configurations, seeds, curves
+            )
+        ]
+
+    @staticmethod
+    def report(results: list[SweepResult], top: int=5)-> None:
+        """
+        Print the best configurations, by final return
+        and by convergence speed.
+
+        @param results: results of `run`
+        @param top: number of configurations to print per ranking
+        """
+        rankings = {
+            "final return": sorted(
+                results, key=lambda result: -result.final_return
+            ),
+            "convergence speed": sorted(
+                results,
+                key=lambda result: (
+                    result.converged_episode, -result.final_return
+                )
+            ),
+        }
+        for name, ranking in rankings.items():
+            print(f"\033[32m{'─'*70}\n\t\tBest configurations by {name}\n{'─'*70}\033[0m")
+            for result in ranking[:top]:
+                configuration = result.configuration
+                print(
+                    f"α={configuration['alpha']:<6.3g} "
+                    f"ε={configuration['epsilon']:<6.3g} "
+                    f"γ={configuration['gamma']:<6.3g} "
+                    f"maze={configuration['maze']:<11}"
+                    f"final return={result.final_return:>8.2f}   "
+                    f"converged at episode {result.converged_episode}   "
+                    f"seed={result.seed}"
+                )
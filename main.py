@@ -1,6 +1,5 @@
 import ASCII_table
 import numpy as np
-from tqdm import tqdm
 
 from action import Action
 from helper import Q_to_policy_np_matrix
@@ -34,19 +33,14 @@ def testing_setup(epochs: int)-> None:
     #   Q with α=.1 ε=.1 γ=1   #
     ############################
     print(f"\033[32m{'─'*70}\n\t\tQ-learning, α=.1 ε=.1 γ=1 epoch={epochs}\n{'─'*70}\033[0m")
-    for _ in tqdm(range(epochs-1)):
-        agent.Q_learning(
-            alpha=0.1,
-            epsilon=0.1,
-            gamma=1,
-            print_result=False
-        )
     agent.Q_learning(
-            alpha=0.1,
-            epsilon=0.1,
-            gamma=1,
-            print_result=True
-        )
+        alpha=0.1,
+        epsilon=0.1,
+        gamma=1,
+        print_result=True,
+        episodes=epochs,
+        progress_bar=True
+    )
     print(f"\033[32m{'─'*63}\n\t\tOptimal Policy derived from Q\n{'─'*63}\033[0m")
     policy_table = ASCII_table.ASCIITable(
         data=Q_to_policy_np_matrix(agent.Q).T[::-1]
@@ -0,0 +1,484 @@
+from typing import Annotated
+import numpy as np
+
+from baseMaze import BaseMaze
+from floatRange import FloatRange, check_annotated
+from hardcodedOptimalPolicy import HardcodedOptimalPolicy
+
+
+# Factor by which a policy evaluation shrinks the residual of the policy
+EVALUATION_FORCING = 0.1
+
+
+def _scipy_sparse():
+    """
+    Import scipy.sparse, which is only needed by MazePlanner.
+
+    @return tuple with the scipy.sparse and scipy.sparse.linalg modules
+    """
+    try:
+        from scipy import sparse
+        from scipy.sparse import linalg
+    except ImportError:
+        raise ImportError(
+            f"MazePlanner requires scipy, which is not installed."
+        )
+    return sparse, linalg
+
+
+class MazePlanner:
+    """
+    MazePlanner class.
+
+    Solves the MDP of a maze for V* and Q*, on the exact dynamics of
+    `BaseMaze.transition_model`: entering a state gives its reward,
+    terminal states have a value of 0, and invalid moves, the empty rows
+    of non-terminal states, are never chosen.
+
+    Value iteration backs up whole rows and columns of the grid at once,
+    on slices of the transition matrix. Policy iteration evaluates its
+    policies with a sparse solve of (I - γP)V = R, like PolicyEvaluator.
+
+    NOTE: scipy is only needed for this class,
+    and is imported when a planner is created.
+    """
+
+    def __init__(self, maze: BaseMaze)-> None:
+        """
+        @var $maze
+        **BaseMaze** Maze to plan in.
+        @var $n_actions
+        **int** Number of actions per state.
+        @var $transition_matrix
+        **scipy.sparse.csr_matrix** (n_states * n_actions, n_states)
+        probability of every next state, per (s,a) pair.
+        @see TransitionModel.to_scipy
+        @var $rewards
+        **np.ndarray** Expected reward per (s,a) pair.
+        @var $valid
+        **np.ndarray** (n_states, n_actions) mask, True for every (s,a)
+        pair with a transition.
+        @var $all_valid
+        **bool** Whether every move in a non-terminal state is valid,
+        e.g. in a StupidMaze.
+        @var $terminals
+        **np.ndarray** Terminal flag per state id.
+        @var $lines
+        **list[tuple[slice, scipy.sparse.csr_matrix, np.ndarray]]**
+        State ids of every row and column, in sweep order, with the rows
+        of the transition matrix and the rewards of their (s,a) pairs.
+        """
+        sparse, _ = _scipy_sparse()
+        model = maze.transition_model
+        self.maze = maze
+        self.n_actions = model.n_actions
+        self.transition_matrix = model.to_scipy()
+        self.rewards = model.rewards
+        self.terminals = maze.flat_terminals
+        self.valid = (np.diff(model.indptr) > 0).reshape(-1, self.n_actions)
+        self.all_valid = bool(self.valid[~self.terminals].all())
+
+        self.lines = self._lines(self.transition_matrix, self.rewards)
+
+    def _lines(
+        self,
+        matrix,
+        rewards: np.ndarray=None
+    )-> list[tuple[slice, object, np.ndarray]]:
+        """
+        Rows and columns of the grid, in the order of `_sweep`, with their
+        rows of a matrix that has the same number of rows per state.
+
+        The rows of a row of the grid are contiguous, those of a column
+        are made contiguous in a copy with the columns one after the other,
+        such that every line is a view on a block of rows.
+
+        @param matrix: scipy.sparse.csr_matrix with rows ordered by state
+        @param rewards: vector with the same rows, None for no rewards
+
+        @return list[tuple[slice, scipy.sparse.csr_matrix, np.ndarray]]
+            with the state ids of every line, its rows of `matrix`,
+            and its rows of `rewards`, or None
+        """
+        sparse, _ = _scipy_sparse()
+        width, height = self.maze.shape
+        per_state = matrix.shape[0] // self.maze.n_states
+        by_column = (
+            self.maze.state_ids.T.reshape(-1, 1) * per_state +
+            np.arange(per_state)
+        ).reshape(-1)
+
+        def line(states, matrix, rewards, index, size):
+            block = size * per_state
+            start, stop = index * block, (index + 1) * block
+            return (
+                states,
+                self._row_block(sparse, matrix, start, stop),
+                None if rewards is None else rewards[start:stop]
+            )
+
+        rows = [
+            line(slice(x * height, (x + 1) * height), matrix, rewards,
+                 x, height)
+            for x in range(width)
+        ]
+        column_matrix = matrix[by_column]
+        column_rewards = None if rewards is None else rewards[by_column]
+        columns = [
+            line(slice(y, None, height), column_matrix, column_rewards,
+                 y, width)
+            for y in range(height)
+        ]
+        return rows + rows[::-1] + columns + columns[::-1]
+
+    @staticmethod
+    def _row_block(sparse, matrix, start: int, stop: int):
+        """
+        View on a block of rows of a CSR matrix, without copying them.
+
+        @param sparse: scipy.sparse module
+        @param matrix: scipy.sparse.csr_matrix to take the rows of
+        @param start: first row of the block
+        @param stop: row after the last row of the block
+
+        @return scipy.sparse.csr_matrix with rows `start` to `stop`
+        """
+        indptr = matrix.indptr[start:stop + 1]
+        first, last = indptr[0], indptr[-1]
+        return sparse.csr_matrix(
+            (
+                matrix.data[first:last],
+                matrix.indices[first:last],
+                indptr - first
+            ),
+            shape=(stop - start, matrix.shape[1]),
+            copy=False
+        )
+
+    def backup(self, values: np.ndarray, gamma: float)-> np.ndarray:
+        """
+        One Bellman backup of every state, Q(s,a) = E[r + γV(s')].
+
+        Invalid moves get -inf, terminal states get 0.
+
+        @param values: value per state id
+        @param gamma: discount value
+
+        @return np.ndarray with shape (n_states, n_actions)
+        """
+        return self._backup(
+            values, gamma, self.transition_matrix, self.rewards, slice(None)
+        )
+
+    def _backup(
+        self,
+        values: np.ndarray,
+        gamma: float,
+        matrix,
+        rewards: np.ndarray,
+        states: slice
+    )-> np.ndarray:
+        """
+        One Bellman backup of a subset of the states.
+
+        @param values: value per state id
+        @param gamma: discount value
+        @param matrix: rows of the transition matrix of `states`
+        @param rewards: expected rewards of the same rows
+        @param states: state ids to back up
+
+        @return np.ndarray with shape (len(states), n_actions)
+        """
+        Q = matrix @ values
+        Q *= gamma
+        Q += rewards
+        Q = Q.reshape(-1, self.n_actions)
+
+        if not self.all_valid:
+            Q[~self.valid[states]] = -np.inf
+        Q[self.terminals[states]] = 0.0
+        return Q
+
+    def _initial_values(self, gamma: float)-> np.ndarray:
+        """
+        Pessimistic starting values, a lower bound on every return:
+        the lowest reward in every step, from now on.
+
+        Values only have to rise from there, so a single sweep carries
+        the rewards of the terminal states across the grid. Starting
+        from 0, every sweep would only lower the values by a single step.
+        With γ=1, the bound is taken over a path through every state.
+
+        @param gamma: discount value
+
+        @return np.ndarray with a value per state id
+        """
+        valid = self.valid.reshape(-1)
+        lowest = min(float(self.rewards[valid].min()), 0.0) \
+            if valid.any() else 0.0
+        if gamma < 1.0:
+            lowest /= 1.0 - gamma
+        else:
+            lowest *= self.maze.n_states
+        values = np.full(self.maze.n_states, lowest)
+        values[self.terminals] = 0.0
+        return values
+
+    def _sweep(
+        self, 
+        values: np.ndarray, 
+        gamma: float, 
+        policy: np.ndarray=None
+    )-> float:
+        """
+        Update `values` in place, one line of the grid at a time.
+
+        The lines are swept along both axes, in both directions. Every line
+        is backed up at once, with the values of the lines before it already
+        updated, so a value travels across the whole grid in a single sweep,
+        instead of a single state per backup.
+
+        @param values: value per state id, updated in place
+        @param gamma: discount value
+        @param policy: action index per state id to evaluate,
+            None to take the max over the actions
+
+        @return float with the largest change of a value
+        """
+        max_change = 0.0
+        for line, matrix, rewards in self.lines:
+            Q = self._backup(values, gamma, matrix, rewards, line)
+            if policy is None:
+                updated = Q.max(axis=1)
+            else:
+                updated = Q[np.arange(len(Q)), policy[line]]
+            change = np.abs(updated - values[line]).max()
+            if change > max_change:
+                max_change = change
+            values[line] = updated
+        return max_change
+
+    def evaluate(
+        self,
+        policy: np.ndarray,
+        gamma: float,
+        values: np.ndarray,
+        tolerance: float=1e-10,
+        max_iterations: int=10_000
+    )-> bool:
+        """
+        Values of a policy, by solving (I - γP)V = R with a sparse solver,
+        until the residual (2-norm) is at most `tolerance`.
+
+        The solver starts from `values`, so it takes few iterations when
+        the policy changed little since they were computed, and every
+        iteration is preconditioned with a sweep of the policy. With γ=1,
+        I - P is singular for policies that can loop forever, for which
+        the solver fails.
+
+        @param policy: action index per state id
+        @param gamma: discount value
+        @param values: value per state id, as a starting point, 
+            updated in place if the solver succeeds
+        @param tolerance: absolute tolerance on the residual
+        @param max_iterations: maximum iterations of the solver
+
+        @return bool with True if the solver succeeded
+        """
+        sparse, linalg = _scipy_sparse()
+        n_states = self.maze.n_states
+        rows = np.arange(n_states) * self.n_actions + policy
+        matrix = self.transition_matrix[rows]
+        system = sparse.identity(n_states, format="csr") - gamma * matrix
+
+        # precondition with a sweep of the policy from 0, which solves
+        # the system along every line of the grid at once
+        lines = self._lines(matrix)
+
+        def sweep(residual: np.ndarray)-> np.ndarray:
+            solution = np.zeros(n_states)
+            for line, block, _ in lines:
+                solution[line] = residual[line] + gamma * (block @ solution)
+            return solution
+
+        solution, info = linalg.bicgstab(
+            system, self.rewards[rows], x0=values,
+            rtol=0.0, atol=tolerance, maxiter=max_iterations,
+            M=linalg.LinearOperator(system.shape, sweep)
+        )
+        if info != 0 or not np.isfinite(solution).all():
+            return False
+        values[:] = solution
+        return True
+
+    @check_annotated
+    def value_iteration(
+        self,
+        gamma: Annotated[float, FloatRange(0.0, 1.0)]=0.9,
+        tolerance: float=1e-6,
+        max_iterations: int=10_000
+    )-> tuple[np.ndarray, np.ndarray]:
+        """
+        Value iteration, V(s) = max_a Q(s,a), until V stops changing.
+
+        @see _sweep for the order of the backups
+
+        @param gamma: discount value
+        @param tolerance: stop when no value changes more than this
+        @param max_iterations: maximum number of sweeps
+
+        @return tuple[np.ndarray, np.ndarray] with V* per state id
+            and Q* with shape (n_states, n_actions)
+        """
+        values = self._initial_values(gamma)
+        for _ in range(max_iterations):
+            if self._sweep(values, gamma) <= tolerance:
+                break
+        return values, self.backup(values, gamma)
+
+    @check_annotated
+    def policy_iteration(
+        self,
+        gamma: Annotated[float, FloatRange(0.0, 1.0)]=0.9,
+        tolerance: float=1e-6,
+        max_iterations: int=1_000,
+        evaluation_sweeps: int=10
+    )-> tuple[np.ndarray, np.ndarray]:
+        """
+        Policy iteration, alternating policy evaluation and greedy
+        improvement, until the policy is stable and its values are within
+        `tolerance` of a Bellman backup. @see evaluate
+
+        Every improvement starts with a value iteration sweep, which
+        carries the values of the last evaluation across the grid, such
+        that far fewer improvements are needed. @see _sweep
+        Policy iteration is Newton's method on the Bellman equation, so an
+        evaluation only has to shrink the residual of the improved policy,
+        Q(s, π(s)) - V(s), by `EVALUATION_FORCING`, and at least that much
+        more than the last evaluation. Once the policy is stable, it is
+        evaluated up to `tolerance`, and kept if it is still stable.
+        The solves are preconditioned with sweeps of the policy.
+
+        A policy that cannot be evaluated, e.g. with γ=1 if it never
+        reaches a terminal state, is evaluated with `evaluation_sweeps`
+        sweeps instead, such that it still gets improved.
+
+        @param gamma: discount value
+        @param tolerance: minimal improvement of a value to change an
+            action, and maximal residual to stop at
+        @param max_iterations: maximum number of improvements, at least 1
+        @param evaluation_sweeps: number of sweeps to evaluate a policy
+            with, when the solver fails, at least 1
+
+        @return tuple[np.ndarray, np.ndarray] with V* per state id
+            and Q* with shape (n_states, n_actions)
+        """
+        if max_iterations < 1:
+            raise ValueError(
+                f"`max_iterations` must be at least 1, got {max_iterations}."
+            )
+        if evaluation_sweeps < 1:
+            raise ValueError(
+                f"`evaluation_sweeps` must be at least 1,"
+                f" got {evaluation_sweeps}."
+            )
+
+        states = np.arange(self.maze.n_states)
+        # a residual within this makes the values exact up to `tolerance`
+        precision = tolerance * max(1.0 - gamma, 1e-3)
+        values = self._initial_values(gamma)
+        policy = None
+        accuracy = np.inf
+        for _ in range(max_iterations):
+            if accuracy > precision:
+                # far from V*, so carry the values across the grid first
+                self._sweep(values, gamma)
+                Q = self.backup(values, gamma)
+                improved = self.greedy_actions(Q) if policy is None \
+                    else self._improve(Q, policy, tolerance)
+            else:
+                # evaluated up to `tolerance`, so improve on those values
+                Q = self.backup(values, gamma)
+                improved = self._improve(Q, policy, tolerance)
+                if (improved == policy).all():
+                    break
+            residual = Q[states, improved] - values
+            policy = improved
+
+            # an inexact evaluation, only as precise as the improvement
+            # needs, but more precise every time, down to `precision`
+            accuracy = max(
+                EVALUATION_FORCING * min(np.linalg.norm(residual), accuracy),
+                precision
+            )
+            self._evaluate(policy, gamma, values, accuracy, evaluation_sweeps)
+        return values, self.backup(values, gamma)
+
+    def _improve(
+        self,
+        Q: np.ndarray,
+        policy: np.ndarray,
+        tolerance: float
+    )-> np.ndarray:
+        """
+        Greedy improvement of a policy, which keeps its action in every
+        state unless another one is better by more than `tolerance`.
+
+        @param Q: Q-values with shape (n_states, n_actions)
+        @param policy: action index per state id
+        @param tolerance: minimal improvement to change an action
+
+        @return np.ndarray with an action index per state id
+        """
+        states = np.arange(len(Q))
+        improved = self.greedy_actions(Q)
+        keep = Q[states, policy] >= Q[states, improved] - tolerance
+        improved[keep] = policy[keep]
+        return improved
+
+    def _evaluate(
+        self,
+        policy: np.ndarray,
+        gamma: float,
+        values: np.ndarray,
+        accuracy: float,
+        sweeps: int
+    )-> bool:
+        """
+        Evaluate a policy in place with `evaluate`, or with sweeps of the
+        policy when the solver fails.
+
+        @param policy: action index per state id
+        @param gamma: discount value
+        @param values: value per state id, updated in place
+        @param accuracy: absolute tolerance on the residual of the solve
+        @param sweeps: number of sweeps when the solver fails
+
+        @return bool with True if the values are exact up to `accuracy`
+        """
+        if self.evaluate(policy, gamma, values, accuracy):
+            return True
+        for _ in range(sweeps):
+            change = self._sweep(values, gamma, policy)
+        return change <= accuracy
+
+    def greedy_actions(self, Q: np.ndarray)-> np.ndarray:
+        """
+        Greedy action index per state, with ties broken in favour of
+        the first action in ACTIONS.
+
+        @param Q: Q-values with shape (n_states, n_actions)
+
+        @return np.ndarray with an action index per state id
+        """
+        return Q.argmax(axis=1)
+
+    def to_policy(self, Q: np.ndarray)-> HardcodedOptimalPolicy:
+        """
+        Greedy policy of Q-values, with no action in terminal states.
+
+        @param Q: Q-values with shape (n_states, n_actions)
+
+        @return HardcodedOptimalPolicy with an action index per state id
+        """
+        return HardcodedOptimalPolicy.from_q_table(Q, self.maze)
@@ -0,0 +1,162 @@
+from typing import Annotated
+import numpy as np
+
+from action import ACTIONS
+from baseMaze import BaseMaze
+from denseQTable import DenseQTable
+from floatRange import FloatRange, check_annotated
+
+
+class OfflineQLearner:
+    """
+    OfflineQLearner class.
+
+    Learns Q-values from a fixed dataset of recorded transitions,
+    without stepping through the maze. Every iteration updates all
+    (s,a) pairs of the dataset at once, so a dataset can be reused for
+    many hyperparameters.
+
+    @see trajectoryRecorder.py for the dataset format
+    """
+
+    def __init__(self, maze: BaseMaze, records: np.ndarray)-> None:
+        """
+        @var $maze
+        **BaseMaze** Maze in which the transitions were recorded.
+        @var $records
+        **np.ndarray** Structured array with TRAJECTORY_DTYPE records,
+        e.g. from `TrajectoryRecorder.load`.
+        @var $states, $actions, $rewards, $next_states
+        **np.ndarray** Columns of `records`, one entry per transition.
+        @var $continues
+        **np.ndarray** True for transitions into a non-terminal state.
+        @var $pairs
+        **np.ndarray** Flat (s,a) index per transition, s * 4 + a.
+        @var $counts
+        **np.ndarray** Number of transitions per flat (s,a) index.
+        """
+        if len(records) == 0:
+            raise ValueError("Cannot learn from an empty dataset.")
+        for column in ("state_id", "next_state_id"):
+            if records[column].min() < 0 or \
+                    records[column].max() >= maze.n_states:
+                raise IndexError(
+                    f"`{column}` of the dataset is out of range"
+                    f" for a maze with {maze.n_states} states."
+                )
+
+        self.maze = maze
+        self.records = records
+        n_actions = len(ACTIONS)
+
+        self.states = np.asarray(records["state_id"], dtype=np.int64)
+        self.actions = np.asarray(records["action"], dtype=np.int64)
+        self.rewards = np.asarray(records["reward"], dtype=float)
+        self.next_states = np.asarray(records["next_state_id"], dtype=np.int64)
+        self.continues = ~np.asarray(records["terminal"], dtype=bool)
+
+        self.pairs = self.states * n_actions + self.actions
+        self.counts = np.bincount(
+            self.pairs, minlength=maze.n_states * n_actions
+        )
+        self._seen = self.counts > 0
+
+    def _targets(self, table: np.ndarray, gamma: float)-> np.ndarray:
+        """
+        TD target of every transition, r + γ max_a' Q(s',a').
+
+        @param table: (n_states, 4) matrix with Q-values
+        @param gamma: discount value
+
+        @return np.ndarray with a target per transition
+        """
+        bootstrap = table[self.next_states].max(axis=1)
+        return self.rewards + gamma * np.where(self.continues, bootstrap, 0.0)
+
+    def _mean_per_pair(self, values: np.ndarray)-> np.ndarray:
+        """
+        Average per-transition values over the transitions of each pair.
+
+        @param values: a value per transition
+
+        @return np.ndarray with a mean per flat (s,a) index,
+            0 for pairs without transitions
+        """
+        sums = np.bincount(
+            self.pairs, weights=values, minlength=len(self.counts)
+        )
+        return np.divide(
+            sums, self.counts, out=np.zeros_like(sums), where=self._seen
+        )
+
+    def _to_q_table(self, table: np.ndarray)-> DenseQTable:
+        """
+        Wrap learned Q-values in a Q-table, like `QAgent.Q`.
+
+        @param table: (n_states, 4) matrix with Q-values
+
+        @return DenseQTable in which all states of the dataset are visited
+        """
+        Q = DenseQTable(self.maze)
+        Q.table = table
+        Q.visited[self.states] = True
+        Q.visited[self.next_states] = True
+        return Q
+
+    @check_annotated
+    def fitted_Q_iteration(
+        self,
+        gamma: Annotated[float, FloatRange(0.0, 1.0)]=0.1,
+        iterations: int=100,
+        tolerance: float=1e-8
+    )-> DenseQTable:
+        """
+        Fitted Q-iteration, with a table as function approximator.
+
+        Every iteration, Q(s,a) is replaced by the mean TD target of the
+        transitions from (s,a), using the Q-values of the last iteration.
+
+        @param gamma: discount value
+        @param iterations: maximum number of iterations
+        @param tolerance: stop when no Q-value changes more than this
+
+        @return DenseQTable with the learned Q-values
+        """
+        shape = (self.maze.n_states, len(ACTIONS))
+        flat = np.zeros(shape[0] * shape[1])
+        for _ in range(iterations):
+            updated = self._mean_per_pair(
+                self._targets(flat.reshape(shape), gamma)
+            )
+            change = np.abs(updated - flat).max()
+            flat = updated
+            if change <= tolerance:
+                break
+        return self._to_q_table(flat.reshape(shape))
+
+    @check_annotated
+    def td_sweeps(
+        self,
+        alpha: Annotated[float, FloatRange(0.0, 1.0)]=0.1,
+        gamma: Annotated[float, FloatRange(0.0, 1.0)]=0.1,
+        sweeps: int=100
+    )-> DenseQTable:
+        """
+        Repeated sweeps of Q-learning updates over the whole dataset.
+
+        Every sweep, Q(s,a) = Q(s,a) + α mean[r + γ max_a' Q(s',a') - Q(s,a)],
+        averaged over the transitions from (s,a),
+        such that frequent pairs do not get larger steps.
+
+        @param alpha: alpha from formula, idk what it does exactly
+        @param gamma: discount value
+        @param sweeps: number of sweeps over the dataset
+
+        @return DenseQTable with the learned Q-values
+        """
+        shape = (self.maze.n_states, len(ACTIONS))
+        flat = np.zeros(shape[0] * shape[1])
+        for _ in range(sweeps):
+            targets = self._targets(flat.reshape(shape), gamma)
+            flat += alpha * self._mean_per_pair(targets - flat[self.pairs])
+        return self._to_q_table(flat.reshape(shape))
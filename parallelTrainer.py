@@ -0,0 +1,245 @@
+import copy
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+
+from baseMaze import BaseMaze
+from episodeStats import EpisodeStats
+from randomStream import RandomStream
+from SARSAAgent import SARSAAgent
+
+
+@dataclass
+class TrainingRun:
+    """
+    TrainingRun class
+
+    Result of training a single agent, with a single seed.
+    """
+    seed: int
+    Q: np.ndarray
+    Q_two: np.ndarray | None
+    stats: EpisodeStats
+
+
+@dataclass
+class ParallelTrainingResult:
+    """
+    ParallelTrainingResult class
+
+    Results of all runs of a ParallelTrainer, in the order of the seeds.
+    """
+    runs: list[TrainingRun]
+
+    @staticmethod
+    def pad(arrays: list[np.ndarray])-> np.ndarray:
+        """
+        Stack arrays of different lengths, e.g. the statistics of runs
+        that stopped early, padding the shorter ones with NaN.
+
+        @param arrays: array per run, which may differ in length only
+
+        @return np.ndarray with shape (len(arrays), longest, ...)
+        """
+        longest = max(len(array) for array in arrays)
+        padded = np.full(
+            (len(arrays), longest) + np.shape(arrays[0])[1:], np.nan
+        )
+        for index, array in enumerate(arrays):
+            padded[index, :len(array)] = array
+        return padded
+
+    @staticmethod
+    def aggregate(
+        values: np.ndarray,
+        z: float=1.96
+    )-> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Mean and confidence band over the first axis of `values`.
+
+        The band is mean ± z * standard error,
+        which is a 95% confidence interval for the default `z`.
+        NaN entries are missing, e.g. episodes after a run stopped early,
+        so every entry is aggregated over the runs that have it.
+        Entries with a single run get no band.
+
+        @param values: array with one entry per run on the first axis
+        @param z: number of standard errors in the band
+
+        @return tuple[np.ndarray, np.ndarray, np.ndarray] with
+            mean, lower and upper bound
+        """
+        values = np.asarray(values, dtype=float)
+        counts = (~np.isnan(values)).sum(axis=0)
+        mean = np.nanmean(values, axis=0)
+
+        error = np.zeros_like(mean)
+        several = counts > 1
+        if several.any():
+            error[several] = z * np.nanstd(
+                values[:, several], axis=0, ddof=1
+            ) / np.sqrt(counts[several])
+        return mean, mean - error, mean + error
+
+    def learning_curve(
+        self,
+        statistic: str="returns",
+        z: float=1.96
+    )-> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Mean and confidence band of a statistic per episode.
+
+        Runs that stopped early by a `tolerance` are shorter, after their
+        last episode the curve is aggregated over the remaining runs.
+
+        @param statistic: field of EpisodeStats, e.g. "returns"
+        @param z: number of standard errors in the band
+
+        @return tuple[np.ndarray, np.ndarray, np.ndarray] with
+            mean, lower and upper bound per episode of the longest run
+        """
+        return self.aggregate(
+            self.pad([getattr(run.stats, statistic) for run in self.runs]),
+            z
+        )
+
+    def Q_band(
+        self,
+        z: float=1.96
+    )-> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Mean and confidence band of the learned Q-values.
+
+        @param z: number of standard errors in the band
+
+        @return tuple[np.ndarray, np.ndarray, np.ndarray] with
+            mean, lower and upper bound, each of shape (n_states, 4)
+        """
+        return self.aggregate(self.pad([run.Q for run in self.runs]), z)
+
+
+def train_seed(
+    agent_class: type[SARSAAgent],
+    maze: BaseMaze,
+    start_coordinate: tuple[int, int],
+    method: str,
+    hyperparameters: dict[str : float],
+    episodes: int,
+    q_backend: str,
+    seed: int
+)-> TrainingRun:
+    """
+    Train a single agent, with its own random streams.
+
+    The agent and the maze each get a stream spawned from `seed`,
+    so the result only depends on the arguments.
+    Module level, such that it can be sent to worker processes.
+
+    @param agent_class: SARSAAgent or subclass to train
+    @param maze: maze to train in, is not changed
+    @param start_coordinate: coordinate the agent starts in
+    @param method: name of the learning method, e.g. "Q_learning"
+    @param hyperparameters: keyword arguments for `method`
+    @param episodes: number of episodes to train
+    @param q_backend: Q-table backend of the agent
+    @param seed: seed of the run
+
+    @return TrainingRun with Q-values and statistics
+    """
+    agent_stream, maze_stream = RandomStream(seed).spawn(2)
+
+    # the copy shares all arrays, but gets its own stream
+    maze = copy.copy(maze)
+    if hasattr(maze, "rng"):
+        maze.rng = maze_stream
+
+    agent = agent_class(maze, start_coordinate, agent_stream, q_backend)
+    stats = getattr(agent, method)(**hyperparameters, episodes=episodes)
+    Q_two = getattr(agent, "Q_two", None)
+    return TrainingRun(
+        seed=seed,
+        Q=agent.Q.to_array().copy(),
+        Q_two=Q_two.to_array().copy() if Q_two is not None else None,
+        stats=stats
+    )
+
+
+class ParallelTrainer:
+    """
+    ParallelTrainer class.
+
+    Trains independent agents, one per seed, across worker processes.
+    Every run only depends on its seed, so the results are identical to
+    a serial run with the same seeds, in any order of completion.
+    """
+
+    def __init__(
+        self,
+        agent_class: type[SARSAAgent],
+        maze: BaseMaze,
+        start_coordinate: tuple[int, int],
+        method: str,
+        hyperparameters: dict[str : float],
+        episodes: int,
+        q_backend: str="dense",
+        max_workers: int=None
+    )-> None:
+        """
+        @var $agent_class
+        **type[SARSAAgent]** Agent class to train.
+        @var $maze
+        **BaseMaze** Maze to train in.
+        @var $start_coordinate
+        **tuple[int, int]** Coordinate the agents start in.
+        @var $method
+        **str** Name of the learning method, e.g. "Q_learning" or "sarsa".
+        @var $hyperparameters
+        **dict[str : float]** Keyword arguments for `method`.
+        @var $episodes
+        **int** Number of episodes per run.
+        @var $q_backend
+        **str** Q-table backend of the agents.
+        @var $max_workers
+        **int** Number of worker processes, None for one per core.
+        """
+        self.agent_class = agent_class
+        self.maze = maze
+        self.start_coordinate = start_coordinate
+        self.method = method
+        self.hyperparameters = hyperparameters
+        self.episodes = episodes
+        self.q_backend = q_backend
+        self.max_workers = max_workers
+
+    def run(
+        self,
+        seeds: list[int],
+        parallel: bool=True
+    )-> ParallelTrainingResult:
+        """
+        Train one agent per seed.
+
+        @param seeds: seed per run
+        @param parallel: whether to use worker processes,
+            or run all seeds in this process
+
+        @return ParallelTrainingResult with a run per seed
+        """
+        arguments = (
+            [self.agent_class] * len(seeds),
+            [self.maze] * len(seeds),
+            [self.start_coordinate] * len(seeds),
+            [self.method] * len(seeds),
+            [self.hyperparameters] * len(seeds),
+            [self.episodes] * len(seeds),
+            [self.q_backend] * len(seeds),
+            seeds,
+        )
+        if not parallel:
+            return ParallelTrainingResult(list(map(train_seed, *arguments)))
+
+        with ProcessPoolExecutor(self.max_workers) as executor:
+            return ParallelTrainingResult(
+                list(executor.map(train_seed, *arguments))
+            )
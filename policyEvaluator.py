@@ -0,0 +1,164 @@
+from typing import Annotated
+import numpy as np
+
+from baseMaze import BaseMaze
+from basePolicy import BasePolicy
+from floatRange import FloatRange, check_annotated
+from state import State
+
+
+def _scipy_sparse():
+    """
+    Import scipy.sparse, which is only needed by PolicyEvaluator.
+
+    @return tuple with the scipy.sparse and scipy.sparse.linalg modules
+    """
+    try:
+        from scipy import sparse
+        from scipy.sparse import linalg
+    except ImportError:
+        raise ImportError(
+            f"PolicyEvaluator requires scipy, which is not installed."
+        )
+    return sparse, linalg
+
+
+class PolicyEvaluator:
+    """
+    PolicyEvaluator class.
+
+    Exact values of a policy in a maze, as an oracle for the estimates
+    of e.g. a TemporalDifferenceAgent.
+
+    The policy and the exact dynamics of the maze give the transition
+    matrix P and expected reward R of the policy, from which V follows
+    as the solution of (I - γP)V = R. @see BaseMaze.transition_model
+    Terminal states have no transitions, so their value is 0.
+
+    NOTE: scipy is only needed for this class,
+    and is imported when an evaluator is created.
+    """
+
+    def __init__(self, maze: BaseMaze, policy: BasePolicy)-> None:
+        """
+        @var $maze
+        **BaseMaze** Maze the policy acts in.
+        @var $policy
+        **BasePolicy** Policy to evaluate.
+        @var $transition_matrix
+        **scipy.sparse.csr_matrix** (n_states, n_states) probability of
+        every next state, under the policy.
+        @var $expected_rewards
+        **np.ndarray** Expected reward of a single step, per state id.
+        @var $values
+        **dict[float : np.ndarray]** Exact values per discount value,
+        for the discount values that were evaluated.
+        """
+        sparse, _ = _scipy_sparse()
+        self.maze = maze
+        self.policy = policy
+
+        model = maze.transition_model
+        probabilities = policy.action_probabilities(maze)
+        n_actions = model.n_actions
+
+        # P_π = Π P, with Π[s, (s,a)] = π(a|s)
+        weights = sparse.csr_matrix(
+            (
+                probabilities.reshape(-1),
+                np.arange(maze.n_states * n_actions),
+                np.arange(0, maze.n_states * n_actions + 1, n_actions)
+            ),
+            shape=(maze.n_states, maze.n_states * n_actions)
+        )
+        self.transition_matrix = (weights @ model.to_scipy()).tocsr()
+        self.expected_rewards = (
+            probabilities * model.rewards.reshape(-1, n_actions)
+        ).sum(axis=1)
+        self.values: dict[float : np.ndarray] = {}
+
+    @check_annotated
+    def evaluate(
+        self,
+        gamma: Annotated[float, FloatRange(0.0, 1.0)]=0.9,
+        tolerance: float=1e-10,
+        max_iterations: int=10_000
+    )-> np.ndarray:
+        """
+        Solve (I - γP)V = R for the exact values of the policy.
+
+        With γ<1, the system is solved directly. With γ=1, I - P is
+        singular for policies that can loop forever, so an iterative
+        solver is used, which fails if the values do not exist.
+
+        @param gamma: discount value
+        @param tolerance: relative tolerance of the iterative solver
+        @param max_iterations: maximum iterations of the iterative solver
+
+        @return np.ndarray with the value per state id
+        """
+        if gamma in self.values:
+            return self.values[gamma]
+
+        sparse, linalg = _scipy_sparse()
+        system = sparse.identity(self.maze.n_states, format="csr") - \
+            gamma * self.transition_matrix
+        if gamma < 1.0:
+            values = linalg.spsolve(system.tocsc(), self.expected_rewards)
+        else:
+            values, info = linalg.bicgstab(
+                system,
+                self.expected_rewards,
+                rtol=tolerance,
+                maxiter=max_iterations
+            )
+            if info != 0 or not np.isfinite(values).all():
+                raise ValueError(
+                    f"Policy evaluation with γ=1 did not converge."
+                    f" Does {self.policy} reach a terminal state"
+                    f" from every state?"
+                )
+
+        self.values[gamma] = values
+        return values
+
+    def rms_error(
+        self,
+        estimate: dict[State : float] | np.ndarray,
+        gamma: Annotated[float, FloatRange(0.0, 1.0)]=0.9,
+        evaluated: np.ndarray=None
+    )-> float:
+        """
+        Root mean square error of estimated values, against the exact
+        values, over the states that have an estimate.
+
+        @param estimate: values per State, like
+            `TemporalDifferenceAgent.values`, or value per state id,
+            like `TemporalDifferenceAgent.state_values`
+        @param gamma: discount value the estimate was made with
+        @param evaluated: boolean mask of the state ids with an estimate,
+            for a `estimate` per state id. All states by default
+
+        @return float with the RMS error
+        """
+        values = self.evaluate(gamma)
+        if isinstance(estimate, dict):
+            state_ids = np.fromiter(
+                (
+                    self.maze.get_state_id(state.position)
+                    for state in estimate
+                ),
+                dtype=np.int64,
+                count=len(estimate)
+            )
+            estimate = np.fromiter(
+                estimate.values(), dtype=float, count=len(estimate)
+            )
+        else:
+            state_ids = np.arange(self.maze.n_states) if evaluated is None \
+                else np.flatnonzero(evaluated)
+            estimate = np.asarray(estimate, dtype=float)[state_ids]
+
+        if len(state_ids) == 0:
+            raise ValueError("Cannot compute an RMS error without estimates.")
+        return float(np.sqrt(np.mean((estimate - values[state_ids]) ** 2)))
@@ -0,0 +1,357 @@
+from typing import Annotated, Callable
+import numpy as np
+from tqdm import tqdm
+
+from action import ACTIONS
+from baseMaze import BaseMaze
+from denseQTable import DenseQTable
+from episodeStats import EpisodeStats
+from floatRange import FloatRange, check_annotated
+from randomStream import RandomStream, get_default_stream
+from vectorizedMaze import VectorizedMaze
+
+
+class PopulationAgent:
+    """
+    PopulationAgent class.
+
+    A population of independent tabular agents, whose Q-tables are stored
+    as one (n_agents, n_states, 4) tensor. Every agent runs its own episode,
+    but all agents advance in lockstep: epsilon-greedy selection, stepping
+    and TD updates are done for the whole population at once.
+
+    The learning methods follow the single agent classes,
+    @see SARSAAgent.py, QAgent.py and doubleQAgent.py
+    """
+
+    def __init__(
+        self,
+        maze: BaseMaze,
+        start_coordinate: tuple[int, int],
+        n_agents: int,
+        rng: RandomStream=None
+    )-> None:
+        """
+        @var $maze
+        **VectorizedMaze** Maze with all agents in it,
+        which has no invalid moves. @see vectorizedMaze.py
+        @var $n_agents
+        **int** Number of agents in the population.
+        @var $rng
+        **RandomStream** Stream to draw exploration and coin flips from.
+        Defaults to the shared stream. @see randomStream.py
+        @var $Q
+        **np.ndarray** (n_agents, n_states, 4) tensor with Q-values.
+        @var $Q_two
+        **np.ndarray** Second tensor of Q-values for double Q-learning,
+        None until `double_Q_learning` is used.
+        @var $visited
+        **np.ndarray** (n_agents, n_states) mask, True for every state
+        an agent has visited.
+        """
+        self.rng = rng if rng is not None else get_default_stream()
+        self.maze = VectorizedMaze(maze, start_coordinate, n_agents, self.rng)
+        self.n_agents = n_agents
+
+        self.Q = np.zeros((n_agents, maze.n_states, len(ACTIONS)))
+        self.Q_two: np.ndarray | None = None
+        self.visited = np.zeros((n_agents, maze.n_states), dtype=bool)
+
+    def _choose_actions(
+        self,
+        action_values: np.ndarray,
+        epsilon: float
+    )-> np.ndarray:
+        """
+        Choose an action epsilon-greedily for every row of Q-values.
+
+        @param action_values: (N, 4) matrix with a row of Q-values per agent
+        @param epsilon: epsilon from formula, idk what it does exactly
+
+        @return np.ndarray with an action index per agent
+        """
+        n = len(action_values)
+        explore = self.rng.uniforms(n) < epsilon
+        return np.where(
+            explore,
+            self.rng.action_indices(n),
+            action_values.argmax(axis=1)
+        )
+
+    def _run_episodes(
+        self,
+        episodes: int,
+        progress_bar: bool,
+        episode: Callable[..., tuple[np.ndarray, np.ndarray, np.ndarray]],
+        *hyperparameters: float
+    )-> EpisodeStats:
+        """
+        Run a batch of population episodes.
+
+        @param episodes: number of episodes to run
+        @param progress_bar: whether to show a tqdm progress bar
+        @param episode: episode function, called with `hyperparameters`,
+            returning the length, return and max |ΔQ| per agent
+        @param hyperparameters: passed on to `episode`
+
+        @return EpisodeStats with arrays of shape (episodes, n_agents)
+        """
+        if episodes < 1:
+            raise ValueError(f"`episodes` must be at least 1, got {episodes}.")
+
+        stats = EpisodeStats.empty((episodes, self.n_agents))
+        indices = tqdm(range(episodes)) if progress_bar else range(episodes)
+        for index in indices:
+            stats.lengths[index], stats.returns[index], \
+                stats.max_deltas[index] = episode(*hyperparameters)
+        return stats
+
+    @check_annotated
+    def sarsa(
+        self,
+        alpha: Annotated[float, FloatRange(0.0, 1.0)]=0.1,
+        epsilon: Annotated[float, FloatRange(0.0, 1.0)]=0.1,
+        gamma: Annotated[float, FloatRange(0.0, 1.0)]=0.1,
+        episodes: int=1,
+        progress_bar: bool=False
+    )-> EpisodeStats:
+        """
+        sarsa function for PopulationAgent. @see SARSAAgent.sarsa
+
+        @param alpha: alpha from formula, idk what it does exactly
+        @param epsilon: epsilon from formula, idk what it does exactly
+        @param gamma: discount value
+        @param episodes: number of episodes to run
+        @param progress_bar: whether to show a progress bar
+
+        @return EpisodeStats with arrays of shape (episodes, n_agents)
+        """
+        return self._run_episodes(
+            episodes, progress_bar, self._sarsa_episode, alpha, epsilon, gamma
+        )
+
+    @check_annotated
+    def Q_learning(
+        self,
+        alpha: Annotated[float, FloatRange(0.0, 1.0)]=0.1,
+        epsilon: Annotated[float, FloatRange(0.0, 1.0)]=0.1,
+        gamma: Annotated[float, FloatRange(0.0, 1.0)]=0.1,
+        episodes: int=1,
+        progress_bar: bool=False
+    )-> EpisodeStats:
+        """
+        Q-learning function for PopulationAgent. @see QAgent.Q_learning
+
+        @param alpha: alpha from formula, idk what it does exactly
+        @param epsilon: epsilon from formula, idk what it does exactly
+        @param gamma: discount value
+        @param episodes: number of episodes to run
+        @param progress_bar: whether to show a progress bar
+
+        @return EpisodeStats with arrays of shape (episodes, n_agents)
+        """
+        return self._run_episodes(
+            episodes, progress_bar, self._Q_learning_episode,
+            alpha, epsilon, gamma, False
+        )
+
+    @check_annotated
+    def double_Q_learning(
+        self,
+        alpha: Annotated[float, FloatRange(0.0, 1.0)]=0.1,
+        epsilon: Annotated[float, FloatRange(0.0, 1.0)]=0.1,
+        gamma: Annotated[float, FloatRange(0.0, 1.0)]=0.1,
+        episodes: int=1,
+        progress_bar: bool=False
+    )-> EpisodeStats:
+        """
+        Double Q-learning function for PopulationAgent.
+        @see DoubleQAgent.Q_learning
+
+        @param alpha: alpha from formula, idk what it does exactly
+        @param epsilon: epsilon from formula, idk what it does exactly
+        @param gamma: discount value
+        @param episodes: number of episodes to run
+        @param progress_bar: whether to show a progress bar
+
+        @return EpisodeStats with arrays of shape (episodes, n_agents)
+        """
+        if self.Q_two is None:
+            self.Q_two = np.zeros_like(self.Q)
+        return self._run_episodes(
+            episodes, progress_bar, self._Q_learning_episode,
+            alpha, epsilon, gamma, True
+        )
+
+    def _sarsa_episode(
+        self,
+        alpha: float,
+        epsilon: float,
+        gamma: float
+    )-> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Perform a single sarsa episode for every agent, in lockstep.
+
+        @param alpha: alpha from formula, idk what it does exactly
+        @param epsilon: epsilon from formula, idk what it does exactly
+        @param gamma: discount value
+
+        @return tuple[np.ndarray, np.ndarray, np.ndarray] with length,
+            return and max |ΔQ| of the episode per agent
+        """
+        Q = self.Q
+        rewards = self.maze.rewards
+        terminals = self.maze.terminals
+        lengths = np.zeros(self.n_agents, dtype=np.int64)
+        returns = np.zeros(self.n_agents)
+        max_deltas = np.zeros(self.n_agents)
+
+        agents = np.arange(self.n_agents)
+        states = self.maze.reset()
+        self.visited[agents, states] = True
+        # calculate a
+        actions = self._choose_actions(Q[agents, states], epsilon)
+        active = agents[~terminals[states]]
+        while len(active):
+            current_states = states[active]
+            current_actions = actions[active]
+
+            # calculate s' and r
+            states_prime = self.maze.transition(current_states, current_actions)
+            reward = rewards[states_prime]
+            self.visited[active, states_prime] = True
+
+            # calculate a'
+            actions_prime = self._choose_actions(
+                Q[active, states_prime], epsilon
+            )
+
+            # Q(s,a) = Q(s,a) + α[r + γQ(s',a') - Q(s,a)]
+            delta = alpha * (
+                reward +
+                gamma * Q[active, states_prime, actions_prime] -
+                Q[active, current_states, current_actions]
+            )
+            Q[active, current_states, current_actions] += delta
+
+            lengths[active] += 1
+            returns[active] += reward
+            max_deltas[active] = np.maximum(
+                max_deltas[active], np.abs(delta)
+            )
+
+            # set back current state, and draw a again like SARSAAgent
+            states[active] = states_prime
+            actions[active] = self._choose_actions(
+                Q[active, states_prime], epsilon
+            )
+            active = active[~terminals[states_prime]]
+
+        return lengths, returns, max_deltas
+
+    def _Q_learning_episode(
+        self,
+        alpha: float,
+        epsilon: float,
+        gamma: float,
+        double: bool
+    )-> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Perform a single (double) Q-learning episode for every agent,
+        in lockstep.
+
+        @param alpha: alpha from formula, idk what it does exactly
+        @param epsilon: epsilon from formula, idk what it does exactly
+        @param gamma: discount value
+        @param double: whether to use double Q-learning, with `Q_two`
+
+        @return tuple[np.ndarray, np.ndarray, np.ndarray] with length,
+            return and max |ΔQ| of the episode per agent
+        """
+        Q = self.Q
+        Q_two = self.Q_two
+        rewards = self.maze.rewards
+        terminals = self.maze.terminals
+        lengths = np.zeros(self.n_agents, dtype=np.int64)
+        returns = np.zeros(self.n_agents)
+        max_deltas = np.zeros(self.n_agents)
+
+        agents = np.arange(self.n_agents)
+        states = self.maze.reset()
+        self.visited[agents, states] = True
+        active = agents[~terminals[states]]
+        while len(active):
+            current_states = states[active]
+
+            # calculate a, on the sum of both tables when double
+            action_values = Q[active, current_states]
+            if double:
+                action_values = action_values + Q_two[active, current_states]
+            actions = self._choose_actions(action_values, epsilon)
+
+            # calculate s' and r
+            states_prime = self.maze.transition(current_states, actions)
+            reward = rewards[states_prime]
+            self.visited[active, states_prime] = True
+
+            if not double:
+                groups = ((Q, Q, slice(None)),)
+            else:
+                # choose Q1 or Q2 to update per agent, the other one values a'
+                use_two = self.rng.uniforms(len(active)) < 0.5
+                groups = ((Q_two, Q, use_two), (Q, Q_two, ~use_two))
+
+            delta = np.empty(len(active))
+            for q_ref, q_other, mask in groups:
+                agent_ids = active[mask]
+                s, a, s_prime = \
+                    current_states[mask], actions[mask], states_prime[mask]
+
+                # calculate a', which is greedy in the updated table
+                actions_prime = q_ref[agent_ids, s_prime].argmax(axis=1)
+
+                # Q(s,a) = Q(s,a) + α[r + γQ'(s',a') - Q(s,a)]
+                delta[mask] = alpha * (
+                    reward[mask] +
+                    gamma * q_other[agent_ids, s_prime, actions_prime] -
+                    q_ref[agent_ids, s, a]
+                )
+                q_ref[agent_ids, s, a] += delta[mask]
+
+            lengths[active] += 1
+            returns[active] += reward
+            max_deltas[active] = np.maximum(
+                max_deltas[active], np.abs(delta)
+            )
+
+            # set back current state
+            states[active] = states_prime
+            active = active[~terminals[states_prime]]
+
+        return lengths, returns, max_deltas
+
+    def agent_Q(self, index: int, second: bool=False)-> DenseQTable:
+        """
+        Get the Q-table of a single agent, as a view on the tensor.
+
+        Can be printed like the Q-table of a single agent,
+        e.g. with `helper.Q_to_np_matrix`.
+
+        @param index: index of the agent
+        @param second: whether to get the table from `Q_two`
+
+        @return DenseQTable sharing its values with the population
+        """
+        if not -self.n_agents <= index < self.n_agents:
+            raise IndexError(
+                f"Agent {index} is out of range for {self.n_agents} agents."
+            )
+        tensor = self.Q_two if second else self.Q
+        if tensor is None:
+            raise AttributeError(
+                "`Q_two` is only available after `double_Q_learning`."
+            )
+        table = DenseQTable(self.maze.maze)
+        table.table = tensor[index]
+        table.visited = self.visited[index]
+        return table
@@ -0,0 +1,167 @@
+import numpy as np
+
+
+class RandomStream:
+    """
+    RandomStream class.
+
+    Seedable source of randomness, shared by policies, agents and mazes.
+    It is backed by a `numpy.random.Generator`, from which uniforms and
+    action indices are drawn in large blocks. The blocks are refilled
+    lazily, so single draws in the learning loops stay cheap.
+
+    Streams can spawn independent child streams, such that parallel
+    workers never share a state.
+    """
+
+    def __init__(
+        self,
+        seed: int | np.random.SeedSequence=None,
+        block_size: int=4096
+    )-> None:
+        """
+        @var $seed_sequence
+        **np.random.SeedSequence** Seed sequence the stream is built from.
+        @var $generator
+        **np.random.Generator** Generator the blocks are drawn from.
+        @var $block_size
+        **int** Number of values drawn at once.
+        """
+        self.block_size = block_size
+        self.seed(seed)
+
+    def seed(self, seed: int | np.random.SeedSequence=None)-> None:
+        """
+        (Re)seed the stream, in place.
+
+        Any values that were already drawn into the buffers are discarded.
+
+        @param seed: seed or SeedSequence. If None, fresh OS entropy is used.
+        """
+        self.seed_sequence = seed \
+            if isinstance(seed, np.random.SeedSequence) \
+            else np.random.SeedSequence(seed)
+        self.generator = np.random.Generator(
+            np.random.PCG64(self.seed_sequence)
+        )
+        self._uniforms: list[float] = []
+        self._uniform_position = 0
+        self._action_indices: list[int] = []
+        self._action_position = 0
+
+    def random(self)-> float:
+        """
+        Draw a single uniform float in [0, 1).
+
+        @return float drawn from the uniform buffer
+        """
+        if self._uniform_position == len(self._uniforms):
+            self._uniforms = self.generator.random(self.block_size).tolist()
+            self._uniform_position = 0
+        self._uniform_position += 1
+        return self._uniforms[self._uniform_position - 1]
+
+    def action_index(self)-> int:
+        """
+        Draw a single random action index.
+
+        @see ACTION_INDEX
+
+        @return int in [0, 4)
+        """
+        if self._action_position == len(self._action_indices):
+            self._action_indices = self.generator.integers(
+                0, 4, self.block_size
+            ).tolist()
+            self._action_position = 0
+        self._action_position += 1
+        return self._action_indices[self._action_position - 1]
+
+    def coin(self)-> bool:
+        """
+        Flip a fair coin.
+
+        @return bool with outcome of the flip
+        """
+        return self.random() < 0.5
+
+    def uniforms(self, size: int | tuple[int, ...])-> np.ndarray:
+        """
+        Draw an array of uniform floats in [0, 1), directly from
+        the generator.
+
+        @param size: shape of the array
+
+        @return np.ndarray with uniforms
+        """
+        return self.generator.random(size)
+
+    def action_indices(self, size: int | tuple[int, ...])-> np.ndarray:
+        """
+        Draw an array of random action indices, directly from
+        the generator.
+
+        @param size: shape of the array
+
+        @return np.ndarray with integers in [0, 4)
+        """
+        return self.generator.integers(0, 4, size)
+
+    def spawn(self, n: int)-> list['RandomStream']:
+        """
+        Spawn independent child streams.
+
+        Children are derived from `seed_sequence`, so spawning from
+        streams with the same seed gives the same children.
+
+        @param n: number of streams to spawn
+
+        @return list[RandomStream] with `n` independent streams
+        """
+        return [
+            RandomStream(seed_sequence, self.block_size)
+            for seed_sequence in self.seed_sequence.spawn(n)
+        ]
+
+    def get_state(self)-> dict:
+        """
+        Get the full state of the stream, including the buffers.
+
+        @return dict that can be passed to `set_state`
+        """
+        return {
+            "bit_generator": self.generator.bit_generator.state,
+            "uniforms": np.array(
+                self._uniforms[self._uniform_position:], dtype=float
+            ),
+            "action_indices": np.array(
+                self._action_indices[self._action_position:], dtype=np.int64
+            ),
+        }
+
+    def set_state(self, state: dict)-> None:
+        """
+        Restore a state from `get_state`.
+
+        @param state: dict with the state of a stream
+        """
+        self.generator.bit_generator.state = state["bit_generator"]
+        self._uniforms = np.asarray(state["uniforms"]).tolist()
+        self._uniform_position = 0
+        self._action_indices = np.asarray(state["action_indices"]).tolist()
+        self._action_position = 0
+
+
+# stream that is used by every component that is not given its own stream
+_default_stream = RandomStream()
+
+
+def get_default_stream()-> RandomStream:
+    """
+    Get the stream shared by all components without their own stream.
+
+    Use `get_default_stream().seed(...)` to make a run reproducible.
+
+    @return RandomStream shared by default
+    """
+    return _default_stream
@@ -0,0 +1,112 @@
+import numpy as np
+
+from randomStream import RandomStream, get_default_stream
+
+
+class ReplayBuffer:
+    """
+    ReplayBuffer class.
+
+    Fixed-capacity ring buffer of transitions, stored as parallel arrays
+    which are allocated once. When full, the oldest transition is
+    overwritten.
+    """
+
+    def __init__(self, capacity: int, rng: RandomStream=None)-> None:
+        """
+        @var $capacity
+        **int** Maximum number of stored transitions.
+        @var $rng
+        **RandomStream** Stream to sample minibatches from.
+        Defaults to the shared stream. @see randomStream.py
+        @var $states
+        **np.ndarray** State id per transition.
+        @var $actions
+        **np.ndarray** Action index per transition.
+        @var $rewards
+        **np.ndarray** Reward per transition.
+        @var $next_states
+        **np.ndarray** Next state id per transition.
+        @var $terminals
+        **np.ndarray** Whether the next state is terminal, per transition.
+        @var $size
+        **int** Number of stored transitions.
+        @var $position
+        **int** Index the next transition is written to.
+        """
+        if capacity < 1:
+            raise ValueError(f"`capacity` must be at least 1, got {capacity}.")
+        self.capacity = capacity
+        self.rng = rng if rng is not None else get_default_stream()
+
+        self.states = np.zeros(capacity, dtype=np.int64)
+        self.actions = np.zeros(capacity, dtype=np.int8)
+        self.rewards = np.zeros(capacity)
+        self.next_states = np.zeros(capacity, dtype=np.int64)
+        self.terminals = np.zeros(capacity, dtype=bool)
+        self.size = 0
+        self.position = 0
+
+    def store(
+        self,
+        state_id: int,
+        action_index: int,
+        reward: float,
+        next_state_id: int,
+        terminal: bool
+    )-> None:
+        """
+        Store a single transition, overwriting the oldest one when full.
+
+        @param state_id: id of the state the action is taken in
+        @param action_index: index of the action
+        @param reward: reward of the next state
+        @param next_state_id: id of the next state
+        @param terminal: whether the next state is terminal
+        """
+        position = self.position
+        self.states[position] = state_id
+        self.actions[position] = action_index
+        self.rewards[position] = reward
+        self.next_states[position] = next_state_id
+        self.terminals[position] = terminal
+
+        self.position = (position + 1) % self.capacity
+        if self.size < self.capacity:
+            self.size += 1
+
+    def sample(
+        self,
+        batch_size: int
+    )-> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Sample a minibatch of stored transitions, with replacement.
+
+        @param batch_size: number of transitions to sample
+
+        @return tuple[np.ndarray, ...] with states, actions, rewards,
+            next states and terminals of the minibatch
+        """
+        if self.size == 0:
+            raise IndexError("Cannot sample from an empty ReplayBuffer.")
+        indices = self.rng.generator.integers(0, self.size, batch_size)
+        return (
+            self.states[indices],
+            self.actions[indices],
+            self.rewards[indices],
+            self.next_states[indices],
+            self.terminals[indices]
+        )
+
+    def clear(self)-> None:
+        """
+        Forget all stored transitions, keeping the arrays.
+        """
+        self.size = 0
+        self.position = 0
+
+    def __len__(self)-> int:
+        """
+        Number of stored transitions.
+        """
+        return self.size
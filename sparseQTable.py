@@ -0,0 +1,150 @@
+import numpy as np
+
+from action import ACTIONS
+from baseMaze import BaseMaze
+from baseQTable import BaseQTable
+
+# Estimated bytes of a single entry of `slots`: the hash table entry,
+# plus the int objects of the state id and the row
+SLOT_BYTES = 120
+
+
+class SparseQTable(BaseQTable):
+    """
+    SparseQTable class.
+
+    Q-table for huge mazes, of which only a small part is visited.
+    Visited state ids are mapped to a slot in a float matrix, 
+    which is allocated lazily and grows when it is full.
+    The matrix and the slot mapping together never grow beyond
+    `max_bytes`, where a slot is estimated at SLOT_BYTES.
+
+    Extends BaseQTable class
+    @see baseQTable.py
+    """
+
+    def __init__(
+        self, 
+        maze: BaseMaze, 
+        max_bytes: int=None,
+        initial_capacity: int=1024
+    )-> None:
+        """
+        @var $maze
+        **BaseMaze** Maze whose state ids index the table.
+        @var $max_bytes
+        **int** Maximum total size of `table` and `slots` in bytes,
+        None for no limit.
+        @var $initial_capacity
+        **int** Number of rows allocated on the first visit.
+        @var $slots
+        **dict[int : int]** Row in `table` per visited state id.
+        @var $table
+        **np.ndarray** (capacity, 4) matrix with Q-values.
+        """
+        super().__init__(maze)
+        self.max_bytes = max_bytes
+        self.initial_capacity = initial_capacity
+        self.slots: dict[int : int] = {}
+        self.table = np.zeros((0, len(ACTIONS)))
+
+    def _grow(self)-> None:
+        """
+        Grow `table`, doubling its capacity, but staying within `max_bytes`.
+        Every row of `table` can get a slot, so a row is counted with
+        the size of a slot.
+
+        Raises MemoryError if the table is already at `max_bytes`.
+        """
+        row_bytes = len(ACTIONS) * self.table.itemsize + SLOT_BYTES
+        capacity = max(2 * len(self.table), self.initial_capacity)
+        if self.max_bytes is not None:
+            capacity = min(capacity, self.max_bytes // row_bytes)
+        if capacity <= len(self.table):
+            raise MemoryError(
+                f"SparseQTable is full. {len(self.slots)} states are "
+                f"visited, which is the limit for `max_bytes` "
+                f"{self.max_bytes}."
+            )
+        table = np.zeros((capacity, len(ACTIONS)))
+        table[:len(self.table)] = self.table
+        self.table = table
+
+    @property
+    def nbytes(self)-> int:
+        """
+        Estimated number of bytes used by `table` and `slots`.
+
+        @return int with the size in bytes
+        """
+        return self.table.nbytes + len(self.slots) * SLOT_BYTES
+
+    def ensure(self, state_id: int)-> None:
+        if state_id not in self.slots:
+            if len(self.slots) == len(self.table):
+                self._grow()
+            self.slots[state_id] = len(self.slots)
+
+    def row(self, state_id: int)-> np.ndarray:
+        return self.table[self.slots[state_id]]
+
+    def value(self, state_id: int, action_index: int)-> float:
+        return self.table[self.slots[state_id], action_index].item()
+
+    def add(self, state_id: int, action_index: int, value: float)-> None:
+        self.table[self.slots[state_id], action_index] += value
+
+    def greedy(self, state_id: int)-> int:
+        return int(self.table[self.slots[state_id]].argmax())
+
+    def _rows(self, state_ids: np.ndarray)-> np.ndarray:
+        """
+        Get the rows in `table` of a batch of visited states.
+
+        @param state_ids: ids of visited states
+
+        @return np.ndarray with a row index per state
+        """
+        slots = self.slots
+        return np.fromiter(
+            (slots[state_id] for state_id in state_ids.tolist()),
+            dtype=np.int64, 
+            count=len(state_ids)
+        )
+
+    def values_at(
+        self, 
+        state_ids: np.ndarray, 
+        action_indices: np.ndarray
+    )-> np.ndarray:
+        return self.table[self._rows(state_ids), action_indices]
+
+    def max_values(self, state_ids: np.ndarray)-> np.ndarray:
+        return self.table[self._rows(state_ids)].max(axis=1)
+
+    def add_at(
+        self, 
+        state_ids: np.ndarray, 
+        action_indices: np.ndarray, 
+        values: np.ndarray
+    )-> None:
+        np.add.at(self.table, (self._rows(state_ids), action_indices), values)
+
+    def visited_ids(self)-> list[int]:
+        return sorted(self.slots)
+
+    def to_array(self)-> np.ndarray:
+        array = np.zeros((self.maze.n_states, len(ACTIONS)))
+        if self.slots:
+            state_ids = np.fromiter(self.slots.keys(), dtype=np.int64)
+            array[state_ids] = self.table[:len(self.slots)]
+        return array
+
+    def empty_like(self)-> 'SparseQTable':
+        return SparseQTable(self.maze, self.max_bytes, self.initial_capacity)
+
+    def _is_visited(self, state_id: int)-> bool:
+        return state_id in self.slots
+
+    def __len__(self)-> int:
+        return len(self.slots)
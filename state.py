@@ -83,7 +83,7 @@ class State:
 
         @return str with stringified state
         """
-        line = "({: 2d},{:^2}), r = {:^3}".format(
+        line = "({: 2d},{:^2}), r = {:^3g}".format(
             self.position[0], 
             self.position[1], 
             self.reward
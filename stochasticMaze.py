@@ -1,10 +1,10 @@
 from typing import Annotated
 import numpy as np
-import random
 
-from action import Action
+from action import ACTIONS
 from stupidMaze import StupidMaze
 from floatRange import FloatRange, check_annotated
+from randomStream import RandomStream, get_default_stream
 
 
 class StochasticMaze(StupidMaze):
@@ -20,70 +20,57 @@ class StochasticMaze(StupidMaze):
         self, 
         grid_shape: tuple[int, int], 
         rewards: np.ndarray,
-        probability: Annotated[float, FloatRange(0.0, 1.0)]
+        probability: Annotated[float, FloatRange(0.0, 1.0)],
+        rng: RandomStream=None
     )-> None:
         """
-        @var $states
-        **np.ndarray** Numpy matrix with all the states.
+        @var $rewards
+        **np.ndarray** Float matrix with the reward for entering each state.
+        @var $terminals
+        **np.ndarray** Boolean matrix, True for every terminal state.
         @var $probability
         **Annotated[float, FloatRange(0.0, 1.0)]** 
         probability to NOT perform desired action. Should be low.
+        @var $rng
+        **RandomStream** Stream to draw slips from.
+        Defaults to the shared stream. @see randomStream.py
         """
         super().__init__(grid_shape, rewards)
         self.probability = probability
+        self.rng = rng if rng is not None else get_default_stream()
 
-    def step(
-        self, 
-        start_coordinate: tuple[int, int], 
-        action: Action
-    )-> tuple[int, int]:
+    def _action_probabilities(self)-> np.ndarray:
         """
-        Step function for StochasticMaze.
+        Probability that each action is performed, given the chosen one.
 
-        Return corresponding end coordinate, for given action.
-        If action would result in agent going out of bounce, 
-        the start_coordinate will be returned.
+        With a chance of `self.probability`, a uniformly random action is
+        performed instead, like in `step_id`. Changing `probability` 
+        afterwards does not reset `transition_model`.
 
-        @param start_coordinate: coordinate from where the `action`
-            will be performed.
-        @param action: action to take at `start_coordinate`
+        @return np.ndarray with shape (4, 4)
+        """
+        n_actions = len(ACTIONS)
+        return (1.0 - self.probability) * np.eye(n_actions) + \
+            self.probability / n_actions
 
-        @return tuple[int, int] with end coordinate
+    def step_id(self, state_id: int, action_index: int)-> int:
         """
-        # start_coordinate must be inside of maze
-        try:
-            self.states[start_coordinate]
-        except IndexError:
-            raise IndexError(
-                f"`start_coordinate` out of range."
-                f" Tried accessing {start_coordinate} from `self.states`, "
-                f"which has shape of {self.states.shape}"
-            )
+        Step function for StochasticMaze, on state ids.
 
-        # does not completely adhere to the probability, but fuck that
-        dice_roll = random.random()
-        if dice_roll < self.probability:
-            action = random.choice([
-                Action.UP, 
-                Action.DOWN, 
-                Action.LEFT, 
-                Action.RIGHT
-            ])
+        With a chance of `self.probability`, the desired action is 
+        replaced by a random one, before it is looked up in 
+        `self.transitions`.
+        If action would result in agent going out of bounce, 
+        the agent stays in place.
 
-        new_coordinate = tuple(map(sum, zip(start_coordinate, action.value)))
+        @param state_id: id of the state where the action is performed.
+        @param action_index: index of the action, @see ACTION_INDEX
 
-        # if `new_coordinate`` is out of bounce at the bottom or left, 
-        # let agent stay in place
-        if new_coordinate[0] < 0 or new_coordinate[1] < 0:
-            return start_coordinate
-        
-        # if `new_coordinate`` is out of bounce at the top or right, 
-        # let agent stay in place           
-        try:
-            self.states[new_coordinate]
-        except IndexError:
-            return start_coordinate
-        except Exception as e:
-            print(f"An unexpected error occurred: {e}")
+        @return int with id of the end state
+        """
+        # does not completely adhere to the probability, but fuck that
+        dice_roll = self.rng.random()
+        if dice_roll < self.probability:
+            action_index = self.rng.action_index()
 
-        return new_coordinate
+        return int(self.transitions[state_id, action_index])
@@ -1,6 +1,5 @@
 import numpy as np
 
-from action import Action
 from baseMaze import BaseMaze
 
 
@@ -18,76 +17,23 @@ class StupidMaze(BaseMaze):
         rewards: np.ndarray
     )-> None:
         """
-        @var $states
-        **np.ndarray** Numpy matrix with all the states.
+        @var $rewards
+        **np.ndarray** Float matrix with the reward for entering each state.
+        @var $terminals
+        **np.ndarray** Boolean matrix, True for every terminal state.
         """
         super().__init__(grid_shape, rewards)
 
-    def step(
-        self, 
-        start_coordinate: tuple[int, int], 
-        action: Action
-    )-> tuple[int, int]:
-        """
-        Step function for StupidMaze.
-
-        Return corresponding end coordinate, for given action.
-        If action would result in agent going out of bounce, 
-        the start_coordinate will be returned.
-
-        @param start_coordinate: coordinate from where the `action`
-            will be performed.
-        @param action: action to take at `start_coordinate`
-
-        @return tuple[int, int] with end coordinate
-        """
-        # start_coordinate must be inside of maze
-        try:
-            self.states[start_coordinate]
-        except IndexError:
-            raise IndexError(
-                f"`start_coordinate` out of range."
-                f" Tried accessing {start_coordinate} from `self.states`, "
-                f"which has shape of {self.states.shape}"
-            )
-
-        new_coordinate = tuple(map(sum, zip(start_coordinate, action.value)))
-
-        # if `new_coordinate`` is out of bounce at the bottom or left, 
-        # let agent stay in place
-        if new_coordinate[0] < 0 or new_coordinate[1] < 0:
-            return start_coordinate
-        
-        # if `new_coordinate`` is out of bounce at the top or right, 
-        # let agent stay in place           
-        try:
-            self.states[new_coordinate]
-        except IndexError:
-            return start_coordinate
-        except Exception as e:
-            print(f"An unexpected error occurred: {e}")
-
-        return new_coordinate
-
-    def step_reward(
-        self, 
-        start_coordinate: tuple[int, int], 
-        action: Action
-    )-> tuple[tuple[int, int], float]:
+    def _build_transitions(self)-> np.ndarray:
         """
-        Step function for StupidMaze.
-
-        Return corresponding end coordinate, for given action, 
-        along with the reward.
-        If action would result in agent going out of bounce, 
-        the start_coordinate will be returned.
+        Build the transition table of StupidMaze.
 
-        @param start_coordinate: coordinate from where the `action`
-            will be performed.
-        @param action: action to take at `start_coordinate`
+        Every action is valid. If an action would result in agent going 
+        out of bounce, the agent stays in place, meaning the table holds
+        the id of the state the action was taken in.
 
-        @return tuple[tuple[int, int], float] 
-            with end coordinate and reward
+        @return np.ndarray with shape (n_states, 4)
         """
-        new_coordinate = self.step(start_coordinate, action)
-        return new_coordinate, self[new_coordinate].reward
+        transitions = super()._build_transitions()
+        state_ids = np.arange(self.n_states, dtype=transitions.dtype)
+        return np.where(transitions < 0, state_ids[:, None], transitions)
@@ -0,0 +1,182 @@
+from itertools import chain
+
+import numpy as np
+
+from baseQTable import BaseQTable
+
+
+class TabularModel:
+    """
+    TabularModel class.
+
+    Model of a maze, learned from real transitions. For every observed
+    (s,a) pair it counts how often each next state was reached, such that
+    the dynamics of a StochasticMaze are estimated as well. Rewards are
+    stored per next state, as the reward of entering it.
+
+    Predecessors of every state are kept, for prioritized sweeping.
+    """
+
+    def __init__(self)-> None:
+        """
+        @var $outcomes
+        **dict[tuple[int, int] : dict[int : int]]** Number of times each
+        next state was reached, per observed (s,a) pair.
+        @var $totals
+        **dict[tuple[int, int] : int]** Number of observations per pair.
+        @var $pairs
+        **list[tuple[int, int]]** Observed (s,a) pairs, in order of their
+        first observation, to sample from.
+        @var $rewards
+        **dict[int : float]** Reward of entering each observed next state.
+        @var $terminals
+        **dict[int : bool]** Whether each observed next state is terminal.
+        @var $predecessors
+        **dict[int : set[tuple[int, int]]]** Observed (s,a) pairs that
+        lead to each state.
+        """
+        self.outcomes: dict[tuple[int, int] : dict[int : int]] = {}
+        self.totals: dict[tuple[int, int] : int] = {}
+        self.pairs: list[tuple[int, int]] = []
+        self.rewards: dict[int : float] = {}
+        self.terminals: dict[int : bool] = {}
+        self.predecessors: dict[int : set[tuple[int, int]]] = {}
+
+    def observe(
+        self,
+        state_id: int,
+        action_index: int,
+        reward: float,
+        next_state_id: int,
+        terminal: bool
+    )-> None:
+        """
+        Add a real transition to the model.
+
+        @param state_id: id of the state the action is taken in
+        @param action_index: index of the action
+        @param reward: reward of the next state
+        @param next_state_id: id of the next state
+        @param terminal: whether the next state is terminal
+        """
+        pair = (state_id, action_index)
+        outcomes = self.outcomes.get(pair)
+        if outcomes is None:
+            outcomes = self.outcomes[pair] = {}
+            self.totals[pair] = 0
+            self.pairs.append(pair)
+        if next_state_id not in outcomes:
+            outcomes[next_state_id] = 0
+            self.predecessors.setdefault(next_state_id, set()).add(pair)
+        outcomes[next_state_id] += 1
+        self.totals[pair] += 1
+        self.rewards[next_state_id] = reward
+        self.terminals[next_state_id] = terminal
+
+    def target(
+        self,
+        state_id: int,
+        action_index: int,
+        gamma: float,
+        Q: BaseQTable
+    )-> float:
+        """
+        Expected Q-learning target of an observed (s,a) pair, under the
+        estimated dynamics: Σ p(s'|s,a)[r + γ max_a' Q(s',a')].
+
+        @param state_id: id of the state the action is taken in
+        @param action_index: index of the action
+        @param gamma: discount value
+        @param Q: Q-values, in which every observed next state exists
+
+        @return float with the expected target
+        """
+        pair = (state_id, action_index)
+        rewards, terminals = self.rewards, self.terminals
+        target = 0.0
+        for next_state_id, count in self.outcomes[pair].items():
+            value = rewards[next_state_id]
+            if not terminals[next_state_id]:
+                value += gamma * Q.row(next_state_id).max()
+            target += count * value
+        return float(target / self.totals[pair])
+
+    def to_arrays(self)-> dict[str : np.ndarray]:
+        """
+        Flat arrays of the model, for a checkpoint. All dicts and sets are
+        stored in iteration order, such that `load_arrays` restores the
+        order of summation in `target`, and with it the exact targets.
+
+        @return dict[str : np.ndarray] with arrays by name
+        """
+        outcomes = [self.outcomes[pair] for pair in self.pairs]
+        predecessors = list(self.predecessors.values())
+        return {
+            "pairs": np.array(self.pairs, dtype=np.int64).reshape(-1, 2),
+            "totals": np.array(
+                [self.totals[pair] for pair in self.pairs], dtype=np.int64
+            ),
+            "outcome_sizes": np.array(
+                [len(counts) for counts in outcomes], dtype=np.int64
+            ),
+            "outcome_states": np.fromiter(
+                chain.from_iterable(outcomes), dtype=np.int64
+            ),
+            "outcome_counts": np.fromiter(
+                chain.from_iterable(counts.values() for counts in outcomes),
+                dtype=np.int64
+            ),
+            "states": np.fromiter(self.rewards.keys(), dtype=np.int64),
+            "rewards": np.fromiter(self.rewards.values(), dtype=float),
+            "terminals": np.array(
+                [self.terminals[state] for state in self.rewards], dtype=bool
+            ),
+            "predecessor_states": np.fromiter(
+                self.predecessors.keys(), dtype=np.int64
+            ),
+            "predecessor_sizes": np.array(
+                [len(pairs) for pairs in predecessors], dtype=np.int64
+            ),
+            "predecessor_pairs": np.array(
+                list(chain.from_iterable(predecessors)), dtype=np.int64
+            ).reshape(-1, 2),
+        }
+
+    def load_arrays(self, arrays: dict[str : np.ndarray])-> None:
+        """
+        Replace the model with one stored by `to_arrays`.
+
+        @param arrays: arrays by name, as returned by `to_arrays`
+        """
+        self.pairs = list(map(tuple, arrays["pairs"].tolist()))
+        self.totals = dict(zip(self.pairs, arrays["totals"].tolist()))
+
+        self.outcomes = {}
+        states = arrays["outcome_states"].tolist()
+        counts = arrays["outcome_counts"].tolist()
+        start = 0
+        for pair, size in zip(self.pairs, arrays["outcome_sizes"].tolist()):
+            self.outcomes[pair] = dict(
+                zip(states[start:start + size], counts[start:start + size])
+            )
+            start += size
+
+        states = arrays["states"].tolist()
+        self.rewards = dict(zip(states, arrays["rewards"].tolist()))
+        self.terminals = dict(zip(states, arrays["terminals"].tolist()))
+
+        self.predecessors = {}
+        pairs = list(map(tuple, arrays["predecessor_pairs"].tolist()))
+        start = 0
+        for state, size in zip(
+            arrays["predecessor_states"].tolist(),
+            arrays["predecessor_sizes"].tolist()
+        ):
+            self.predecessors[state] = set(pairs[start:start + size])
+            start += size
+
+    def __len__(self)-> int:
+        """
+        Number of observed (s,a) pairs.
+        """
+        return len(self.pairs)
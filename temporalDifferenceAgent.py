@@ -1,11 +1,14 @@
 from typing import Annotated
 import ASCII_table
+import numpy as np
 
+from action import Action, ACTION_INDEX
 from basePolicy import BasePolicy
 from baseMaze import BaseMaze
 from baseAgent import BaseAgent
 from floatRange import FloatRange, check_annotated
 from helper import state_dict_to_np_matrix
+from trajectoryRecorder import TrajectoryRecorder
 
 
 class TemporalDifferenceAgent(BaseAgent):
@@ -17,7 +20,8 @@ class TemporalDifferenceAgent(BaseAgent):
         self, 
         maze: BaseMaze, 
         policy: BasePolicy, 
-        start_coordinate: tuple[int, int]
+        start_coordinate: tuple[int, int],
+        recorder: TrajectoryRecorder=None
     )-> None:
         """
         @var $maze
@@ -28,9 +32,29 @@ class TemporalDifferenceAgent(BaseAgent):
         **tuple[int, int]** Current x, y coord of agent.
         @var $values
         **dict[State : float]** values per state in dict.
+        @var $recorder
+        **TrajectoryRecorder** Optional recorder of every transition,
+        e.g. as dataset for an OfflineQLearner.
+        @see trajectoryRecorder.py
+        @var $episode_count
+        **int** Number of finished episodes.
+        @var $step_count
+        **int** Number of steps taken in the current episode.
+        @var $state_values
+        **np.ndarray** Value per state id, for n-step TD.
+        @var $evaluated
+        **np.ndarray** Boolean vector, True for every state id 
+        with a value in `state_values`.
         """
         super().__init__(maze, policy, start_coordinate)
         self.values = {}
+        self.recorder = recorder
+        self.episode_count = 0
+        self.step_count = 0
+        self.state_values = np.zeros(maze.n_states)
+        self.evaluated = np.zeros(maze.n_states, dtype=bool)
+        self._ring_states = np.zeros(0, dtype=np.int64)
+        self._ring_rewards = np.zeros(0)
 
     def act(self, print_agent: bool=False)-> float:
         """
@@ -54,10 +78,14 @@ class TemporalDifferenceAgent(BaseAgent):
                 if action == None:
                     break
                 
+                previous_coordinate = self.current_coordinate
                 self.current_coordinate, reward = self.maze.step_reward(
                     self.current_coordinate, 
                     action
                 )
+                if self.recorder is not None:
+                    self._record(previous_coordinate, action, reward)
+                self.step_count += 1
                 break
             except IndexError:
                 continue
@@ -66,6 +94,30 @@ class TemporalDifferenceAgent(BaseAgent):
         if print_agent:
             print(self)
         return reward
+
+    def _record(
+        self, 
+        previous_coordinate: tuple[int, int], 
+        action: Action, 
+        reward: float
+    )-> None:
+        """
+        Record the transition of the last action.
+
+        @param previous_coordinate: coordinate the action was taken in
+        @param action: action that was taken
+        @param reward: reward for the action
+        """
+        state_prime = self.maze.get_state_id(self.current_coordinate)
+        self.recorder.record(
+            self.episode_count,
+            self.step_count,
+            self.maze.get_state_id(previous_coordinate),
+            ACTION_INDEX[action],
+            reward,
+            state_prime,
+            self.maze.flat_terminals[state_prime]
+        )
     
     @check_annotated
     def temporal_difference(
@@ -115,3 +167,98 @@ class TemporalDifferenceAgent(BaseAgent):
             )
             table.print()
         self.current_coordinate = starting_coordinate
+        self.episode_count += 1
+        self.step_count = 0
+
+    @check_annotated
+    def n_step_temporal_difference(
+        self, 
+        alpha: Annotated[float, FloatRange(0.0, 1.0)]=0.1,
+        gamma: Annotated[float, FloatRange(0.0, 1.0)]=0.1,
+        n: int=4,
+        print_agent: bool=False,
+        print_result: bool=False
+    )-> None:
+        """
+        n-step temporal difference function for TemporalDifferenceAgent.
+
+        This function performs a single episode of n-step TD,
+        in which V(s) is updated towards the discounted rewards of the
+        next n steps, plus the discounted value of the state after them.
+        The last n states and rewards are kept in a ring buffer,
+        the values are stored in `state_values`.
+        n=1 is the same update as `temporal_difference`.
+
+        @param alpha: alpha from formula, idk what it does exactly
+        @param gamma: discount value
+        @param n: number of steps to look ahead
+        @param print_agent: whether or not to print each step taken
+        @param print_result: whether to print the final values
+        """
+        if n < 1:
+            raise ValueError(f"`n` must be at least 1, got {n}.")
+        if len(self._ring_states) != n + 1:
+            self._ring_states = np.zeros(n + 1, dtype=np.int64)
+            self._ring_rewards = np.zeros(n + 1)
+        ring_states = self._ring_states
+        ring_rewards = self._ring_rewards
+        values = self.state_values
+        terminals = self.maze.flat_terminals
+        discounts = (gamma ** np.arange(n + 1)).tolist()
+
+        # Save starting point to reset at the end of the episode
+        starting_coordinate = self.current_coordinate
+
+        current_state = self.maze.get_state_id(self.current_coordinate)
+        ring_states[0] = current_state
+        self.evaluated[current_state] = True
+        end = None if not terminals[current_state] else 0
+        step = 0
+        while end != 0:
+            if end is None:
+                # take step t, storing S_t+1 and R_t+1
+                reward = self.act(print_agent)
+                state_prime = self.maze.get_state_id(self.current_coordinate)
+                ring_states[(step + 1) % (n + 1)] = state_prime
+                ring_rewards[(step + 1) % (n + 1)] = reward
+                self.evaluated[state_prime] = True
+                if terminals[state_prime]:
+                    end = step + 1
+
+            # update the state of n - 1 steps ago
+            tau = step - n + 1
+            if tau >= 0:
+                last = tau + n if end is None else min(tau + n, end)
+                # G = Σ γ^(i-τ-1) R_i + γ^n V(S_τ+n)
+                target = sum(
+                    discounts[i - tau - 1] * ring_rewards[i % (n + 1)]
+                    for i in range(tau + 1, last + 1)
+                )
+                if end is None or tau + n < end:
+                    bootstrap_state = ring_states[(tau + n) % (n + 1)]
+                    target += discounts[n] * values[bootstrap_state]
+                updated_state = ring_states[tau % (n + 1)]
+                values[updated_state] += alpha * (
+                    target - values[updated_state]
+                )
+
+                if end is not None and tau == end - 1:
+                    break
+            step += 1
+
+        if print_result:
+            print(f"\033[32m{'─'*45}\n\t\tValue matrix\n{'─'*45}\033[0m")
+            table = ASCII_table.ASCIITable(
+                state_dict_to_np_matrix(
+                    {
+                        self.maze.get_state(state_id): values[state_id].item()
+                        for state_id in np.flatnonzero(self.evaluated).tolist()
+                    }, 
+                    '', 
+                    "V = "
+                ).T[::-1]
+            )
+            table.print()
+        self.current_coordinate = starting_coordinate
+        self.episode_count += 1
+        self.step_count = 0
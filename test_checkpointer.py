@@ -0,0 +1,115 @@
+import os
+
+import numpy as np
+import pytest
+
+from checkpointer import Checkpointer
+from doubleQAgent import DoubleQAgent
+from dynaQAgent import DynaQAgent
+from QAgent import QAgent
+from randomStream import RandomStream
+from stochasticMaze import StochasticMaze
+
+
+LEARNING = dict(alpha=.1, epsilon=.1, gamma=.9)
+
+
+def _maze(probability: float=0.2)-> StochasticMaze:
+    """
+    8x8 stochastic maze, with terminal (7,7).
+    """
+    maze = StochasticMaze(
+        (8, 8), -np.ones((8, 8)), probability, RandomStream(7)
+    )
+    maze.set_terminal((7, 7))
+    return maze
+
+
+def _assert_same_q(agent, other)-> None:
+    """
+    Assert that two agents hold the same Q-tables.
+    """
+    for name in ("Q", "Q_two"):
+        if getattr(agent, name, None) is None:
+            continue
+        table, other_table = getattr(agent, name), getattr(other, name)
+        assert table.visited_ids() == other_table.visited_ids()
+        np.testing.assert_array_equal(
+            table.to_array(), other_table.to_array()
+        )
+
+
+def test_resume_from_segments_continues_identically(tmp_path)-> None:
+    path = str(tmp_path / "checkpoint.npz")
+    for agent_type in (QAgent, DoubleQAgent):
+        for q_backend in ("dict", "dense", "sparse"):
+            uninterrupted = agent_type(
+                _maze(), (0, 0), RandomStream(3), q_backend
+            )
+            uninterrupted.Q_learning(episodes=40, **LEARNING)
+
+            # a checkpoint after every batch, a base and 3 delta segments
+            interrupted = agent_type(
+                _maze(), (0, 0), RandomStream(3), q_backend
+            )
+            interrupted.checkpointer = Checkpointer(path, 3600.0)
+            for _ in range(4):
+                interrupted.Q_learning(episodes=5, **LEARNING)
+            assert interrupted.checkpointer.segments == 3
+
+            resumed = agent_type(_maze(), (0, 0), RandomStream(3), q_backend)
+            checkpointer = Checkpointer(path)
+            assert checkpointer.load(resumed) == 20
+            assert checkpointer.segments == 3
+            _assert_same_q(resumed, interrupted)
+
+            resumed.Q_learning(episodes=20, **LEARNING)
+            _assert_same_q(resumed, uninterrupted)
+
+
+def test_new_base_drops_old_segments(tmp_path)-> None:
+    path = str(tmp_path / "checkpoint.npz")
+    agent = QAgent(_maze(), (0, 0), RandomStream(3), "dense")
+    agent.checkpointer = Checkpointer(path, 0.0, max_segments=3)
+    agent.Q_learning(episodes=10, **LEARNING)
+    assert agent.checkpointer.segments <= 3
+    assert not os.path.exists(agent.checkpointer.segment_path(4))
+
+    agent.checkpointer.save(agent, full=True)
+    assert agent.checkpointer.segments == 0
+    assert not os.path.exists(agent.checkpointer.segment_path(1))
+
+    resumed = QAgent(_maze(), (0, 0), RandomStream(3), "dense")
+    assert Checkpointer(path).load(resumed) == 10
+    _assert_same_q(resumed, agent)
+
+
+def test_dyna_q_resumes_with_its_model(tmp_path)-> None:
+    path = str(tmp_path / "checkpoint.npz")
+    for prioritized in (False, True):
+        learning = dict(planning_steps=5, prioritized=prioritized, **LEARNING)
+        uninterrupted = DynaQAgent(_maze(), (0, 0), RandomStream(3), "dense")
+        expected = uninterrupted.dyna_Q(episodes=30, **learning)
+
+        interrupted = DynaQAgent(_maze(), (0, 0), RandomStream(3), "dense")
+        interrupted.checkpointer = Checkpointer(path, 0.0)
+        interrupted.dyna_Q(episodes=15, **learning)
+
+        resumed = DynaQAgent(_maze(), (0, 0), RandomStream(3), "dense")
+        assert Checkpointer(path).load(resumed) == 15
+        assert resumed.model.outcomes == interrupted.model.outcomes
+        assert resumed.priorities == interrupted.priorities
+        stats = resumed.dyna_Q(episodes=15, **learning)
+
+        np.testing.assert_array_equal(stats.lengths, expected.lengths[15:])
+        _assert_same_q(resumed, uninterrupted)
+
+
+def test_load_rejects_other_maze(tmp_path)-> None:
+    path = str(tmp_path / "checkpoint.npz")
+    agent = QAgent(_maze(), (0, 0), RandomStream(3), "dense")
+    Checkpointer(path).save(agent)
+
+    other = QAgent(_maze(0.3), (0, 0), RandomStream(3), "dense")
+    with pytest.raises(ValueError):
+        Checkpointer(path).load(other)
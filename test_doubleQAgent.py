@@ -0,0 +1,35 @@
+import numpy as np
+
+from action import ACTION_INDEX, Action
+from doubleQAgent import DoubleQAgent
+from randomStream import RandomStream
+from stupidMaze import StupidMaze
+
+
+def _agent(q_backend: str)-> DoubleQAgent:
+    """
+    DoubleQAgent in a 2x2 maze, with terminal (1,1).
+    """
+    maze = StupidMaze((2, 2), np.zeros((2, 2)))
+    maze.set_terminal((1, 1))
+    return DoubleQAgent(maze, (0, 0), RandomStream(0), q_backend)
+
+
+def test_greedy_policy_uses_both_tables()-> None:
+    for q_backend in ("dict", "dense", "sparse"):
+        agent = _agent(q_backend)
+        state_id = agent.maze.get_state_id((0, 0))
+        for table in (agent.Q, agent.Q_two):
+            table.ensure(state_id)
+        # Q alone prefers UP, Q_two alone prefers DOWN, the sum RIGHT
+        agent.Q.add(state_id, ACTION_INDEX[Action.UP], 2.0)
+        agent.Q.add(state_id, ACTION_INDEX[Action.RIGHT], 1.5)
+        agent.Q_two.add(state_id, ACTION_INDEX[Action.DOWN], 2.0)
+        agent.Q_two.add(state_id, ACTION_INDEX[Action.RIGHT], 1.5)
+
+        policy = agent.greedy_policy()
+
+        expected = (agent.Q.to_array() + agent.Q_two.to_array()).argmax(axis=1)
+        expected[agent.maze.flat_terminals] = -1
+        np.testing.assert_array_equal(policy.action_indices, expected)
+        assert policy.action_indices[state_id] == ACTION_INDEX[Action.RIGHT]
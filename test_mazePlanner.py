@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from baseMaze import BaseMaze
+from mazePlanner import MazePlanner
+from policyEvaluator import PolicyEvaluator
+from randomStream import RandomStream
+from stochasticMaze import StochasticMaze
+from stupidMaze import StupidMaze
+
+
+REWARDS = np.array([
+    [10,  -1,  -1,  -1],
+    [-2,  -1,  -1,  -1],
+    [-1,  -1, -10,  -1],
+    [-1,  -1, -10,  40],
+], dtype=float)
+
+
+def _mazes()-> list[BaseMaze]:
+    """
+    4x4 assignment maze in every kind of maze, and a larger stochastic
+    maze, all with terminals (0,0) and (3,3).
+    """
+    mazes = [
+        BaseMaze((4, 4), REWARDS),
+        StupidMaze((4, 4), REWARDS),
+        StochasticMaze((4, 4), REWARDS, 0.2, RandomStream(0)),
+        StochasticMaze((7, 5), -np.ones((7, 5)), 0.3, RandomStream(0)),
+    ]
+    for maze in mazes:
+        maze.set_terminal((0, 0))
+        maze.set_terminal((3, 3))
+    return mazes
+
+
+def test_value_and_policy_iteration_agree_with_evaluator()-> None:
+    for maze in _mazes():
+        planner = MazePlanner(maze)
+        for gamma in (0.9, 1.0):
+            V, Q = planner.value_iteration(gamma, tolerance=1e-10)
+            V_policy, Q_policy = planner.policy_iteration(
+                gamma, tolerance=1e-10
+            )
+            evaluated = PolicyEvaluator(
+                maze, planner.to_policy(Q_policy)
+            ).evaluate(gamma)
+
+            np.testing.assert_allclose(V_policy, V, atol=1e-8)
+            np.testing.assert_allclose(evaluated, V_policy, atol=1e-8)
+            np.testing.assert_allclose(Q.max(axis=1), V, atol=1e-8)
+            np.testing.assert_allclose(Q_policy.max(axis=1), V, atol=1e-8)
+
+
+def test_values_of_a_corridor()-> None:
+    # entering a state gives its reward, the terminal state is worth 0
+    maze = StupidMaze((3, 1), np.full((3, 1), -1.0))
+    maze.set_terminal((2, 0))
+    planner = MazePlanner(maze)
+    for solve in (planner.value_iteration, planner.policy_iteration):
+        V, _ = solve(0.9, tolerance=1e-10)
+        np.testing.assert_allclose(V, [-1.9, -1.0, 0.0], atol=1e-8)
+
+
+def test_policy_iteration_rejects_no_iterations()-> None:
+    planner = MazePlanner(_mazes()[0])
+    with pytest.raises(ValueError):
+        planner.policy_iteration(max_iterations=0)
+    with pytest.raises(ValueError):
+        planner.policy_iteration(evaluation_sweeps=0)
@@ -0,0 +1,82 @@
+import numpy as np
+
+from action import Action
+from hardcodedOptimalPolicy import HardcodedOptimalPolicy
+from policyEvaluator import PolicyEvaluator
+from stupidMaze import StupidMaze
+from temporalDifferenceAgent import TemporalDifferenceAgent
+
+
+EPISODES = 200
+RMS_BOUND = 1e-3
+
+
+def _assignment()-> tuple[StupidMaze, HardcodedOptimalPolicy]:
+    """
+    4x4 maze from the assignment, with its optimal policy.
+    @see baseAssignmentSimulations.simulate_base_assignment_A
+    """
+    rewards = np.array([
+        [10,  -1,  -1,  -1],
+        [-2,  -1,  -1,  -1],
+        [-1,  -1, -10,  -1],
+        [-1,  -1, -10,  40],
+    ], dtype=int)
+    maze = StupidMaze((4, 4), rewards)
+    maze.set_terminal((0, 0))
+    maze.set_terminal((3, 3))
+
+    optimal_actions = np.array([
+        [Action.RIGHT, Action.RIGHT, Action.RIGHT, None       ],
+        [Action.UP   , Action.UP   , Action.UP   , Action.UP  ],
+        [Action.UP   , Action.UP   , Action.LEFT , Action.LEFT],
+        [None        , Action.UP   , Action.UP   , Action.UP  ],
+    ])[::-1].T
+    policy = HardcodedOptimalPolicy(
+        actions={
+            state: action for state_row, action_row \
+            in zip(maze.states, optimal_actions) for \
+            state, action in zip(state_row, action_row)
+        }
+    )
+    return maze, policy
+
+
+def test_temporal_difference_matches_evaluator()-> None:
+    for gamma in (1.0, 0.5):
+        maze, policy = _assignment()
+        agent = TemporalDifferenceAgent(maze, policy, (2, 0))
+        for _ in range(EPISODES):
+            agent.temporal_difference(alpha=.1, gamma=gamma)
+
+        evaluator = PolicyEvaluator(maze, policy)
+        assert evaluator.rms_error(agent.values, gamma) < RMS_BOUND
+
+
+def test_n_step_temporal_difference_matches_evaluator()-> None:
+    for gamma in (1.0, 0.5):
+        for n in (1, 3):
+            maze, policy = _assignment()
+            agent = TemporalDifferenceAgent(maze, policy, (2, 0))
+            for _ in range(EPISODES):
+                agent.n_step_temporal_difference(alpha=.1, gamma=gamma, n=n)
+
+            evaluator = PolicyEvaluator(maze, policy)
+            rms_error = evaluator.rms_error(
+                agent.state_values, gamma, agent.evaluated
+            )
+            assert rms_error < RMS_BOUND
+
+
+def test_n_step_with_one_step_is_temporal_difference()-> None:
+    maze, policy = _assignment()
+    one_step = TemporalDifferenceAgent(maze, policy, (2, 0))
+    n_step = TemporalDifferenceAgent(maze, policy, (2, 0))
+    for _ in range(10):
+        one_step.temporal_difference(alpha=.1, gamma=.5)
+        n_step.n_step_temporal_difference(alpha=.1, gamma=.5, n=1)
+
+    for state, value in one_step.values.items():
+        state_id = maze.get_state_id(state.position)
+        assert n_step.evaluated[state_id]
+        assert np.isclose(n_step.state_values[state_id], value)
@@ -0,0 +1,99 @@
+import numpy as np
+
+from action import ACTION_INDEX, Action
+from doubleQAgent import DoubleQAgent
+from populationAgent import PopulationAgent
+from randomStream import RandomStream
+from stupidMaze import StupidMaze
+
+
+ALPHA, GAMMA = 0.5, 0.9
+UP, RIGHT = ACTION_INDEX[Action.UP], ACTION_INDEX[Action.RIGHT]
+
+
+def _maze()-> StupidMaze:
+    """
+    Corridor of 3 states, from start (0,0) to terminal (2,0), going RIGHT.
+    """
+    maze = StupidMaze((3, 1), np.full((3, 1), -1.0))
+    maze.set_terminal((2, 0))
+    return maze
+
+
+def _tables()-> tuple[np.ndarray, np.ndarray]:
+    """
+    Q-values such that both tables, and their sum, go RIGHT in state 0.
+    In state 1, Q prefers UP and Q_two RIGHT, while the sum goes RIGHT.
+    """
+    Q = np.zeros((3, 4))
+    Q_two = np.zeros((3, 4))
+    Q[0, RIGHT] = Q_two[0, RIGHT] = 1.0
+    Q[1] = [3.0, 0.0, 0.0, 1.0]
+    Q_two[1] = [0.0, 2.0, 0.0, 5.0]
+    return Q, Q_two
+
+
+def _expected()-> tuple[float, float]:
+    """
+    Q(0, RIGHT) after the first step, when Q is updated and when Q_two is.
+    The greedy action of the updated table is valued by the other one.
+    """
+    Q, Q_two = _tables()
+    target_one = -1.0 + GAMMA * Q_two[1, Q[1].argmax()]
+    target_two = -1.0 + GAMMA * Q[1, Q_two[1].argmax()]
+    return (
+        Q[0, RIGHT] + ALPHA * (target_one - Q[0, RIGHT]),
+        Q_two[0, RIGHT] + ALPHA * (target_two - Q_two[0, RIGHT])
+    )
+
+
+def _updated_table(
+    Q: np.ndarray,
+    Q_two: np.ndarray
+)-> tuple[int, float]:
+    """
+    Which table the first step updated, and the new Q(0, RIGHT) in it.
+    """
+    initial, initial_two = _tables()
+    changed = Q[0, RIGHT] != initial[0, RIGHT]
+    changed_two = Q_two[0, RIGHT] != initial_two[0, RIGHT]
+    assert changed != changed_two
+    return (0, Q[0, RIGHT]) if changed else (1, Q_two[0, RIGHT])
+
+
+def test_double_Q_population_matches_single_agent()-> None:
+    expected = _expected()
+
+    population = PopulationAgent(_maze(), (0, 0), 64, RandomStream(0))
+    Q, Q_two = _tables()
+    population.Q[:] = Q
+    population.Q_two = np.broadcast_to(Q_two, population.Q.shape).copy()
+    population.double_Q_learning(
+        alpha=ALPHA, epsilon=0.0, gamma=GAMMA, episodes=1
+    )
+    population_updates = {}
+    for index in range(population.n_agents):
+        table, value = _updated_table(
+            population.Q[index], population.Q_two[index]
+        )
+        population_updates.setdefault(table, value)
+        assert value == population_updates[table]
+
+    agent_updates = {}
+    for seed in range(32):
+        agent = DoubleQAgent(_maze(), (0, 0), RandomStream(seed), "dense")
+        agent.Q.load_array(Q, [0, 1])
+        agent.Q_two.load_array(Q_two, [0, 1])
+        agent.Q_learning(alpha=ALPHA, epsilon=0.0, gamma=GAMMA, episodes=1)
+        table, value = _updated_table(
+            agent.Q.to_array(), agent.Q_two.to_array()
+        )
+        agent_updates.setdefault(table, value)
+        assert value == agent_updates[table]
+
+    # both tables were updated at least once, to the double Q target
+    assert population_updates == agent_updates
+    assert set(population_updates) == {0, 1}
+    np.testing.assert_allclose(
+        [population_updates[0], population_updates[1]], expected
+    )
@@ -0,0 +1,100 @@
+import numpy as np
+
+from baseQTable import BaseQTable
+from denseQTable import DenseQTable
+from dictQTable import DictQTable
+from QAgent import QAgent
+from randomStream import RandomStream
+from SARSAAgent import SARSAAgent
+from sparseQTable import SparseQTable
+from stochasticMaze import StochasticMaze
+
+
+def _maze()-> StochasticMaze:
+    """
+    6x6 stochastic maze, with terminal (5,5).
+    """
+    maze = StochasticMaze((6, 6), -np.ones((6, 6)), 0.2, RandomStream(7))
+    maze.set_terminal((5, 5))
+    return maze
+
+
+def _tables(maze: StochasticMaze)-> list[BaseQTable]:
+    """
+    Every backend, with a sparse table that has to grow on most visits.
+    """
+    return [
+        DictQTable(maze),
+        DenseQTable(maze),
+        SparseQTable(maze, initial_capacity=1),
+    ]
+
+
+def _assert_same(tables: list[BaseQTable])-> None:
+    """
+    Assert that all tables hold the same visited states and Q-values.
+    """
+    first = tables[0]
+    for table in tables[1:]:
+        assert table.visited_ids() == first.visited_ids()
+        assert len(table) == len(first)
+        np.testing.assert_array_equal(
+            table.visited_mask(), first.visited_mask()
+        )
+        np.testing.assert_array_equal(table.to_array(), first.to_array())
+
+
+def test_backends_agree_on_random_updates()-> None:
+    maze = _maze()
+    tables = _tables(maze)
+    rng = np.random.default_rng(0)
+    for _ in range(50):
+        state_ids = rng.integers(0, maze.n_states, 8)
+        action_indices = rng.integers(0, 4, 8)
+        values = rng.normal(size=8)
+        for table in tables:
+            for state_id in state_ids.tolist():
+                table.ensure(state_id)
+            table.add_at(state_ids, action_indices, values)
+            table.add(int(state_ids[0]), int(action_indices[0]), 1.0)
+
+        visited = np.array(tables[0].visited_ids())
+        for table in tables[1:]:
+            np.testing.assert_array_equal(
+                table.values_at(state_ids, action_indices),
+                tables[0].values_at(state_ids, action_indices)
+            )
+            np.testing.assert_array_equal(
+                table.max_values(visited), tables[0].max_values(visited)
+            )
+            assert [table.greedy(s) for s in visited.tolist()] == \
+                [tables[0].greedy(s) for s in visited.tolist()]
+    _assert_same(tables)
+
+    # a table loaded from another backend holds the same values
+    array, state_ids = tables[0].to_array(), tables[0].visited_ids()
+    loaded = [table.empty_like() for table in tables]
+    for table in loaded:
+        table.load_array(array, state_ids)
+    _assert_same(tables + loaded)
+
+
+def test_backends_learn_the_same_q_values()-> None:
+    for agent_type, learn in (
+        (QAgent, lambda agent: agent.Q_learning(
+            alpha=.1, epsilon=.1, gamma=.9, episodes=30
+        )),
+        (SARSAAgent, lambda agent: agent.sarsa(
+            alpha=.1, epsilon=.1, gamma=.9, episodes=30
+        )),
+    ):
+        agents = []
+        for backend in range(3):
+            # a maze per agent, as the maze has a random stream of its own
+            maze = _maze()
+            agent = agent_type(
+                maze, (0, 0), RandomStream(3), _tables(maze)[backend]
+            )
+            learn(agent)
+            agents.append(agent)
+        _assert_same([agent.Q for agent in agents])
@@ -0,0 +1,137 @@
+import os
+
+import numpy as np
+
+
+# Layout of a single recorded transition
+TRAJECTORY_DTYPE = np.dtype([
+    ("episode", np.int64),
+    ("step", np.int64),
+    ("state_id", np.int64),
+    ("action", np.int8),
+    ("reward", np.float64),
+    ("next_state_id", np.int64),
+    ("terminal", np.bool_),
+])
+
+
+class TrajectoryRecorder:
+    """
+    TrajectoryRecorder class.
+
+    Records transitions into a preallocated chunk of TRAJECTORY_DTYPE
+    records. A full chunk is flushed to the end of a raw record file,
+    through a `np.memmap`, so the memory use is bounded by one chunk,
+    however long the run.
+
+    The file has no header, @see load to reopen it zero-copy.
+    """
+
+    def __init__(self, path: str, chunk_size: int=65536)-> None:
+        """
+        @var $path
+        **str** Path of the record file, which is truncated.
+        @var $chunk_size
+        **int** Number of transitions kept in memory before flushing.
+        @var $chunk
+        **np.ndarray** Structured array with the unflushed transitions.
+        @var $n_buffered
+        **int** Number of transitions in `chunk`.
+        @var $n_flushed
+        **int** Number of transitions in the file.
+        """
+        if chunk_size < 1:
+            raise ValueError(
+                f"`chunk_size` must be at least 1, got {chunk_size}."
+            )
+        self.path = path
+        self.chunk_size = chunk_size
+        self.chunk = np.zeros(chunk_size, dtype=TRAJECTORY_DTYPE)
+        self.n_buffered = 0
+        self.n_flushed = 0
+        open(path, "wb").close()
+
+    def record(
+        self,
+        episode: int,
+        step: int,
+        state_id: int,
+        action: int,
+        reward: float,
+        next_state_id: int,
+        terminal: bool
+    )-> None:
+        """
+        Append a single transition, flushing the chunk when full.
+
+        @param episode: index of the episode
+        @param step: index of the step in the episode
+        @param state_id: id of the state the action is taken in
+        @param action: index of the action
+        @param reward: reward of the next state
+        @param next_state_id: id of the next state
+        @param terminal: whether the next state is terminal
+        """
+        self.chunk[self.n_buffered] = (
+            episode, step, state_id, action, reward, next_state_id, terminal
+        )
+        self.n_buffered += 1
+        if self.n_buffered == self.chunk_size:
+            self.flush()
+
+    def flush(self)-> None:
+        """
+        Write the buffered transitions to the end of the file.
+        """
+        if self.n_buffered == 0:
+            return
+
+        itemsize = TRAJECTORY_DTYPE.itemsize
+        with open(self.path, "r+b") as file:
+            file.truncate((self.n_flushed + self.n_buffered) * itemsize)
+        records = np.memmap(
+            self.path,
+            dtype=TRAJECTORY_DTYPE,
+            mode="r+",
+            offset=self.n_flushed * itemsize,
+            shape=(self.n_buffered,)
+        )
+        records[:] = self.chunk[:self.n_buffered]
+        records.flush()
+        del records
+
+        self.n_flushed += self.n_buffered
+        self.n_buffered = 0
+
+    def close(self)-> None:
+        """
+        Flush the remaining transitions.
+        """
+        self.flush()
+
+    def __enter__(self)-> 'TrajectoryRecorder':
+        return self
+
+    def __exit__(self, *exc_info)-> None:
+        self.close()
+
+    def __len__(self)-> int:
+        """
+        Number of recorded transitions, flushed or not.
+        """
+        return self.n_flushed + self.n_buffered
+
+    @staticmethod
+    def load(path: str)-> np.ndarray:
+        """
+        Open a record file read-only, without copying it into memory.
+
+        Columns are accessed by name, e.g. `records["reward"]`.
+
+        @param path: path of a file written by a TrajectoryRecorder
+
+        @return np.memmap with TRAJECTORY_DTYPE records
+        """
+        if os.path.getsize(path) == 0:
+            return np.zeros(0, dtype=TRAJECTORY_DTYPE)
+        return np.memmap(path, dtype=TRAJECTORY_DTYPE, mode="r")
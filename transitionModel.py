@@ -0,0 +1,78 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+
+@dataclass
+class TransitionModel:
+    """
+    TransitionModel class
+
+    Exact dynamics of a maze, P[s, a, s'] in CSR form, with a row per
+    (s,a) pair at row index `state_id * n_actions + action_index`.
+    The next state ids of row `r` are `indices[indptr[r]:indptr[r + 1]]`,
+    with their probabilities at the same positions in `probabilities`.
+
+    Only transitions with a non-zero probability are stored, so memory is
+    proportional to the number of non-zero transitions. Rows of terminal
+    states and of invalid actions are empty.
+
+    `rewards` holds the expected reward of every row, with the reward
+    of the entered state, like `BaseMaze.step_reward_id`.
+    """
+    n_states: int
+    n_actions: int
+    indptr: np.ndarray
+    indices: np.ndarray
+    probabilities: np.ndarray
+    rewards: np.ndarray
+
+    def row(
+        self,
+        state_id: int,
+        action_index: int
+    )-> tuple[np.ndarray, np.ndarray]:
+        """
+        Get the possible next states of a (s,a) pair.
+
+        @param state_id: id of the state where the action is performed
+        @param action_index: index of the action, @see ACTION_INDEX
+
+        @return tuple[np.ndarray, np.ndarray] with views on the next
+            state ids and their probabilities
+        """
+        row = state_id * self.n_actions + action_index
+        start, stop = self.indptr[row], self.indptr[row + 1]
+        return self.indices[start:stop], self.probabilities[start:stop]
+
+    @property
+    def nbytes(self)-> int:
+        """
+        Number of bytes used by the arrays of the model.
+
+        @return int with the size in bytes
+        """
+        return self.indptr.nbytes + self.indices.nbytes + \
+            self.probabilities.nbytes + self.rewards.nbytes
+
+    def to_scipy(self):
+        """
+        Convert the model to a scipy sparse matrix, without copying it.
+
+        NOTE: scipy is only needed for this method,
+        and is imported when it is called.
+
+        @return scipy.sparse.csr_matrix with shape
+            (n_states * n_actions, n_states)
+        """
+        try:
+            from scipy import sparse
+        except ImportError:
+            raise ImportError(
+                f"`to_scipy` requires scipy, which is not installed."
+            )
+        return sparse.csr_matrix(
+            (self.probabilities, self.indices, self.indptr),
+            shape=(self.n_states * self.n_actions, self.n_states),
+            copy=False
+        )
@@ -0,0 +1,132 @@
+import numpy as np
+
+from baseMaze import BaseMaze
+from randomStream import RandomStream, get_default_stream
+from stochasticMaze import StochasticMaze
+
+
+class VectorizedMaze:
+    """
+    VectorizedMaze class.
+
+    Wrapper around a StupidMaze or StochasticMaze that steps N independent
+    agents in one NumPy call.
+    @see stupidMaze.py
+    @see stochasticMaze.py
+
+    Positions are state ids, actions are action indices.
+    @see ACTION_INDEX
+    Agents that enter a terminal state are put back on their start state,
+    such that thousands of episodes can run at the same time.
+    """
+
+    def __init__(
+        self,
+        maze: BaseMaze,
+        start_coordinate: tuple[int, int],
+        n_agents: int,
+        rng: RandomStream=None
+    )-> None:
+        """
+        @var $maze
+        **BaseMaze** Maze which is wrapped.
+        @var $n_agents
+        **int** Number of agents stepped at once.
+        @var $start_id
+        **int** State id every agent starts (and restarts) in.
+        @var $rewards
+        **np.ndarray** Rewards of `maze`, indexed by state id. Not a copy.
+        @var $terminals
+        **np.ndarray** Terminal mask of `maze`, indexed by state id.
+        Not a copy.
+        @var $transitions
+        **np.ndarray** Transition table of `maze`. Not a copy.
+        @var $rng
+        **RandomStream** Stream to draw slips from.
+        Defaults to the stream of `maze`, if it has one.
+        """
+        if (maze.transitions < 0).any():
+            raise AttributeError(
+                f"`maze` has invalid actions, which can not be stepped "
+                f"in a vectorized way. Use a StupidMaze or StochasticMaze."
+            )
+
+        self.maze = maze
+        self.n_agents = n_agents
+        self.start_id = maze.get_state_id(start_coordinate)
+        self.rewards = maze.flat_rewards
+        self.terminals = maze.flat_terminals
+        self.transitions = maze.transitions
+        self.rng = rng if rng is not None \
+            else getattr(maze, "rng", get_default_stream())
+
+    def reset(self)-> np.ndarray:
+        """
+        Put all agents on the start state.
+
+        @return np.ndarray with the state id of every agent
+        """
+        return np.full(self.n_agents, self.start_id, dtype=np.int64)
+
+    def transition(
+        self,
+        positions: np.ndarray,
+        actions: np.ndarray
+    )-> np.ndarray:
+        """
+        Look up the next state of every agent, without resetting.
+
+        In a StochasticMaze, every agent slips to a random action with
+        the probability of the maze.
+
+        @param positions: state id of every agent
+        @param actions: action index of every agent
+
+        @return np.ndarray with next state ids
+        """
+        if isinstance(self.maze, StochasticMaze):
+            slips = self.rng.uniforms(len(actions)) < self.maze.probability
+            actions = np.where(
+                slips, 
+                self.rng.action_indices(len(actions)), 
+                actions
+            )
+        return self.transitions[positions, actions]
+
+    def step(
+        self,
+        positions: np.ndarray,
+        actions: np.ndarray
+    )-> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Step function for VectorizedMaze.
+
+        Performs `actions[i]` from `positions[i]` for every agent.
+        @see transition
+        Agents that enter a terminal state are reset to `start_id`.
+
+        @param positions: state id of every agent
+        @param actions: action index of every agent
+
+        @return tuple[np.ndarray, np.ndarray, np.ndarray] with
+            next state ids (after resetting), rewards and terminal flags
+        """
+        next_positions = self.transition(positions, actions)
+        rewards = self.rewards[next_positions]
+        terminals = self.terminals[next_positions]
+
+        return (
+            np.where(terminals, self.start_id, next_positions),
+            rewards,
+            terminals
+        )
+
+    def to_coordinates(self, positions: np.ndarray)-> np.ndarray:
+        """
+        Convert state ids to coordinates.
+
+        @param positions: state ids to convert
+
+        @return np.ndarray with shape (N, 2), with x, y coordinates
+        """
+        return np.stack(np.divmod(positions, self.maze.shape[1]), axis=-1)